@@ -0,0 +1,129 @@
+"""
+Throughput of the MCP server by number of worker processes.
+
+For each worker count a gunicorn server is started on a free port and driven by
+concurrent SSE client sessions that each call one tool repeatedly; the table
+shows calls per second and latency percentiles. Sessions are spread over the
+workers by the shared listening socket, so their message POSTs also exercise
+the forwarding between workers.
+
+    python server/benchmark.py --workers 1,2,4 --sessions 32 --calls 50 \
+        --tool get_county_info --args '{"zipcode": "33101"}'
+
+With --url, an already running server is measured instead.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _session(url, tool, arguments, calls, latencies, errors):
+    async with sse_client(url) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            for _ in range(calls):
+                started = time.perf_counter()
+                try:
+                    result = await session.call_tool(tool, arguments)
+                    if result.isError:
+                        errors.append(result.content[0].text if result.content else "error")
+                except Exception as e:
+                    errors.append(str(e))
+                latencies.append(time.perf_counter() - started)
+
+
+async def run_load(url, tool, arguments, sessions, calls):
+    """Drive `sessions` concurrent sessions making `calls` calls each; returns a result row."""
+    # One warm-up call fills the shared caches, as on a server that has been up a while
+    await _session(url, tool, arguments, 1, [], [])
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(_session(url, tool, arguments, calls, latencies, errors) for _ in range(sessions)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "calls": len(latencies),
+        "errors": len(errors),
+        "calls_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1),
+    }
+
+
+def start_server(workers, port, cache_path):
+    env = dict(os.environ, SHARED_CACHE_PATH=cache_path)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "-k", "uvicorn.workers.UvicornWorker",
+         "-b", f"127.0.0.1:{port}", "--log-level", "warning", "server.server:app"],
+        cwd=ROOT, env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                # Let the remaining workers finish booting
+                time.sleep(0.5 + 0.2 * workers)
+                return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server with {workers} workers exited with {process.returncode}")
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server with {workers} workers did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure MCP server throughput by number of workers.")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--url", help="Measure a running server's SSE endpoint instead of starting one")
+    parser.add_argument("--sessions", type=int, default=32, help="Concurrent client sessions")
+    parser.add_argument("--calls", type=int, default=50, help="Tool calls per session")
+    parser.add_argument("--tool", default="get_county_info")
+    parser.add_argument("--args", default='{"zipcode": "33101"}', help="Tool arguments as JSON")
+    parser.add_argument("--cache-path", help="Shared cache file to use (default: a fresh one per run)")
+    args = parser.parse_args()
+    arguments = json.loads(args.args)
+
+    rows = []
+    if args.url:
+        rows.append({"workers": "-", **asyncio.run(run_load(args.url, args.tool, arguments, args.sessions, args.calls))})
+    else:
+        for workers in (int(count) for count in args.workers.split(",")):
+            port = _free_port()
+            with tempfile.TemporaryDirectory() as cache_dir:
+                process = start_server(workers, port, args.cache_path or os.path.join(cache_dir, "cache.sqlite"))
+                try:
+                    row = asyncio.run(run_load(f"http://127.0.0.1:{port}/sse", args.tool, arguments,
+                                               args.sessions, args.calls))
+                finally:
+                    process.terminate()
+                    process.wait()
+            rows.append({"workers": workers, **row})
+
+    columns = ["workers", "calls", "errors", "calls_per_second", "p50_ms", "p95_ms", "p99_ms"]
+    print("\t".join(columns))
+    for row in rows:
+        print("\t".join(str(row[column]) for column in columns))
+
+
+if __name__ == "__main__":
+    main()
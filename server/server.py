@@ -1,80 +1,398 @@
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Context
+import argparse
+import builtins
+import functools
+import hashlib
 import importlib
+import inspect
 import os
 import sys
 import json
+import typing
 import asyncio
 import logging
+import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def import_service_modules(service_dir="server/services"):
-    """Import all service modules from the services directory."""
+SERVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "services")
+MANIFEST_PATH = os.getenv("SERVICE_MANIFEST_PATH", os.path.join(SERVICE_DIR, "manifest.json"))
+# "lazy": register tools from the manifest and import a module on its first call;
+# "eager": import every service module at startup
+SERVICE_LOADING = os.getenv("SERVICE_LOADING", "lazy").lower()
+
+# Import times per module in seconds, for the startup report
+import_times = {}
+
+
+def _add_service_path(service_dir=SERVICE_DIR):
+    # Services import each other by flat name (`from zipcode import ...`), so they are
+    # imported the same way here; importing them as `services.X` as well would load
+    # a second copy of every module, with its own caches.
     services_path = os.path.abspath(service_dir)
     if services_path not in sys.path:
         sys.path.insert(0, services_path)
-    
-    service_modules = []
-    
-    for file in os.listdir(service_dir):
+
+
+def _read_source(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def discover_services(service_dir=SERVICE_DIR):
+    """
+    Find the service modules without importing anything.
+
+    Only files that create a FastMCP server are services; helpers (gateway, cache,
+    records, ...) and scripts like demo.py are skipped.
+
+    Returns:
+        dict: module name -> sha1 of its source
+    """
+    services = {}
+    for file in sorted(os.listdir(service_dir)):
         if file.endswith('.py') and not file.startswith('__'):
-            module_name = file[:-3]
-            try:
-                module = importlib.import_module(f"services.{module_name}")
-                if hasattr(module, 'mcp'):
-                    service_modules.append(module)
-                else:
-                    logger.warning(f"No 'mcp' attribute in {module_name}")
-            except Exception as e:
-                logger.error(f"Error importing {module_name}: {e}")
-    
+            source = _read_source(os.path.join(service_dir, file))
+            if b"FastMCP(" in source:
+                services[file[:-3]] = hashlib.sha1(source).hexdigest()
+    return services
+
+
+def load_service_module(module_name):
+    """Import a service module by its flat name, recording how long the import took."""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    _add_service_path()
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    import_times[module_name] = time.perf_counter() - started
+    logger.info(f"Imported service {module_name} in {import_times[module_name] * 1000:.1f} ms")
+    return module
+
+
+def import_service_modules(service_dir=SERVICE_DIR):
+    """Import all service modules from the services directory."""
+    service_modules = []
+    for module_name in discover_services(service_dir):
+        try:
+            module = load_service_module(module_name)
+            if hasattr(module, 'mcp'):
+                service_modules.append(module)
+            else:
+                logger.warning(f"No 'mcp' attribute in {module_name}")
+        except Exception as e:
+            logger.error(f"Error importing {module_name}: {e}")
     return service_modules
 
-async def main():
-    # Create a main MCP server
-    main_mcp = FastMCP(
-        name="main-server",
-        host="0.0.0.0",
-        port=8000
-    )
-    
-    # Import all service modules
-    service_modules = import_service_modules()
-    
-    # Register all services with the main MCP server
-    for service_module in service_modules:
-        service_name = service_module.mcp.name
+
+def _annotation_name(annotation):
+    if annotation is inspect.Parameter.empty:
+        return None
+    if annotation is Context:
+        return "Context"
+    if isinstance(annotation, type) and getattr(builtins, annotation.__name__, None) is annotation:
+        return annotation.__name__
+    return inspect.formatannotation(annotation)
+
+
+# The annotations service tools use. The manifest is data, so its annotation
+# strings are looked up here rather than evaluated.
+MANIFEST_ANNOTATIONS = {
+    "str": str,
+    "int": int,
+    "float": float,
+    "bool": bool,
+    "dict": dict,
+    "list": list,
+    "list[str]": list[str],
+    "list[int]": list[int],
+    "list[dict]": list[dict],
+    "Context": Context,
+}
+
+
+def _annotation_from_name(name):
+    if name is None:
+        return inspect.Parameter.empty
+    if name in MANIFEST_ANNOTATIONS:
+        return MANIFEST_ANNOTATIONS[name]
+    # Optional[X] / X | None of a known annotation
+    inner = None
+    if name.startswith("Optional[") and name.endswith("]"):
+        inner = name[len("Optional["):-1]
+    elif name.endswith(" | None"):
+        inner = name[:-len(" | None")]
+    if inner in MANIFEST_ANNOTATIONS:
+        return typing.Optional[MANIFEST_ANNOTATIONS[inner]]
+    raise ValueError(f"Unsupported annotation in service manifest: {name!r}")
+
+
+def describe_tool(tool_func):
+    """
+    Manifest entry for a tool function: name, docstring and signature.
+
+    Raises ValueError for an annotation lazy loading cannot restore; add it to
+    MANIFEST_ANNOTATIONS.
+    """
+    signature = inspect.signature(tool_func)
+    params = []
+    for param in signature.parameters.values():
+        entry = {"name": param.name, "annotation": _annotation_name(param.annotation)}
+        if param.default is not inspect.Parameter.empty:
+            entry["default"] = param.default
+        params.append(entry)
+    for annotation in [param["annotation"] for param in params] + [_annotation_name(signature.return_annotation)]:
+        _annotation_from_name(annotation)
+    return {
+        "name": tool_func.__name__,
+        "doc": tool_func.__doc__,
+        "params": params,
+        "returns": _annotation_name(signature.return_annotation),
+    }
+
+
+def build_manifest(path=MANIFEST_PATH, service_dir=SERVICE_DIR):
+    """Import every service once and write the tool manifest used by lazy loading."""
+    services = discover_services(service_dir)
+    manifest = {"services": {}}
+    for module in import_service_modules(service_dir):
+        module_name = module.__name__
+        tools = []
+        for tool in module.mcp._tool_manager.list_tools():
+            tool_func = getattr(module, tool.name, None)
+            if callable(tool_func):
+                tools.append(describe_tool(tool_func))
+        manifest["services"][module_name] = {"source_sha1": services[module_name], "tools": tools}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    logger.info(f"Wrote manifest for {len(manifest['services'])} services to {path}")
+    return manifest
+
+
+def lazy_tool(module_name, entry):
+    """
+    A stand-in for a tool function that imports its module on the first call.
+
+    It carries the original name, docstring and signature, so FastMCP derives the
+    same schema (and Context injection) as it would from the real function.
+    """
+    tool_name = entry["name"]
+    target = None
+
+    async def call(**kwargs):
+        nonlocal target
+        if target is None:
+            target = getattr(load_service_module(module_name), tool_name)
+        result = target(**kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    params = []
+    for param in entry["params"]:
+        params.append(inspect.Parameter(
+            param["name"],
+            inspect.Parameter.POSITIONAL_OR_KEYWORD,
+            default=param.get("default", inspect.Parameter.empty),
+            annotation=_annotation_from_name(param["annotation"]),
+        ))
+    call.__name__ = call.__qualname__ = tool_name
+    call.__doc__ = entry["doc"]
+    call.__signature__ = inspect.Signature(params, return_annotation=_annotation_from_name(entry["returns"]))
+    return call
+
+
+def instrument_tool(tool_func):
+    """
+    Wrap a tool function to record its calls, errors, latency and result size.
+
+    The wrapper keeps the function's name, docstring and signature (through
+    functools.wraps), so the tool schema and Context injection are unchanged.
+    """
+    _add_service_path()
+    from metrics import METRICS_ENABLED, observe_tool
+
+    if not METRICS_ENABLED:
+        return tool_func
+    tool_name = tool_func.__name__
+
+    @functools.wraps(tool_func)
+    async def call(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = tool_func(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+        except Exception:
+            observe_tool(tool_name, time.perf_counter() - started, exception=True)
+            raise
+        observe_tool(tool_name, time.perf_counter() - started, result)
+        return result
+
+    return call
+
+
+def _register_module_tools(main_mcp, service_module):
+    service_name = service_module.mcp.name
+    for tool in service_module.mcp._tool_manager.list_tools():
         try:
-            tools = await service_module.mcp.list_tools() or []
-            if isinstance(tools, list):
+            # Get the tool function from the module
+            tool_func = getattr(service_module, tool.name, None)
+            if tool_func and callable(tool_func):
+                main_mcp.add_tool(instrument_tool(tool_func))
+            else:
+                logger.warning(f"No callable function found for tool {tool.name} in {service_name}")
+        except Exception as e:
+            logger.error(f"Error registering tool {tool.name}: {e}")
+
+
+def register_services(main_mcp, loading=SERVICE_LOADING):
+    """
+    Register every service tool on the main server.
+
+    In lazy mode tools come from the manifest; a module missing from it, or whose
+    source changed since the manifest was built, is imported eagerly instead.
+    """
+    services = discover_services()
+    manifest = {}
+    if loading == "lazy":
+        if os.path.exists(MANIFEST_PATH):
+            with open(MANIFEST_PATH, encoding="utf-8") as f:
+                manifest = json.load(f).get("services", {})
+        else:
+            logger.warning(f"No service manifest at {MANIFEST_PATH}; importing all services")
+
+    for module_name, source_sha1 in services.items():
+        entry = manifest.get(module_name)
+        if entry is not None and entry.get("source_sha1") == source_sha1:
+            try:
+                tools = [lazy_tool(module_name, tool) for tool in entry["tools"]]
+            except ValueError as e:
+                logger.error(f"Invalid service manifest entry for {module_name} ({e}); importing it now")
+            else:
                 for tool in tools:
                     try:
-                        # Get the tool function from the module
-                        tool_func = getattr(service_module, tool.name, None)
-                        if tool_func and callable(tool_func):
-                            main_mcp.add_tool(tool_func)
-                        else:
-                            logger.warning(f"No callable function found for tool {tool.name} in {service_name}")
+                        main_mcp.add_tool(instrument_tool(tool))
                     except Exception as e:
-                        logger.error(f"Error registering tool {tool.name}: {e}")
-            else:
-                logger.warning(f"No tools or invalid tool format for service {service_name}")
+                        logger.error(f"Error registering tool {tool.__name__}: {e}")
+                continue
+        elif loading == "lazy" and manifest:
+            logger.warning(f"Service manifest is out of date for {module_name}; importing it now")
+        try:
+            module = load_service_module(module_name)
         except Exception as e:
-            logger.error(f"Error listing tools for service {service_name}: {e}")
-    
+            logger.error(f"Error importing {module_name}: {e}")
+            continue
+        if hasattr(module, 'mcp'):
+            _register_module_tools(main_mcp, module)
+        else:
+            logger.warning(f"No 'mcp' attribute in {module_name}")
+
+
+def log_startup_report(started):
+    total = time.perf_counter() - started
+    imported = sum(import_times.values())
+    lines = [f"  {name:<16} {seconds * 1000:8.1f} ms" for name, seconds in sorted(import_times.items(), key=lambda item: -item[1])]
+    logger.info(
+        f"Startup took {total * 1000:.1f} ms ({imported * 1000:.1f} ms importing {len(import_times)} service modules)"
+        + ("\n" + "\n".join(lines) if lines else "")
+    )
+
+
+def preload_data():
+    """
+    Load shared lookup data before the first request instead of during it.
+
+    The zip centroid k-d tree is built here, so the first provider search does
+    not pay for loading and building it.
+    """
+    _add_service_path()
+    from zipgeo import get_zip_centroids
+
+    try:
+        get_zip_centroids()
+    except Exception as e:
+        logger.error(f"Error loading zip centroids: {e}")
+
+
+def create_server():
+    """Create the main MCP server with every service tool registered."""
+    started = time.perf_counter()
+    main_mcp = FastMCP(
+        name="main-server",
+        host="0.0.0.0",
+        port=8000
+    )
+    register_services(main_mcp)
+    preload_data()
+    log_startup_report(started)
+    return main_mcp
+
+
+def create_app(main_mcp=None):
+    """
+    The ASGI app: the MCP SSE endpoint, the plan link redirects and /metrics.
+
+    It is wrapped in a SessionRouter, so it can run in several worker processes
+    behind one port (`gunicorn -w N ... server.server:app`); message POSTs that
+    land on a worker other than the one holding their SSE session are forwarded
+    to it.
+    """
+    main_mcp = main_mcp or create_server()
+    _add_service_path()
+    from metrics import METRICS_ENABLED, metrics_routes
+    from shortlinks import plan_link_routes
+    from workers import SessionRouter
+
+    starlette_app = main_mcp.sse_app()
+    starlette_app.router.routes.extend(plan_link_routes())
+    if METRICS_ENABLED:
+        starlette_app.router.routes.extend(metrics_routes())
+    return SessionRouter(starlette_app, message_path=main_mcp.settings.message_path)
+
+
+def __getattr__(name):
+    # `server.server:app` for gunicorn, built on first access so that importing
+    # this module (e.g. for --build-manifest) does not register every service
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def main():
+    # Create a main MCP server
+    main_mcp = create_server()
+
     # Verify SSE setup
     if hasattr(main_mcp, 'sse_app'):
         logger.info("SSE application is set up.")
     else:
         logger.warning("SSE application not found in FastMCP.")
-    
-    # Run the main MCP server with SSE transport
+
+    # Run the main MCP server with SSE transport, plus the plan link redirects
     try:
-        await main_mcp.run_sse_async()
+        import uvicorn
+
+        config = uvicorn.Config(
+            create_app(main_mcp),
+            host=main_mcp.settings.host,
+            port=main_mcp.settings.port,
+            log_level=main_mcp.settings.log_level.lower(),
+        )
+        await uvicorn.Server(config).serve()
     except Exception as e:
         logger.error(f"Error starting SSE server: {e}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the main MCP server.")
+    parser.add_argument("--build-manifest", action="store_true",
+                        help="Import every service and write the tool manifest used for lazy loading")
+    args = parser.parse_args()
+    if args.build_manifest:
+        build_manifest()
+    else:
+        asyncio.run(main())
@@ -1,33 +1,151 @@
 from mcp.server.fastmcp import FastMCP
+import asyncio
+import bisect
 import logging
-import json
-import http.client
+import os
+from datetime import datetime, timedelta
 from urllib.parse import quote
+from cache import TTLCache
+from gateway import gateway_get, gateway_post
 
 logger = logging.getLogger(__name__)
 # You can keep using the same MCP instance or create a new one
 mcp = FastMCP("appointment")  # Uncomment if you want a separate MCP instance
 
-# Define the gateway URL
-gateway_nextere_url = "gateway-dev.nextere.com"
 tennatid = "f91e8e24-b430-eeb6-e67e-3a1287e79d01"
+AGENT_USERNAME = "yash12"
 
-def check_appointment_in_data(appointment_datetime, agent_username="yash12", tenant_id="f91e8e24-b430-eeb6-e67e-3a1287e79d01"):
+# Availability answers are only trusted briefly; bookings by other users change them
+APPOINTMENT_CACHE_TTL = int(os.getenv("APPOINTMENT_CACHE_TTL", "60"))
+# Probe the rest of a day in the background after its first check (0 = off)
+APPOINTMENT_PREFETCH_PROBES = int(os.getenv("APPOINTMENT_PREFETCH_PROBES", "0"))
+APPOINTMENT_SLOT_MINUTES = int(os.getenv("APPOINTMENT_SLOT_MINUTES", "30"))
+
+
+def _parse_datetime(value):
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+class AvailabilityCalendar:
+    """
+    What is known about one agent's availability, derived from agent-available-date.
+
+    An answer for time T is either "available" (T is free) or "not available,
+    next available at N", which also says every time in [T, N) is taken and N is
+    free. Those facts are kept as a set of free times and sorted busy intervals,
+    so later checks inside a known interval are answered without a request.
+    """
+
+    def __init__(self):
+        self.free = set()
+        self.busy = []  # sorted (start, end, raw availableDate of end)
+        self.answers = {}  # answers for times that could not be parsed, by raw string
+
+    def lookup(self, appointment_datetime):
+        """Answer in the shape of the gateway response, or None if unknown."""
+        when = _parse_datetime(appointment_datetime)
+        if when is None:
+            return self.answers.get(appointment_datetime)
+        try:
+            if when in self.free:
+                return {"isAvailable": True}
+            i = bisect.bisect_right(self.busy, (when, datetime.max.replace(tzinfo=when.tzinfo))) - 1
+        except TypeError:  # naive and timezone-aware times mixed
+            return None
+        if i >= 0 and self.busy[i][0] <= when < self.busy[i][1]:
+            return {"isAvailable": False, "availableDate": self.busy[i][2]}
+        return None
+
+    def record(self, appointment_datetime, answer):
+        when = _parse_datetime(appointment_datetime)
+        if when is None:
+            self.answers[appointment_datetime] = answer
+            return
+        try:
+            if answer.get("isAvailable", False):
+                self.free.add(when)
+                # A fresh "available" overrides busy intervals recorded before
+                self.busy = [interval for interval in self.busy if not interval[0] <= when < interval[1]]
+                return
+            # ...and a fresh "taken" overrides an earlier "available"
+            self.free.discard(when)
+            next_available = _parse_datetime(answer.get("availableDate") or "")
+            if next_available is not None and next_available > when:
+                bisect.insort(self.busy, (when, next_available, answer["availableDate"]))
+                self.free.add(next_available)
+        except TypeError:
+            pass
+        self.answers[appointment_datetime] = answer
+
+
+_calendars = TTLCache(maxsize=1000, ttl=APPOINTMENT_CACHE_TTL)
+_prefetched_days = TTLCache(maxsize=1000, ttl=APPOINTMENT_CACHE_TTL)
+# Running prefetches; holding them keeps the tasks from being garbage-collected
+_prefetch_tasks = set()
+
+
+def _prefetch_done(task):
+    _prefetch_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Availability prefetch failed: {task.exception()}")
+
+
+def invalidate_availability(agent_username=AGENT_USERNAME, tenant_id=tennatid):
+    _calendars.pop((agent_username, tenant_id))
+    _prefetched_days.clear()
+
+
+async def prefetch_day(appointment_datetime, agent_username=AGENT_USERNAME, tenant_id=tennatid,
+                       max_probes=None):
+    """
+    Fill in the calendar for the rest of a day, one slot or busy interval at a time.
+
+    Each probe either confirms a free slot (then the next slot is probed) or
+    returns a busy interval (then its end is probed), so a day is covered in
+    about as many requests as it has free slots, up to `max_probes`.
+    """
+    when = _parse_datetime(appointment_datetime)
+    if when is None:
+        return
+    end_of_day = when.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    step = timedelta(minutes=APPOINTMENT_SLOT_MINUTES)
+    for _ in range(APPOINTMENT_PREFETCH_PROBES if max_probes is None else max_probes):
+        if when >= end_of_day:
+            return
+        answer = await check_appointment_in_data(when.isoformat(), agent_username, tenant_id)
+        if "error" in answer:
+            return
+        next_available = None if answer.get("isAvailable") else _parse_datetime(answer.get("availableDate") or "")
+        when = next_available if next_available is not None and next_available > when else when + step
+
+
+async def check_appointment_in_data(appointment_datetime, agent_username=AGENT_USERNAME, tenant_id=tennatid, force=False):
     """
     Check if an appointment is available at the specified date and time.
+
+    Answers are served from the agent's availability calendar when it already
+    covers the requested time; `force` always asks the gateway.
     
     Args:
         appointment_datetime (str): Date and time for the appointment in ISO format
         agent_username (str): Username of the agent (default: "yash12")
         tenant_id (str): Tenant ID for the request
+        force (bool): Skip the calendar, e.g. for the final check before booking
         
     Returns:
         dict: JSON response containing availability information
     """
+    calendar_key = (agent_username, tenant_id)
+    calendar = _calendars.get(calendar_key)
+    if calendar is not None and not force:
+        known = calendar.lookup(appointment_datetime)
+        if known is not None:
+            logger.info(f"Serving availability for {appointment_datetime} from the calendar")
+            return known
     try:
-        conn = http.client.HTTPSConnection(gateway_nextere_url)
-        headers = {"accept": "application/json"}
-
         # URL encode the parameters
         encoded_agent_id = quote(agent_username)
         encoded_datetime = quote(appointment_datetime)
@@ -37,23 +155,31 @@ def check_appointment_in_data(appointment_datetime, agent_username="yash12", ten
 
         print(f"Checking appointment availability at endpoint: {endpoint}")
         
-        conn.request("GET", endpoint, headers=headers)
-        res = conn.getresponse()
-        data = res.read().decode("utf-8")
-        print("res.status",res.status)
-        if res.status == 200:
-            json_data = json.loads(data)
+        res = await gateway_get(endpoint)
+        print("res.status",res.status_code)
+        if res.status_code == 200:
+            json_data = res.json()
             print("jsondata",json_data)
+            if calendar is None:
+                calendar = AvailabilityCalendar()
+                _calendars.set(calendar_key, calendar)
+            calendar.record(appointment_datetime, json_data)
+            day = str(appointment_datetime)[:10]
+            if APPOINTMENT_PREFETCH_PROBES and _prefetched_days.get((calendar_key, day)) is None:
+                _prefetched_days.set((calendar_key, day), True)
+                task = asyncio.ensure_future(prefetch_day(appointment_datetime, agent_username, tenant_id))
+                _prefetch_tasks.add(task)
+                task.add_done_callback(_prefetch_done)
             return json_data
         else:
-            logger.error(f"Error checking appointment: Status {res.status}, Response: {data}")
-            return {"available": False, "error": f"Status code: {res.status}"}
+            logger.error(f"Error checking appointment: Status {res.status_code}, Response: {res.text}")
+            return {"available": False, "error": f"Status code: {res.status_code}"}
     
     except Exception as e:
         logger.error(f"Exception checking appointment: {e}")
         return {"available": False, "error": str(e)}
 
-def book_appointment(appointment_datetime):
+async def book_appointment(appointment_datetime):
     """
     Book an appointment for the user with the specified agent.
     
@@ -71,22 +197,14 @@ def book_appointment(appointment_datetime):
             "title": f"Appointment book",
             "description": f"Scheduled appointment on {appointment_datetime}",
         }
-        conn = http.client.HTTPSConnection(gateway_nextere_url)
-
-        # Define the headers
-        headers = {"accept": "application/json", "Content-Type": "application/json"}
-
-        # Convert the payload to JSON string
-        json_payload = json.dumps(payload)
-
         # Send the request
         endpoint = f"/api/quotingtool-service/agent-agency-detail/appointment?tenantid={tennatid}"
-        conn.request("POST", endpoint, body=json_payload, headers=headers)
-        res = conn.getresponse()
-        data = res.read().decode("utf-8")
+        res = await gateway_post(endpoint, payload)
         
-        if res.status == 200 or res.status == 201:
-            json_data = json.loads(data)
+        if res.status_code == 200 or res.status_code == 201:
+            json_data = res.json()
+            # The booked slot is gone; drop everything derived before the booking
+            invalidate_availability()
             return {
                 "appointment_confirmed": True,
                 "appointment_start_time": json_data['start'],
@@ -94,10 +212,12 @@ def book_appointment(appointment_datetime):
                 "message": json_data['description']
             }
         else:
-            logger.error(f"Error booking appointment: Status {res.status}, Response: {data}")
+            logger.error(f"Error booking appointment: Status {res.status_code}, Response: {res.text}")
+            # Most often the slot was taken after our check; what we knew is stale
+            invalidate_availability()
             return {
                 "appointment_confirmed": False,
-                "message": f"Failed to book appointment. Status code: {res.status}"
+                "message": f"Failed to book appointment. Status code: {res.status_code}"
             }
     
     except Exception as e:
@@ -125,7 +245,7 @@ async def check_appointment_availability(appointment_datetime):
     """
     try:
         print(f"Checking appointment availability for: {appointment_datetime}")
-        result = check_appointment_in_data(appointment_datetime)
+        result = await check_appointment_in_data(appointment_datetime)
         print("result", result)
         # Use isAvailable instead of is_available to match API response
         if result and result.get("isAvailable", False):
@@ -172,8 +292,8 @@ async def schedule_appointment(json_data, appointment_datetime):
     try:
         print(f"Scheduling appointment for: {json_data.get('full_name')} at {appointment_datetime}")
         
-        # First check if the appointment slot is available
-        availability = check_appointment_in_data(appointment_datetime)
+        # First check if the appointment slot is available; always asks the gateway
+        availability = await check_appointment_in_data(appointment_datetime, force=True)
         print(f"Availability check result: {availability}")
         
         # The API is returning 'isAvailable', not 'is_available'
@@ -185,7 +305,7 @@ async def schedule_appointment(json_data, appointment_datetime):
             }
         
         # If available, book the appointment
-        result = book_appointment(appointment_datetime)
+        result = await book_appointment(appointment_datetime)
         return result
     except Exception as e:
         logger.error(f"Error in schedule_appointment: {e}")
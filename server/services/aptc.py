@@ -0,0 +1,196 @@
+import argparse
+import csv
+import logging
+import os
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # local estimates are optional; savings then always use the gateway
+    np = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLCSP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+# Federal poverty guidelines used for a coverage year: (first person, each additional person).
+# Coverage year 2024 uses the 2023 guidelines.
+POVERTY_GUIDELINES = {
+    2024: {
+        "default": (14580, 5140),
+        "AK": (18210, 6430),
+        "HI": (16770, 5910),
+    },
+}
+
+# Applicable percentage of income by % of FPL, interpolated linearly between points
+# (American Rescue Plan / Inflation Reduction Act schedule, 2021 through 2025).
+APPLICABLE_PERCENTAGES = {
+    2024: ((0, 150, 200, 250, 300, 400), (0.0, 0.0, 2.0, 4.0, 6.0, 8.5)),
+}
+
+# Federal default standard age curve, ages 0-64 (64 and older share the last factor)
+AGE_CURVE = (
+    (0.765,) * 15
+    + (0.833, 0.859, 0.885, 0.913, 0.941, 0.970)
+    + (1.000,) * 4
+    + (1.004, 1.024, 1.048, 1.087, 1.119, 1.135, 1.159, 1.183, 1.198, 1.214,
+       1.222, 1.230, 1.238, 1.246, 1.262, 1.278, 1.302, 1.325, 1.357, 1.397,
+       1.444, 1.500, 1.563, 1.635, 1.706, 1.786, 1.865, 1.952, 2.040, 2.135,
+       2.230, 2.333, 2.437, 2.548, 2.603, 2.714, 2.810, 2.873, 2.952, 3.000)
+)
+
+# States that had not expanded Medicaid in 2024; adults there can get APTC from 100% FPL,
+# while in expansion states incomes under 138% FPL are covered by Medicaid instead.
+NON_EXPANSION_STATES = {"AL", "FL", "GA", "KS", "MS", "SC", "TN", "TX", "WI", "WY"}
+MEDICAID_LIMIT = 138.0
+APTC_FLOOR = 100.0
+
+_slcsp = {}
+_slcsp_lock = threading.Lock()
+
+
+def available():
+    return np is not None
+
+
+def unavailable_reason(year=2024):
+    """Why local estimates cannot be made for a year, or None if they can."""
+    if np is None:
+        return "numpy is not installed"
+    if get_slcsp_table(year) is None:
+        return f"no benchmark premium table at {slcsp_path(year)}"
+    return None
+
+
+def slcsp_path(year):
+    return os.path.join(os.getenv("SLCSP_DIR", DEFAULT_SLCSP_DIR), f"slcsp_{year}.csv")
+
+
+def get_slcsp_table(year):
+    """
+    Load the benchmark premium table for a year once per process.
+
+    The CSV has a county_fips column and a slcsp_age21 column with the monthly
+    second-lowest-cost silver premium for a 21 year old in that county.
+
+    Returns:
+        dict: county FIPS -> monthly age-21 benchmark premium, or None if not installed
+    """
+    if year in _slcsp:
+        return _slcsp[year]
+    with _slcsp_lock:
+        if year not in _slcsp:
+            path = slcsp_path(year)
+            table = None
+            if os.path.exists(path):
+                with open(path, newline="", encoding="utf-8") as f:
+                    table = {
+                        str(row["county_fips"]).strip().zfill(5): float(row["slcsp_age21"])
+                        for row in csv.DictReader(f)
+                    }
+                logger.info(f"Loaded {len(table)} benchmark premiums from {path}")
+            else:
+                logger.info(f"No benchmark premium table at {path}; APTC estimates will use the gateway")
+            _slcsp[year] = table
+    return _slcsp[year]
+
+
+def estimate_aptc(incomes, ages, states, county_fips, year=2024, household_sizes=1, has_other_coverage=False):
+    """
+    Estimate monthly premium tax credits for arrays of households at once.
+
+    Each household's expected contribution is its applicable percentage of income
+    and its credit is the age-rated benchmark premium minus that contribution.
+    Households below the APTC floor for their state, with other coverage, or in
+    a county missing from the benchmark table get NaN (no local estimate) or 0.
+
+    Args:
+        incomes (array-like): Annual household incomes
+        ages (array-like): Ages of the (single) enrollee
+        states (array-like): Two-letter state codes
+        county_fips (array-like): 5 digit county FIPS codes
+        year (int): Coverage year
+        household_sizes (array-like or int): People in the tax household
+        has_other_coverage (array-like or bool): Employer or other coverage that
+                                                 rules out the credit
+
+    Returns:
+        numpy.ndarray: Monthly APTC per household; NaN where there is no benchmark premium
+    """
+    if np is None:
+        raise RuntimeError("numpy is required for local APTC estimates")
+    table = get_slcsp_table(year)
+    if table is None:
+        raise LookupError(f"No benchmark premium table for {year}")
+
+    incomes = np.asarray(incomes, dtype=float)
+    ages = np.clip(np.asarray(ages, dtype=int), 0, len(AGE_CURVE) - 1)
+    states = np.asarray(states, dtype=str)
+    county_fips = np.asarray(county_fips, dtype=str)
+    sizes = np.broadcast_to(np.asarray(household_sizes, dtype=float), incomes.shape)
+    other_coverage = np.broadcast_to(np.asarray(has_other_coverage, dtype=bool), incomes.shape)
+
+    guidelines = POVERTY_GUIDELINES[year]
+    first = np.full(incomes.shape, guidelines["default"][0], dtype=float)
+    additional = np.full(incomes.shape, guidelines["default"][1], dtype=float)
+    for state, (state_first, state_additional) in guidelines.items():
+        if state != "default":
+            first[states == state] = state_first
+            additional[states == state] = state_additional
+    percent_fpl = incomes / (first + additional * (sizes - 1)) * 100
+
+    points, percentages = APPLICABLE_PERCENTAGES[year]
+    contribution = incomes * np.interp(percent_fpl, points, percentages) / 100 / 12
+
+    benchmark = np.array([table.get(fips.zfill(5), np.nan) for fips in county_fips], dtype=float)
+    benchmark *= np.asarray(AGE_CURVE)[ages]
+
+    floor = np.where(np.isin(states, list(NON_EXPANSION_STATES)), APTC_FLOOR, MEDICAID_LIMIT)
+    eligible = (percent_fpl >= floor) & ~other_coverage
+    return np.where(eligible, np.maximum(benchmark - contribution, 0.0), np.where(np.isnan(benchmark), np.nan, 0.0))
+
+
+def estimate_household(household, county, year=2024, has_other_coverage=False):
+    """
+    Local APTC estimate for one household in the form fetch_savings uses.
+
+    Returns:
+        float: Monthly APTC rounded to cents, or None if there is no local estimate
+    """
+    if np is None or get_slcsp_table(year) is None:
+        return None
+    try:
+        aptc = estimate_aptc(
+            [float(household["income"])], [int(household["age"])], [county.get("state") or ""],
+            [str(county.get("fips") or "")], year, has_other_coverage=has_other_coverage,
+        )[0]
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Cannot estimate APTC locally: {e}")
+        return None
+    return None if np.isnan(aptc) else round(float(aptc), 2)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="What-if sweep of local APTC estimates for one county.")
+    parser.add_argument("county_fips")
+    parser.add_argument("state")
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--ages", default="21,30,40,50,60,64", help="Comma-separated ages")
+    parser.add_argument("--incomes", default="15000:100000:5000", help="start:stop:step annual incomes")
+    args = parser.parse_args()
+    reason = unavailable_reason(args.year)
+    if reason:
+        parser.error(f"Cannot estimate APTC locally: {reason}")
+
+    ages = [int(age) for age in args.ages.split(",")]
+    start, stop, step = (float(value) for value in args.incomes.split(":"))
+    incomes = np.arange(start, stop + step, step)
+    grid_incomes, grid_ages = np.meshgrid(incomes, ages)
+    aptc = estimate_aptc(
+        grid_incomes.ravel(), grid_ages.ravel(), [args.state] * grid_ages.size, [args.county_fips] * grid_ages.size, args.year
+    ).reshape(grid_ages.shape)
+    print("income\t" + "\t".join(f"age {age}" for age in ages))
+    for column, income in enumerate(incomes):
+        print(f"{income:.0f}\t" + "\t".join(f"{aptc[row, column]:.2f}" for row in range(len(ages))))
@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import random
+import time
+
+from savings import InvalidHousehold, quote_savings
+from zipcode import resolve_zip
+
+logger = logging.getLogger(__name__)
+
+BULK_CONCURRENCY = int(os.getenv("BULK_QUOTE_CONCURRENCY", "20"))
+BULK_RETRIES = int(os.getenv("BULK_QUOTE_RETRIES", "3"))
+BULK_RETRY_BACKOFF = float(os.getenv("BULK_QUOTE_RETRY_BACKOFF", "1.0"))
+REPORT_EVERY = 1000
+
+TRUE_VALUES = {"1", "true", "yes", "y"}
+
+
+def _coerce_row(row):
+    """Turn CSV text into the values the savings tool receives from the assistant."""
+    row = dict(row)
+    if isinstance(row.get("employer_coverage"), str):
+        row["employer_coverage"] = row["employer_coverage"].strip().lower() in TRUE_VALUES
+    if row.get("zip_code") is not None:
+        row["zip_code"] = str(row["zip_code"]).strip().zfill(5)
+    return row
+
+
+def read_households(path):
+    """
+    Lazily read households from a CSV or JSONL file.
+
+    Columns/keys are the ones get_saving_info takes: annual_income, age, gender,
+    pregnancy_status, tobacco_use, employer_coverage and zip_code.
+
+    Yields:
+        tuple: (row number starting at 0, household dict)
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row_number, row in enumerate(rows):
+            yield row_number, _coerce_row(row)
+
+
+def _drop_partial_line(output_path):
+    """Cut an interrupted run's unfinished last line, so appended results start on a line of their own."""
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        while end > 0:
+            start = max(end - 4096, 0)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        if end != size:
+            logger.warning(f"Dropping {size - end} bytes of an unfinished line from {output_path}")
+            f.truncate(end)
+
+
+def completed_rows(output_path):
+    """Row numbers settled in an earlier run; rows that failed on a retryable error are quoted again."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # last line of an interrupted run
+            if "error" not in result or not result.get("retryable", True):
+                done.add(result["row"])
+    return done
+
+
+async def quote_household(household, retries=BULK_RETRIES, backoff=BULK_RETRY_BACKOFF, income_bucket=None):
+    """
+    Quote one household, retrying failures with jittered exponential backoff.
+
+    The county is resolved first through the shared zip cache, so households in
+    the same zip code only trigger one zip lookup between them.
+    """
+    for attempt in range(retries + 1):
+        try:
+            counties = await resolve_zip(household.get("zip_code"))
+            if counties == []:
+                raise InvalidHousehold(f"Invalid zip code: {household.get('zip_code')}")
+            if counties is None:
+                raise ConnectionError(f"Zip code lookup failed for {household.get('zip_code')}")
+            return await quote_savings(household, counties[0], income_bucket)
+        except InvalidHousehold:
+            raise
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+            logger.warning(f"Quote failed ({e}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def quote_households(households, output_path, concurrency=BULK_CONCURRENCY, retries=BULK_RETRIES,
+                           income_bucket=None, resume=True):
+    """
+    Quote households with bounded concurrency, appending one JSON line per result.
+
+    Rows are pulled from `households` only as workers become free, and results
+    are written as they finish, so memory stays flat however long the input is.
+    The output doubles as the checkpoint: with `resume`, rows it already holds a
+    quote for are skipped.
+
+    Args:
+        households (iterable): (row number, household dict) pairs, e.g. read_households()
+        output_path (str): JSONL file to append {"row", "savings", "healthplan",
+                           "roundedplan"} or {"row", "error", "retryable"} lines to
+        concurrency (int): Households quoted at the same time
+        retries (int): Retries per household for network and gateway errors
+        income_bucket (int): Income rounding in dollars; SAVINGS_INCOME_BUCKET if None
+        resume (bool): Skip rows already quoted in `output_path`
+
+    Returns:
+        dict: Throughput report
+    """
+    if resume:
+        _drop_partial_line(output_path)
+    done = completed_rows(output_path) if resume else set()
+    report = {"quoted": 0, "failed": 0, "skipped": 0}
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    started = time.monotonic()
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+        def write(result):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            finished = report["quoted"] + report["failed"]
+            if finished % REPORT_EVERY == 0:
+                logger.info(f"{finished} households quoted, {finished / (time.monotonic() - started):.1f}/s")
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                row_number, household = item
+                try:
+                    result = await quote_household(household, retries, income_bucket=income_bucket)
+                    report["quoted"] += 1
+                    write({"row": row_number, **result})
+                except Exception as e:
+                    report["failed"] += 1
+                    write({"row": row_number, "error": str(e), "retryable": not isinstance(e, InvalidHousehold)})
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for row_number, household in households:
+                if row_number in done:
+                    report["skipped"] += 1
+                    continue
+                await queue.put((row_number, household))
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+    elapsed = time.monotonic() - started
+    report["elapsed_seconds"] = round(elapsed, 1)
+    report["households_per_second"] = round((report["quoted"] + report["failed"]) / elapsed, 2) if elapsed else 0.0
+    logger.info(f"Bulk quote finished: {report}")
+    return report
+
+
+async def quote_file(input_path, output_path, **options):
+    """Quote every household in a CSV or JSONL file; see quote_households for options."""
+    from gateway import close_client
+
+    try:
+        return await quote_households(read_households(input_path), output_path, **options)
+    finally:
+        await close_client()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Quote savings for a CSV or JSONL list of households.")
+    parser.add_argument("input")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results file, also used to resume")
+    parser.add_argument("--concurrency", type=int, default=BULK_CONCURRENCY)
+    parser.add_argument("--retries", type=int, default=BULK_RETRIES)
+    parser.add_argument("--income-bucket", type=int, help="Round incomes to this many dollars (quote previews)")
+    parser.add_argument("--restart", action="store_true", help="Overwrite the output instead of resuming")
+    args = parser.parse_args()
+
+    report = asyncio.run(quote_file(
+        args.input, args.output,
+        concurrency=args.concurrency,
+        retries=args.retries,
+        income_bucket=args.income_bucket,
+        resume=not args.restart,
+    ))
+    print(json.dumps(report, indent=2))
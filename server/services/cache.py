@@ -0,0 +1,413 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# SQLite file shared by the worker processes of one host, e.g. on /dev/shm
+# (unset = every process keeps its own caches only)
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+# Expired rows are deleted after this many writes
+SHARED_CACHE_PURGE_EVERY = 1000
+# Most queued writes committed in one transaction
+SHARED_CACHE_WRITE_BATCH = 256
+# How long a read waits for a locked file before counting as a miss
+SHARED_CACHE_READ_TIMEOUT = 0.05
+
+
+# Classes whose instances may be stored in the SharedStore, by name
+_shared_types = {}
+
+
+def shared_type(cls):
+    """
+    Class decorator that lets instances be kept in the SharedStore.
+
+    Instances are stored as the tuple from their __getstate__ and rebuilt with
+    __setstate__.
+    """
+    _shared_types[cls.__name__] = cls
+    return cls
+
+
+def _encode(value):
+    """A JSON-compatible form of a cached value that keeps tuples, dicts and records apart."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    if isinstance(value, tuple):
+        return {"t": [_encode(item) for item in value]}
+    if isinstance(value, dict) and all(isinstance(key, str) for key in value):
+        return {"d": {key: _encode(item) for key, item in value.items()}}
+    if _shared_types.get(type(value).__name__) is type(value):
+        return {"r": type(value).__name__, "s": _encode(value.__getstate__())}
+    raise TypeError(f"{type(value).__name__} values cannot be kept in the shared cache")
+
+
+def _decode(data):
+    if isinstance(data, list):
+        return [_decode(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+    if "t" in data:
+        return tuple(_decode(item) for item in data["t"])
+    if "d" in data:
+        return {key: _decode(item) for key, item in data["d"].items()}
+    cls = _shared_types[data["r"]]
+    record = cls.__new__(cls)
+    record.__setstate__(_decode(data["s"]))
+    return record
+
+
+class SharedStore:
+    """
+    Cache entries shared between processes through one SQLite file.
+
+    TTLCache instances created with a namespace read through to it on a local
+    miss and write through to it on set, so an entry fetched by one worker is
+    served by the others without another upstream request. Values are stored as
+    JSON (lists, tuples, string-keyed dicts, scalars and @shared_type records), so
+    reading the file never runs code. Expiry is stored as wall-clock time, since
+    monotonic clocks are not comparable across processes.
+
+    Writes are queued and committed in batches by a background thread, so a
+    request handler never waits on the file lock another worker holds; async
+    code reads through TTLCache.aget, which runs the lookup in a thread.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = self._connect(path, timeout=1.0)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (namespace TEXT NOT NULL, key TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, value TEXT NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        # WAL readers are not blocked by writers, so a busy reader is rare
+        self._reader = self._connect(path, timeout=SHARED_CACHE_READ_TIMEOUT)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._pending = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_loop, name="shared-cache-writer", daemon=True)
+        self._writer.start()
+
+    @staticmethod
+    def _connect(path, timeout):
+        db = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=OFF")
+        return db
+
+    def get(self, namespace, key):
+        """Returns (expires_at, value) for a live entry, or None."""
+        with self._lock:
+            row = self._reader.execute(
+                "SELECT expires_at, value FROM entries WHERE namespace = ? AND key = ?", (namespace, repr(key))
+            ).fetchone()
+        if row is None or row[0] <= time.time():
+            return None
+        return row[0], _decode(json.loads(row[1]))
+
+    def set(self, namespace, key, value, expires_at):
+        data = json.dumps(_encode(value), separators=(",", ":"))
+        self._pending.put((
+            "INSERT OR REPLACE INTO entries (namespace, key, expires_at, value) VALUES (?, ?, ?, ?)",
+            (namespace, repr(key), expires_at, data),
+        ))
+
+    def delete(self, namespace, key):
+        self._pending.put(("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, repr(key))))
+
+    def clear(self, namespace):
+        self._pending.put(("DELETE FROM entries WHERE namespace = ?", (namespace,)))
+
+    def flush(self):
+        """Wait until every write queued so far has been committed."""
+        done = threading.Event()
+        self._pending.put(done)
+        done.wait()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._pending.get()]
+            with contextlib.suppress(queue.Empty):
+                while len(batch) < SHARED_CACHE_WRITE_BATCH:
+                    batch.append(self._pending.get_nowait())
+            writes = [item for item in batch if not isinstance(item, threading.Event)]
+            try:
+                self._db.execute("BEGIN")
+                for sql, params in writes:
+                    self._db.execute(sql, params)
+                self._writes += len(writes)
+                if self._writes >= SHARED_CACHE_PURGE_EVERY:
+                    self._writes = 0
+                    self._db.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+                self._db.execute("COMMIT")
+            except Exception as e:
+                logger.warning(f"Shared cache write of {len(writes)} entries failed: {e}")
+                with contextlib.suppress(sqlite3.Error):
+                    self._db.execute("ROLLBACK")
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+
+_shared_store = None
+_shared_store_pid = None
+_shared_store_lock = threading.Lock()
+
+
+def get_shared_store():
+    """The shared store for this process, or None if SHARED_CACHE_PATH is not set."""
+    global _shared_store, _shared_store_pid
+    if not SHARED_CACHE_PATH:
+        return None
+    # SQLite connections must not cross a fork; each worker opens its own
+    if _shared_store_pid != os.getpid():
+        with _shared_store_lock:
+            if _shared_store_pid != os.getpid():
+                _shared_store = SharedStore(SHARED_CACHE_PATH)
+                _shared_store_pid = os.getpid()
+    return _shared_store
+
+
+_MISSING = object()
+
+# Caches created with a shared namespace, by that namespace, for metrics
+_named_caches = weakref.WeakValueDictionary()
+
+
+def named_caches():
+    return dict(_named_caches)
+
+
+class TTLCache:
+    """
+    In-process cache with per-entry expiry and LRU eviction.
+
+    Values may be any object, including falsy ones such as [] (used to cache
+    negative lookups); a miss is reported by returning `default`.
+
+    With a `shared` namespace, entries are also kept in the cross-process
+    SharedStore (when SHARED_CACHE_PATH is set): a local miss is looked up
+    there before it counts as a miss, and sets, pops and clears go to both.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, shared=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared_hits = 0
+        if shared:
+            _named_caches[shared] = self
+
+    def _store(self):
+        return get_shared_store() if self.shared else None
+
+    def _get_shared(self, key):
+        store = self._store()
+        if store is None:
+            return None
+        try:
+            entry = store.get(self.shared, key)
+        except Exception as e:
+            logger.warning(f"Shared cache read failed for {self.shared}: {e}")
+            return None
+        if entry is not None:
+            # Keep a local copy for the rest of the entry's lifetime
+            self._set_local(key, entry[1], time.monotonic() + entry[0] - time.time())
+        return entry
+
+    def _set_local(self, key, value, expires_at):
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_local(self, key, default=None):
+        """Look up this process's entries only; a hit counts, a miss does not."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+        return default
+
+    def get(self, key, default=None):
+        value = self.get_local(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        entry = self._get_shared(key)
+        with self._lock:
+            if entry is not None:
+                self.hits += 1
+                self.shared_hits += 1
+                return entry[1]
+            self.misses += 1
+            return default
+
+    async def aget(self, key, default=None):
+        """Like get, but a shared store lookup runs in a thread, off the event loop."""
+        value = self.get_local(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self._store() is None:
+            with self._lock:
+                self.misses += 1
+            return default
+        return await asyncio.to_thread(self.get, key, default)
+
+    def peek(self, key, default=None, shared=True):
+        """Like get, but without refreshing LRU order or counting a hit or miss."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+        entry = self._get_shared(key) if shared else None
+        return default if entry is None else entry[1]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self._set_local(key, value, time.monotonic() + ttl)
+        store = self._store()
+        if store is not None:
+            try:
+                store.set(self.shared, key, value, time.time() + ttl)
+            except Exception as e:
+                logger.warning(f"Shared cache write failed for {self.shared}: {e}")
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        store = self._store()
+        if store is not None:
+            try:
+                store.delete(self.shared, key)
+            except Exception as e:
+                logger.warning(f"Shared cache delete failed for {self.shared}: {e}")
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+        store = self._store()
+        if store is not None:
+            try:
+                store.clear(self.shared)
+            except Exception as e:
+                logger.warning(f"Shared cache clear failed for {self.shared}: {e}")
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "evictions": self.evictions,
+            "shared_hits": self.shared_hits,
+        }
+
+
+class PrefixCache:
+    """
+    Cache for autocomplete results that can answer a query from a shorter prefix.
+
+    Each cached query remembers whether its result list was complete, i.e. shorter
+    than the upstream result cap. A query that is not cached itself is answered by
+    filtering the result of its longest complete cached prefix ("lip" answers
+    "lipi" and "lipitor"), so typing ahead only goes upstream once. Probing the
+    prefixes of a query walks the same path as a trie, one dict lookup per level,
+    while entries share the bounded LRU/TTL storage of TTLCache.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, complete_below=20, min_prefix=2, shared=None):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl, shared=shared)
+        self.complete_below = complete_below
+        self.min_prefix = min_prefix
+        self.prefix_hits = 0
+
+    @staticmethod
+    def normalize(query):
+        return " ".join((query or "").lower().split())
+
+    def get(self, query, matches, default=None, scope=None):
+        """
+        Look up a query, falling back to filtering a complete shorter prefix.
+
+        Args:
+            query (str): Autocomplete query
+            matches (callable): matches(item, normalized_query) -> bool, the same
+                                test the upstream search applies
+            default: Returned when neither the query nor a usable prefix is cached
+            scope: Optional upstream parameters the results depend on (e.g. a year)
+
+        Returns:
+            tuple: Cached or filtered items, or `default`
+        """
+        return self._lookup(query, matches, default, scope, shared=True)
+
+    async def aget(self, query, matches, default=None, scope=None):
+        """Like get, but shared store lookups run in a thread, off the event loop."""
+        if self._entries._store() is None:
+            return self.get(query, matches, default, scope)
+        items = self._lookup(query, matches, _MISSING, scope, shared=False)
+        if items is not _MISSING:
+            return items
+        return await asyncio.to_thread(self.get, query, matches, default, scope)
+
+    def _lookup(self, query, matches, default, scope, shared):
+        query = self.normalize(query)
+        if shared:
+            entry = self._entries.get((scope, query))
+        else:
+            entry = self._entries.get_local((scope, query))
+        if entry is not None:
+            return entry[0]
+        for end in range(len(query) - 1, self.min_prefix - 1, -1):
+            entry = self._entries.peek((scope, query[:end]), shared=shared)
+            if entry is not None and entry[1]:
+                items = tuple(item for item in entry[0] if matches(item, query))
+                self.prefix_hits += 1
+                # A subset of a complete list is complete too
+                self._entries.set((scope, query), (items, True))
+                return items
+        return default
+
+    def set(self, query, items, ttl=None, scope=None):
+        items = tuple(items)
+        self._entries.set((scope, self.normalize(query)), (items, len(items) < self.complete_below), ttl)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        stats = self._entries.stats()
+        stats["prefix_hits"] = self.prefix_hits
+        return stats
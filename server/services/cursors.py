@@ -0,0 +1,74 @@
+import logging
+import os
+import secrets
+import weakref
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+CURSOR_STORE_SIZE = int(os.getenv("CURSOR_STORE_SIZE", "10000"))
+CURSOR_TTL = int(os.getenv("CURSOR_TTL", "3600"))
+
+
+def _session_of(ctx):
+    """Return the MCP session behind a tool Context, or None outside a request."""
+    if ctx is None:
+        return None
+    try:
+        return ctx.session
+    except Exception:
+        return None
+
+
+class CursorStore:
+    """
+    Pagination state for one kind of search (doctors, hospitals, medicines).
+
+    Every search gets an opaque cursor token. Each MCP session also remembers its
+    latest cursor, so navigation tools work without the token for that session and
+    never pick up another session's search. Both maps are bounded LRUs with expiry.
+    """
+
+    def __init__(self, maxsize=CURSOR_STORE_SIZE, ttl=CURSOR_TTL):
+        self._cursors = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._sessions = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def save(self, state, ctx=None, cursor=None):
+        """
+        Store the pagination state of a search.
+
+        Args:
+            state (dict): Search parameters and current page
+            ctx (Context): Tool context of the calling session, if any
+            cursor (str): Existing cursor to update instead of creating a new one
+
+        Returns:
+            str: The cursor token
+        """
+        cursor = cursor or secrets.token_urlsafe(12)
+        self._cursors.set(cursor, dict(state))
+        session = _session_of(ctx)
+        if session is not None:
+            # The weakref guards against a new session reusing a dead session's id()
+            self._sessions.set(id(session), (weakref.ref(session), cursor))
+        return cursor
+
+    def load(self, cursor=None, ctx=None):
+        """
+        Look up the pagination state by explicit cursor or by the calling session.
+
+        Returns:
+            tuple: (cursor, state), or (None, None) if there is no such search
+        """
+        if not cursor:
+            session = _session_of(ctx)
+            entry = self._sessions.get(id(session)) if session is not None else None
+            if entry is None or entry[0]() is not session:
+                return None, None
+            cursor = entry[1]
+        state = self._cursors.get(cursor)
+        if state is None:
+            logger.info(f"Pagination cursor not found or expired: {cursor}")
+            return None, None
+        return cursor, dict(state)
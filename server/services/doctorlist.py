@@ -1,72 +1,151 @@
-from mcp.server.fastmcp import FastMCP
-import http.client
-import json
+from mcp.server.fastmcp import FastMCP, Context
 from urllib.parse import quote
 import logging
+import os
+from cache import TTLCache
+from cursors import CursorStore
+from gateway import gateway_get_items
+from provider_index import ProviderIndex, get_shared_index
+from records import ProviderRecord
+from specialties import classify_specialty, filter_by_specialty, specialty_search_term
+from zipgeo import rank_by_distance
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 mcp = FastMCP("doctor_list")
 
-global_context = {
-    "current_zip": None,
-    "current_doctor_name": None,
-    "current_page": 1,
-    "items_per_page": 5
-}
+# Pagination state per MCP session / cursor token
+doctor_cursors = CursorStore()
+
+PROVIDER_TYPE = "Individual"
+PLAN_YEAR = 2024
+LOCAL_MATCH_LIMIT = 50
+# Nobody pages past a few hundred results; stop reading broad searches there (0 = no limit)
+PROVIDER_RESULT_LIMIT = int(os.getenv("PROVIDER_RESULT_LIMIT", "1000")) or None
+
+# Filtered result lists per search, so page navigation does not refetch them
+_search_cache = TTLCache(
+    maxsize=int(os.getenv("PROVIDER_SEARCH_CACHE_SIZE", "1000")),
+    ttl=int(os.getenv("PROVIDER_SEARCH_CACHE_TTL", "900")),
+    shared="doctor_search",
+)
 
 # Import check_zip_code_validity safely
 try:
     from zipcode import check_zip_code_validity
 except ImportError as e:
     logger.error(f"Failed to import check_zip_code_validity: {e}")
-    def check_zip_code_validity(zip_code):
+    async def check_zip_code_validity(zip_code):
         logger.warning("check_zip_code_validity not available; returning False")
         return False
 
-def fetch_doctor(query, zipcode):
+async def fetch_doctor(query, zipcode, limit=PROVIDER_RESULT_LIMIT):
     logger.info(f"Fetching doctors with query: '{query}', zipcode: '{zipcode}'")
-    conn = None
     try:
-        conn = http.client.HTTPSConnection('gateway-dev.nextere.com')
-        headers = {"accept": "application/json"}
         encoded_query = quote(query or "")
-        endpoint = f"/api/quotingtool-service/provider-and-drug-coverage/search-providers-all?zipcode={zipcode}&query={encoded_query}&year=2024&providerType=Individual"
+        endpoint = f"/api/quotingtool-service/provider-and-drug-coverage/search-providers-all?zipcode={zipcode}&query={encoded_query}&year={PLAN_YEAR}&providerType={PROVIDER_TYPE}"
         logger.debug(f"Requesting endpoint: {endpoint}")
-        conn.request("GET", endpoint, headers=headers)
-        res = conn.getresponse()
-        data = res.read().decode("utf-8")
-        logger.debug(f"Response status: {res.status}, data: {data}")
-        if res.status == 200:
-            json_data = json.loads(data)
+        # Parsed while streaming; only the displayed fields of each doctor are kept
+        res, json_data = await gateway_get_items(endpoint, project=ProviderRecord.from_item, limit=limit)
+        logger.debug(f"Response status: {res.status_code}")
+        if res.status_code == 200:
             if not json_data:
                 logger.warning("Empty response from API")
                 return []
             logger.info(f"Successfully fetched {len(json_data)} doctors")
             return json_data
         else:
-            logger.error(f"HTTP error occurred: {res.status} {res.reason}")
+            logger.error(f"HTTP error occurred: {res.status_code} {res.reason_phrase}")
             return []
     except Exception as e:
         logger.error(f"Error fetching doctor list: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
-@mcp.tool()
-async def get_doctors_by_zipcode(doctor_name: str, zipcode: str, page: int = 1, items_per_page: int = 5) -> dict:
-    logger.info(
-        f"Tool get_doctors_by_zipcode called with doctor_name: '{doctor_name}', zipcode: '{zipcode}', page: {page}, items_per_page: {items_per_page}"
-    )
-    
-    # Update global context
-    global_context["current_doctor_name"] = doctor_name or ""
-    global_context["current_zip"] = zipcode
-    global_context["current_page"] = page
-    global_context["items_per_page"] = items_per_page
-    
-    if not zipcode or not zipcode.isdigit() or len(zipcode) != 5 or not check_zip_code_validity(zipcode):
+async def search_doctors(doctor_name, zipcode, max_miles=None):
+    """
+    Fetch and filter the doctors for a search.
+
+    Results are cached per (query, zipcode, providerType, year, max_miles), so every
+    page of the same search is served from memory. Failed or empty fetches are not
+    cached. Name searches are ordered by match quality, specialty searches
+    (recognised through the specialty index) are narrowed to doctors with that
+    specialty and ordered nearest-first to the zip code.
+
+    At most PROVIDER_RESULT_LIMIT doctors are kept. Name searches stop reading
+    the gateway there, so they rank the gateway's first results; specialty searches
+    apply the cap after filtering. Pagination totals count the capped list.
+
+    Args:
+        doctor_name (str): Doctor name or specialty
+        zipcode (str): 5 digit zip code
+        max_miles (float): Optional maximum distance from the zip code
+
+    Returns:
+        list: Matching doctor records
+    """
+    key = ((doctor_name or "").strip().lower(), zipcode, PROVIDER_TYPE, PLAN_YEAR, max_miles)
+    cached = await _search_cache.aget(key)
+    if cached is not None:
+        logger.info(f"Serving {len(cached)} cached doctors for query: '{doctor_name}', zipcode: '{zipcode}'")
+        return cached
+
+    specialties = classify_specialty(doctor_name) if doctor_name else None
+    # Specialty searches are read in full and capped after filtering, so the cap
+    # does not keep an arbitrary prefix of the gateway's results
+    limit = None if specialties else PROVIDER_RESULT_LIMIT
+    all_doctors = await fetch_doctor(doctor_name, zipcode, limit=limit)
+    if specialties and not all_doctors and specialty_search_term(specialties).lower() != doctor_name.strip().lower():
+        # "heart doctor", "family doctor": ask the gateway for the specialty's own name
+        all_doctors = await fetch_doctor(specialty_search_term(specialties), zipcode, limit=limit)
+    shared_index = get_shared_index(PROVIDER_TYPE)
+    shared_index.add_all(all_doctors)
+
+    if specialties:
+        matching = filter_by_specialty(all_doctors, specialties)
+        logger.info(f"Kept {len(matching)} of {len(all_doctors)} doctors with specialty: {sorted(specialties)}")
+        # Unrecognised specialty labels in the response: trust the gateway's own match
+        all_doctors = (matching or all_doctors)[:PROVIDER_RESULT_LIMIT]
+
+    # Rank doctors by name if a specific name is provided (exclude specialty searches)
+    name_search = bool(doctor_name) and specialties is None
+    if name_search:
+        if all_doctors:
+            index = ProviderIndex()
+            index.add_all(all_doctors)
+            all_doctors = index.search(doctor_name)
+            logger.info(f"Filtered to {len(all_doctors)} doctors matching name: '{doctor_name}'")
+        if not all_doctors:
+            # Typos and reordered names: look among providers already seen near this zip
+            all_doctors = shared_index.search(
+                doctor_name,
+                limit=LOCAL_MATCH_LIMIT,
+                predicate=lambda doc: str(doc.zipcode)[:3] == zipcode[:3],
+            )
+            logger.info(f"Found {len(all_doctors)} doctors matching name locally: '{doctor_name}'")
+
+    all_doctors = rank_by_distance(all_doctors, zipcode, max_miles=max_miles, sort=not name_search)
+    if not all_doctors:
+        return []
+
+    all_doctors = tuple(all_doctors)
+    _search_cache.set(key, all_doctors)
+    return all_doctors
+
+async def build_doctor_page(doctor_name, zipcode, page=1, items_per_page=5, max_miles=None):
+    """
+    Build one page of doctor results for a search.
+
+    Args:
+        doctor_name (str): Doctor name or specialty
+        zipcode (str): 5 digit zip code
+        page (int): Page number, clamped to the available pages
+        items_per_page (int): Number of doctors per page
+        max_miles (float): Optional maximum distance from the zip code
+
+    Returns:
+        dict: "doctors" and "pagination", or "needs_input"/"error" if the search failed
+    """
+    if not zipcode or not zipcode.isdigit() or len(zipcode) != 5 or not await check_zip_code_validity(zipcode):
         logger.warning(f"Invalid zipcode: '{zipcode}'")
         return {
             "needs_input": "zipcode",
@@ -74,7 +153,7 @@ async def get_doctors_by_zipcode(doctor_name: str, zipcode: str, page: int = 1,
         }
     
     # Get all doctors matching the search
-    all_doctors = fetch_doctor(doctor_name, zipcode)
+    all_doctors = await search_doctors(doctor_name, zipcode, max_miles)
     
     if not all_doctors:
         logger.warning(f"No doctors found for query: '{doctor_name}', zipcode: '{zipcode}'")
@@ -82,14 +161,6 @@ async def get_doctors_by_zipcode(doctor_name: str, zipcode: str, page: int = 1,
             "error": "No doctors found for your search. Please try a different name or specialty."
         }
     
-    # Filter doctors if a specific name is provided (exclude specialty searches)
-    if doctor_name and not any(s.lower() in doctor_name.lower() for s in ["cardiologist", "general", "pediatrician"]):
-        all_doctors = [
-            doc for doc in all_doctors
-            if doctor_name.lower() in doc.get("provider", {}).get("name", "").lower()
-        ]
-        logger.info(f"Filtered to {len(all_doctors)} doctors matching name: '{doctor_name}'")
-    
     # Calculate pagination details
     total_items = len(all_doctors)
     total_pages = (total_items + items_per_page - 1) // items_per_page
@@ -108,25 +179,7 @@ async def get_doctors_by_zipcode(doctor_name: str, zipcode: str, page: int = 1,
     current_page_doctors = all_doctors[start_idx:end_idx]
     
     # Format the doctor data
-    formatted_doctors = []
-    for doc in current_page_doctors:
-        provider = doc.get("provider", {})
-        address = doc.get("address", {})
-        name = provider.get("name", "N/A")
-        phone = address.get("phone", "N/A")
-        specialties = ", ".join(provider.get("specialties", [])) or "N/A"
-        street1 = address.get("street1", "")
-        street2 = address.get("street2", "")
-        city = address.get("city", "")
-        state = address.get("state", "")
-        zipcode = address.get("zipcode", "")
-        full_address = f"{street1} {street2}, {city}, {state} {zipcode}".strip().replace(" ,", ",")
-        formatted_doctors.append({
-            "name": name,
-            "phone": phone,
-            "specialties": specialties,
-            "address": full_address
-        })
+    formatted_doctors = [doc.to_doctor() for doc in current_page_doctors]
     
     logger.info(f"Returning {len(formatted_doctors)} doctors for page {page}")
     
@@ -145,77 +198,102 @@ async def get_doctors_by_zipcode(doctor_name: str, zipcode: str, page: int = 1,
         "pagination": pagination
     }
 
+async def show_doctor_page(state, ctx, cursor=None):
+    """Build the page described by a cursor state and remember it for the session."""
+    result = await build_doctor_page(
+        state["doctor_name"], state["zipcode"], state["page"], state["items_per_page"], state.get("max_miles")
+    )
+    if "pagination" in result:
+        state["page"] = result["pagination"]["current_page"]
+        result["cursor"] = doctor_cursors.save(state, ctx, cursor)
+    return result
+
+@mcp.tool()
+async def get_doctors_by_zipcode(doctor_name: str, zipcode: str, page: int = 1, items_per_page: int = 5, max_miles: float = None, ctx: Context = None) -> dict:
+    logger.info(
+        f"Tool get_doctors_by_zipcode called with doctor_name: '{doctor_name}', zipcode: '{zipcode}', page: {page}, items_per_page: {items_per_page}"
+    )
+    state = {
+        "doctor_name": doctor_name or "",
+        "zipcode": zipcode,
+        "page": page,
+        "items_per_page": items_per_page,
+        "max_miles": max_miles,
+    }
+    return await show_doctor_page(state, ctx)
+
 @mcp.tool()
-async def next_page(items_per_page: int = None) -> dict:
+async def next_page(items_per_page: int = None, cursor: str = None, ctx: Context = None) -> dict:
     """Get the next page of doctor results.
     
     Args:
         items_per_page: Optional - Number of doctors per page
+        cursor: Optional - Cursor returned by the doctor search (defaults to this conversation's last search)
         
     Returns:
         Dictionary with doctors and pagination metadata
     """
     logger.info(f"Tool next_page called with items_per_page: {items_per_page}")
-    current_doctor_name = global_context.get("current_doctor_name")
-    current_zip = global_context.get("current_zip")
-    current_page = global_context.get("current_page", 1)
+    cursor, state = doctor_cursors.load(cursor, ctx)
     
-    if not current_doctor_name or not current_zip:
-        logger.error("No previous doctor search found in global_context")
+    if not state or not state.get("doctor_name") or not state.get("zipcode"):
+        logger.error("No previous doctor search found for this session")
         return {"error": "No previous doctor search found. Please search for doctors first."}
     
     # Use current items_per_page if not specified
-    if items_per_page is None:
-        items_per_page = global_context.get("items_per_page", 5)
+    if items_per_page is not None:
+        state["items_per_page"] = items_per_page
+    state["page"] += 1
     
-    return await get_doctors_by_zipcode(current_doctor_name, current_zip, current_page + 1, items_per_page)
+    return await show_doctor_page(state, ctx, cursor)
 
 @mcp.tool()
-async def previous_page(items_per_page: int = None) -> dict:
+async def previous_page(items_per_page: int = None, cursor: str = None, ctx: Context = None) -> dict:
     """Get the previous page of doctor results.
     
     Args:
         items_per_page: Optional - Number of doctors per page
+        cursor: Optional - Cursor returned by the doctor search (defaults to this conversation's last search)
         
     Returns:
         Dictionary with doctors and pagination metadata
     """
     logger.info(f"Tool previous_page called with items_per_page: {items_per_page}")
-    current_doctor_name = global_context.get("current_doctor_name")
-    current_zip = global_context.get("current_zip")
-    current_page = global_context.get("current_page", 1)
+    cursor, state = doctor_cursors.load(cursor, ctx)
     
-    if not current_doctor_name or not current_zip:
-        logger.error("No previous doctor search found in global_context")
+    if not state or not state.get("doctor_name") or not state.get("zipcode"):
+        logger.error("No previous doctor search found for this session")
         return {"error": "No previous doctor search found. Please search for doctors first."}
     
     # Use current items_per_page if not specified
-    if items_per_page is None:
-        items_per_page = global_context.get("items_per_page", 5)
+    if items_per_page is not None:
+        state["items_per_page"] = items_per_page
+    state["page"] -= 1
     
-    return await get_doctors_by_zipcode(current_doctor_name, current_zip, current_page - 1, items_per_page)
+    return await show_doctor_page(state, ctx, cursor)
 
 @mcp.tool()
-async def go_to_page(page_num: int, items_per_page: int = None) -> dict:
+async def go_to_page(page_num: int, items_per_page: int = None, cursor: str = None, ctx: Context = None) -> dict:
     """Go to a specific page of doctor results.
     
     Args:
         page_num: Page number to navigate to
         items_per_page: Optional - Number of doctors per page
+        cursor: Optional - Cursor returned by the doctor search (defaults to this conversation's last search)
         
     Returns:
         Dictionary with doctors and pagination metadata
     """
     logger.info(f"Tool go_to_page called with page_num: {page_num}, items_per_page: {items_per_page}")
-    current_doctor_name = global_context.get("current_doctor_name")
-    current_zip = global_context.get("current_zip")
+    cursor, state = doctor_cursors.load(cursor, ctx)
     
-    if not current_doctor_name or not current_zip:
-        logger.error("No previous doctor search found in global_context")
+    if not state or not state.get("doctor_name") or not state.get("zipcode"):
+        logger.error("No previous doctor search found for this session")
         return {"error": "No previous doctor search found. Please search for doctors first."}
     
     # Use current items_per_page if not specified
-    if items_per_page is None:
-        items_per_page = global_context.get("items_per_page", 5)
+    if items_per_page is not None:
+        state["items_per_page"] = items_per_page
+    state["page"] = page_num
     
-    return await get_doctors_by_zipcode(current_doctor_name, current_zip, page_num, items_per_page)
\ No newline at end of file
+    return await show_doctor_page(state, ctx, cursor)
\ No newline at end of file
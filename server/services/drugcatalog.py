@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import string
+import struct
+import threading
+from urllib.parse import quote
+
+from records import MedicineRecord
+from sortedtable import SortedTable, pad, write_table
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+# Record layout: normalized name key (48 bytes) | blob offset (uint32) | blob length (uint32).
+# Every word of a drug name gets a key, so "calcium" finds "atorvastatin calcium".
+KEY_WIDTH = 48
+POINTER = struct.Struct("<II")
+RECORD_WIDTH = KEY_WIDTH + POINTER.size
+
+# The gateway's autocomplete result cap: a list this long may have been cut off.
+# Catalog lookups return at most as many, so both sources answer alike.
+AUTOCOMPLETE_LIMIT = int(os.getenv("MEDICINE_AUTOCOMPLETE_LIMIT", "20"))
+CATALOG_RESULT_LIMIT = AUTOCOMPLETE_LIMIT
+
+# Characters a drug name can continue with after a prefix
+PREFIX_ALPHABET = string.ascii_lowercase + string.digits + " -"
+# Share of crawled prefixes that may fail before a snapshot is given up
+CRAWL_MAX_SKIPPED = 0.02
+
+AUTOCOMPLETE_ENDPOINT = "/api/quotingtool-service/provider-and-drug-coverage/drugs-by-name-autocomplete"
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+class CrawlFailed(Exception):
+    """Too many autocomplete requests failed for the crawl to be a usable snapshot."""
+
+
+def normalize_drug_name(name):
+    """Lowercase a drug name and reduce punctuation to single spaces."""
+    return " ".join(_NON_ALNUM.sub(" ", (name or "").lower()).split())
+
+
+def catalog_path(year):
+    return os.path.join(os.getenv("DRUG_CATALOG_DIR", DEFAULT_CATALOG_DIR), f"drugs_{year}.idx")
+
+
+def get_drug_catalog(year):
+    """Open the catalog snapshot for a plan year once per process; None when it is not installed."""
+    if year in _catalogs:
+        return _catalogs[year]
+    with _catalogs_lock:
+        if year not in _catalogs:
+            path = catalog_path(year)
+            catalog = None
+            if os.path.exists(path):
+                try:
+                    catalog = SortedTable(path)
+                    logger.info(f"Loaded drug catalog with {len(catalog)} keys from {path}")
+                except Exception as e:
+                    logger.error(f"Error loading drug catalog {path}: {e}")
+            else:
+                logger.info(f"No drug catalog found at {path}; medicine lookups will use the gateway")
+            _catalogs[year] = catalog
+    return _catalogs[year]
+
+
+def lookup_drugs(query, year, limit=CATALOG_RESULT_LIMIT):
+    """
+    Look up drugs whose name has a word starting with the query.
+
+    This is narrower than the gateway, which also matches inside words: with a
+    catalog installed "statin" finds nothing, while the gateway would return
+    "atorvastatin". Word prefixes are what users type into autocomplete, and a
+    substring scan would not be a table lookup.
+
+    Args:
+        query (str): What the user typed (e.g. "lipi")
+        year (int): Plan year of the catalog
+        limit (int): Most records to return
+
+    Returns:
+        tuple: MedicineRecord results in name order, or None if there is no catalog
+               for the year or nothing in it matches
+    """
+    catalog = get_drug_catalog(year)
+    query = normalize_drug_name(query)
+    if catalog is None or not query:
+        return None
+    key = query.encode("utf-8")[:KEY_WIDTH]
+    seen = set()
+    medicines = []
+    for record in catalog.prefix(key):
+        offset, length = POINTER.unpack_from(record, KEY_WIDTH)
+        if offset in seen:
+            continue
+        name, strength, full_name = json.loads(catalog.blob(offset, length))
+        # Keys are truncated to KEY_WIDTH; check long queries against the whole name
+        if len(query) > KEY_WIDTH and query not in normalize_drug_name(name):
+            continue
+        seen.add(offset)
+        medicines.append(MedicineRecord(name, strength, full_name))
+        if len(medicines) >= limit:
+            break
+    return tuple(medicines) or None
+
+
+def _read_drugs(path):
+    """Read gateway drug items from a JSON list or a JSONL file."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                line = line.strip()
+                if line:
+                    row = json.loads(line)
+                    yield from (row if isinstance(row, list) else [row])
+            return
+        yield from json.load(f)
+
+
+def build_catalog(items, output_path):
+    """
+    Write a catalog snapshot from gateway drug items.
+
+    Duplicate (name, strength, full name) entries are dropped. Each entry's fields
+    are stored once in the blob region and pointed to by one key per name word.
+    """
+    blob = bytearray()
+    rows = []
+    seen = set()
+    for item in items:
+        medicine = MedicineRecord.from_item(item)
+        entry = (medicine.name, medicine.strength, medicine.full_name)
+        if entry in seen or not isinstance(medicine.name, str):
+            continue
+        seen.add(entry)
+        data = json.dumps(entry, separators=(",", ":")).encode("utf-8")
+        pointer = POINTER.pack(len(blob), len(data))
+        blob += data
+        words = normalize_drug_name(medicine.name).split()
+        for i in range(len(words)):
+            key = pad(" ".join(words[i:]), KEY_WIDTH)
+            rows.append((key, key + pointer))
+    # Same-key records keep insertion order because the sort in write_table is stable
+    return write_table(output_path, rows, KEY_WIDTH, RECORD_WIDTH, bytes(blob))
+
+
+async def crawl_catalog(year, max_results=AUTOCOMPLETE_LIMIT, concurrency=8, max_skipped=CRAWL_MAX_SKIPPED):
+    """
+    Collect the drug catalog for a plan year from the autocomplete endpoint.
+
+    Every two-letter prefix is queried; prefixes whose result list reaches
+    `max_results` (and may be cut off) are extended by one more character:
+    a letter, digit, space or hyphen ("vitamin b1", "co-trimoxazole").
+
+    A prefix whose request fails is logged and skipped; the crawl only fails
+    when more than `max_skipped` of all prefixes were skipped.
+
+    Returns:
+        list: Raw gateway drug items, possibly with duplicates
+
+    Raises:
+        CrawlFailed: If too many prefixes could not be crawled
+    """
+    from gateway import gateway_get
+
+    semaphore = asyncio.Semaphore(concurrency)
+    items = []
+    queried = []
+    skipped = []
+
+    async def crawl(prefix):
+        queried.append(prefix)
+        try:
+            async with semaphore:
+                res = await gateway_get(f"{AUTOCOMPLETE_ENDPOINT}?name={quote(prefix)}&year={year}")
+            if res.status_code != 200:
+                raise ValueError(f"{res.status_code} {res.reason_phrase}")
+            found = res.json() or []
+        except Exception as e:
+            logger.warning(f"Skipping prefix '{prefix}': {e}")
+            skipped.append(prefix)
+            return
+        items.extend(found)
+        if len(found) >= max_results and len(prefix) < KEY_WIDTH:
+            # No name has two separators in a row
+            alphabet = string.ascii_lowercase + string.digits if prefix[-1] in " -" else PREFIX_ALPHABET
+            await asyncio.gather(*(crawl(prefix + char) for char in alphabet))
+
+    await asyncio.gather(*(crawl(a + b) for a in string.ascii_lowercase for b in string.ascii_lowercase))
+    logger.info(f"Crawled {len(items)} drug items for {year}; skipped {len(skipped)} of {len(queried)} prefixes")
+    if len(skipped) > max_skipped * len(queried):
+        raise CrawlFailed(f"{len(skipped)} of {len(queried)} prefixes failed, e.g. {sorted(skipped)[:5]}")
+    return items
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Snapshot or query the offline drug catalog.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build the catalog from a JSON or JSONL dump of gateway drug items")
+    build.add_argument("input")
+    build.add_argument("--year", type=int, required=True)
+    build.add_argument("-o", "--output")
+    snapshot = commands.add_parser("snapshot", help="Crawl the gateway autocomplete endpoint into a catalog")
+    snapshot.add_argument("--year", type=int, required=True)
+    snapshot.add_argument("--max-results", type=int, default=AUTOCOMPLETE_LIMIT,
+                          help="Result count at which the gateway may have cut a list off")
+    snapshot.add_argument("--concurrency", type=int, default=8)
+    snapshot.add_argument("--max-skipped", type=float, default=CRAWL_MAX_SKIPPED,
+                          help="Share of prefixes that may fail before the snapshot is abandoned")
+    snapshot.add_argument("-o", "--output")
+    lookup = commands.add_parser("lookup", help="Look up a drug name prefix in the catalog")
+    lookup.add_argument("query")
+    lookup.add_argument("--year", type=int, required=True)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_catalog(_read_drugs(args.input), args.output or catalog_path(args.year))
+    elif args.command == "snapshot":
+        items = asyncio.run(crawl_catalog(args.year, args.max_results, args.concurrency, args.max_skipped))
+        build_catalog(items, args.output or catalog_path(args.year))
+    else:
+        print(json.dumps([medicine.to_medicine() for medicine in lookup_drugs(args.query, args.year) or []], indent=2))
@@ -0,0 +1,378 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import Counter
+
+import httpx
+
+from metrics import observe_gateway
+
+logger = logging.getLogger(__name__)
+
+GATEWAY_HOST = os.getenv("GATEWAY_HOST", "gateway-dev.nextere.com")
+GATEWAY_BASE_URL = f"https://{GATEWAY_HOST}"
+
+# Timeouts are in seconds; connection limits apply to the single gateway host.
+GATEWAY_TIMEOUT = float(os.getenv("GATEWAY_TIMEOUT", "30"))
+GATEWAY_CONNECT_TIMEOUT = float(os.getenv("GATEWAY_CONNECT_TIMEOUT", "5"))
+GATEWAY_MAX_CONNECTIONS = int(os.getenv("GATEWAY_MAX_CONNECTIONS", "100"))
+GATEWAY_MAX_KEEPALIVE = int(os.getenv("GATEWAY_MAX_KEEPALIVE", "20"))
+GATEWAY_KEEPALIVE_EXPIRY = float(os.getenv("GATEWAY_KEEPALIVE_EXPIRY", "30"))
+
+# Timeouts per endpoint (last path segment), in seconds; anything else uses
+# GATEWAY_TIMEOUT. Each is both httpx's read timeout and a deadline for the whole
+# attempt, so a server trickling bytes cannot hold a call open past it.
+# GATEWAY_ENDPOINT_TIMEOUTS="search-providers-all=30,..." overrides.
+ENDPOINT_TIMEOUTS = {
+    "zip-by-details": 5.0,
+    "drugs-by-name-autocomplete": 5.0,
+    "agent-available-date": 10.0,
+    "household-eligibility-estimates": 15.0,
+    "lowest-cost-bronze-plan-aI": 15.0,
+    "search-providers-all": 20.0,
+    "appointment": 20.0,
+}
+for _override in filter(None, os.getenv("GATEWAY_ENDPOINT_TIMEOUTS", "").split(",")):
+    _name, _, _seconds = _override.partition("=")
+    ENDPOINT_TIMEOUTS[_name.strip()] = float(_seconds)
+
+# GETs are retried on timeouts, connection errors and these statuses; POSTs never are
+GATEWAY_GET_RETRIES = int(os.getenv("GATEWAY_GET_RETRIES", "2"))
+GATEWAY_RETRY_BACKOFF = float(os.getenv("GATEWAY_RETRY_BACKOFF", "0.2"))
+RETRY_STATUSES = {502, 503, 504}
+
+# An endpoint's circuit opens after this many failures in a row and lets one trial
+# request through after GATEWAY_BREAKER_RESET seconds
+GATEWAY_BREAKER_FAILURES = int(os.getenv("GATEWAY_BREAKER_FAILURES", "5"))
+GATEWAY_BREAKER_RESET = float(os.getenv("GATEWAY_BREAKER_RESET", "30"))
+
+# Send a second copy of a slow request after this many seconds (0 = no hedging)
+GATEWAY_HEDGE_DELAY = float(os.getenv("GATEWAY_HEDGE_DELAY", "0"))
+HEDGED_ENDPOINTS = {"search-providers-all"}
+
+_client = None
+_client_loop = None
+
+
+def get_client():
+    """
+    Return the shared async client for the gateway.
+
+    One pooled client is kept per process. It is bound to the running event loop,
+    so a new one is created if the loop changes (e.g. between asyncio.run calls).
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            base_url=GATEWAY_BASE_URL,
+            headers={"accept": "application/json"},
+            timeout=httpx.Timeout(GATEWAY_TIMEOUT, connect=GATEWAY_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=GATEWAY_MAX_CONNECTIONS,
+                max_keepalive_connections=GATEWAY_MAX_KEEPALIVE,
+                keepalive_expiry=GATEWAY_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _client_loop = loop
+    return _client
+
+
+class GatewayUnavailable(Exception):
+    """Raised without contacting the gateway while an endpoint's circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breaker. While half open a single trial request is let
+    through; `allow` hands its caller a token, and only the holder of the trial
+    token can end the trial early by failing or being cancelled.
+    """
+
+    CLOSED = "closed"
+
+    def __init__(self, failures=GATEWAY_BREAKER_FAILURES, reset_after=GATEWAY_BREAKER_RESET):
+        self.threshold = failures
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.trial = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_after else "open"
+
+    def allow(self):
+        """A token for the request (the trial's own while half open), or None if it must not be sent."""
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.state == "half_open" and self.trial is None:
+            self.trial = object()
+            return self.trial
+        return None
+
+    def success(self, token=None):
+        self.failures = 0
+        self.opened_at = None
+        self.trial = None
+
+    def failure(self, token=None):
+        self.failures += 1
+        is_trial = token is not None and token is self.trial
+        if is_trial or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+        if is_trial:
+            self.trial = None
+
+    def release(self, token):
+        """Give back the trial slot if `token` holds it and its request was cancelled."""
+        if token is not None and token is self.trial:
+            self.trial = None
+
+
+_breakers = {}
+_stats = {}
+
+
+def endpoint_name(endpoint):
+    return endpoint.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+
+
+def _timeout(name):
+    return httpx.Timeout(ENDPOINT_TIMEOUTS.get(name, GATEWAY_TIMEOUT), connect=GATEWAY_CONNECT_TIMEOUT)
+
+
+class GatewayTimeout(httpx.TimeoutException):
+    """An attempt ran past its endpoint's deadline."""
+
+
+async def _hedged(send, delay, stats):
+    """Run `send`, starting a second copy if the first has not finished after `delay`."""
+    first = asyncio.ensure_future(send())
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return first.result()
+        stats["hedged"] += 1
+        tasks.add(asyncio.ensure_future(send()))
+        error = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _call(endpoint, send, retries=0, hedge=False):
+    """
+    Run one gateway request through the endpoint's circuit breaker, with retries.
+
+    Each attempt, hedged copy included, must finish within the endpoint's timeout.
+
+    Args:
+        endpoint (str): Path and query string, used to pick timeout, breaker and stats
+        send (callable): Returns a coroutine sending the request; its result is an
+                         httpx.Response or a tuple starting with one
+        retries (int): Extra attempts on timeouts, connection errors and 502/503/504
+        hedge (bool): Allow a hedged second request after GATEWAY_HEDGE_DELAY
+
+    Returns:
+        The result of `send`
+    """
+    name = endpoint_name(endpoint)
+    breaker = _breakers.setdefault(name, CircuitBreaker())
+    stats = _stats.setdefault(name, Counter())
+    deadline = ENDPOINT_TIMEOUTS.get(name, GATEWAY_TIMEOUT)
+    for attempt in range(retries + 1):
+        token = breaker.allow()
+        if token is None:
+            stats["circuit_open"] += 1
+            raise GatewayUnavailable(f"Gateway endpoint {name} is failing; not sending requests for now")
+        started = time.monotonic()
+        error = None
+        result = None
+        try:
+            async with asyncio.timeout(deadline):
+                if hedge and GATEWAY_HEDGE_DELAY > 0:
+                    result = await _hedged(send, GATEWAY_HEDGE_DELAY, stats)
+                else:
+                    result = await send()
+        except asyncio.CancelledError:
+            breaker.release(token)
+            raise
+        except TimeoutError:
+            outcome, error = "timeout", GatewayTimeout(f"Gateway {name} did not finish within {deadline}s")
+        except httpx.TimeoutException as e:
+            outcome, error = "timeout", e
+        except httpx.TransportError as e:
+            outcome, error = "transport_error", e
+        except Exception as e:
+            outcome, error = "error", e
+        else:
+            status = (result[0] if isinstance(result, tuple) else result).status_code
+            outcome = "server_error" if status >= 500 else "client_error" if status >= 400 else "ok"
+        elapsed = time.monotonic() - started
+        stats[outcome] += 1
+        stats["requests"] += 1
+        stats["latency_seconds"] += elapsed
+        observe_gateway(name, outcome if error is not None else status, elapsed)
+
+        if outcome in ("ok", "client_error"):
+            breaker.success(token)
+            return result
+        breaker.failure(token)
+        retryable = outcome in ("timeout", "transport_error") or (outcome == "server_error" and status in RETRY_STATUSES)
+        if attempt == retries or not retryable:
+            if error is not None:
+                raise error
+            return result
+        stats["retries"] += 1
+        delay = GATEWAY_RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5)
+        logger.warning(f"Gateway {name} {outcome}; retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+
+def get_gateway_stats():
+    """Per-endpoint request outcomes, latency totals and circuit state."""
+    return {
+        name: {**stats, "latency_seconds": round(stats["latency_seconds"], 3), "circuit": _breakers[name].state}
+        for name, stats in _stats.items()
+    }
+
+
+async def gateway_get(endpoint):
+    """
+    Send a GET request to the gateway, retrying transient failures.
+
+    Args:
+        endpoint (str): Path and already-encoded query string
+
+    Returns:
+        httpx.Response: The gateway response (any status code)
+    """
+    timeout = _timeout(endpoint_name(endpoint))
+    return await _call(endpoint, lambda: get_client().get(endpoint, timeout=timeout), retries=GATEWAY_GET_RETRIES)
+
+
+async def gateway_post(endpoint, payload):
+    """
+    Send a JSON POST request to the gateway (never retried).
+
+    Args:
+        endpoint (str): Path and already-encoded query string
+        payload (dict): JSON body
+
+    Returns:
+        httpx.Response: The gateway response (any status code)
+    """
+    timeout = _timeout(endpoint_name(endpoint))
+    return await _call(endpoint, lambda: get_client().post(endpoint, json=payload, timeout=timeout))
+
+
+_decoder = json.JSONDecoder()
+
+
+async def iter_json_array(chunks):
+    """
+    Incrementally parse a top-level JSON array from an async iterator of text chunks.
+
+    Each element is yielded as soon as it has been fully received, so the whole
+    body never has to be held in memory. A body that is not an array is parsed
+    as a whole and yields its elements only if it turns out to be a list.
+    """
+    buffer = ""
+    started = False
+    whole = None
+    async for chunk in chunks:
+        if whole is not None:
+            whole.append(chunk)
+            continue
+        buffer += chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    whole = [buffer[pos:]]
+                    break
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                item, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # element not complete yet
+            # A number or literal may go on in the next chunk ("12" | "34", "1." | "5"):
+            # only take an element once the delimiter after it has arrived
+            after = end
+            while after < len(buffer) and buffer[after] in " \t\r\n":
+                after += 1
+            if after >= len(buffer) or buffer[after] not in ",]":
+                break
+            pos = end
+            yield item
+        buffer = buffer[pos:] if whole is None else ""
+    if whole is not None:
+        data = json.loads("".join(whole))
+        for item in data if isinstance(data, list) else []:
+            yield item
+    elif started:
+        raise ValueError("Truncated JSON array in gateway response")
+
+
+async def gateway_get_items(endpoint, project=None, limit=None):
+    """
+    Stream a GET response that holds a JSON array, keeping only what is needed.
+
+    Args:
+        endpoint (str): Path and already-encoded query string
+        project (callable): Optional function reducing each element to the fields
+                            that are used, applied while the body is being read
+        limit (int): Stop reading once this many elements have been collected. The
+                     cap applies to the gateway's order, before any filtering by
+                     the caller, so callers that filter should pass None and cap
+                     their own filtered results instead
+
+    Returns:
+        tuple: (httpx.Response, list of elements, or None if the status was not 200)
+    """
+    name = endpoint_name(endpoint)
+    timeout = _timeout(name)
+
+    async def read():
+        async with get_client().stream("GET", endpoint, timeout=timeout) as res:
+            if res.status_code != 200:
+                await res.aread()
+                return res, None
+            items = []
+            async for item in iter_json_array(res.aiter_text()):
+                items.append(project(item) if project else item)
+                if limit is not None and len(items) >= limit:
+                    logger.info(f"Stopped reading {endpoint} after {limit} items")
+                    break
+            return res, items
+
+    return await _call(endpoint, read, retries=GATEWAY_GET_RETRIES, hedge=name in HEDGED_ENDPOINTS)
+
+
+async def close_client():
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
@@ -1,22 +1,37 @@
 from mcp.server.fastmcp import FastMCP
+import asyncio
 import logging
 import json
 import requests
 from zipcode import fetchCountyData
-import urllib.parse
+import os
+from shortlinks import compact_encode, get_shortlink_store, plan_listing_url
 
 logger = logging.getLogger(__name__)
 mcp = FastMCP("get_url")
 
-def build_plan_listing_url(user_data):
+# "query": the whole form in the plan listing URL; "compact": compressed form in a
+# link served by this server; "short": fixed-size token stored on this server.
+# compact and short need PLAN_SHORTLINK_BASE_URL, the public URL of this server.
+# compact is the recommended shorter link: it needs no state, so any replica can
+# expand it. short tokens live in a SQLite file on the container that made them
+# and stop resolving after a restart or on other replicas behind the load
+# balancer; use short only with a single replica and a persistent PLAN_SHORTLINK_DB.
+PLAN_URL_MODE = os.getenv("PLAN_URL_MODE", "query").lower()
+PLAN_SHORTLINK_BASE_URL = os.getenv("PLAN_SHORTLINK_BASE_URL", "").rstrip("/")
+if PLAN_URL_MODE == "short":
+    logger.warning("PLAN_URL_MODE=short: links only resolve on this container; use compact with several replicas")
+
+def build_plan_listing_url(user_data, mode=None):
     """
     Build the plan listing URL with user data parameters, using defaults for missing values.
 
     Args:
         user_data (dict): User's healthcare information
+        mode (str): "query", "compact" or "short"; PLAN_URL_MODE if None
 
     Returns:
-        str: Complete URL with encoded form data
+        str: Complete URL with encoded form data, or a link that redirects to it
     """
     try:
         # Define default parameters
@@ -92,13 +107,18 @@ def build_plan_listing_url(user_data):
 
         # Convert to JSON string and URL encode
         form_json = json.dumps(updated_params, separators=(",", ":"))
-        encoded_form = urllib.parse.quote(form_json)
 
-        # Build the complete URL
-        base_url = "https://nexquoting.com/nextere/plan/plan-listing"
-        complete_url = f"{base_url}?form={encoded_form}"
+        mode = (mode or PLAN_URL_MODE).lower()
+        if mode in ("compact", "short") and not PLAN_SHORTLINK_BASE_URL:
+            logger.warning(f"PLAN_SHORTLINK_BASE_URL is not set; building a full URL instead of a {mode} link")
+            mode = "query"
+        if mode == "compact":
+            return f"{PLAN_SHORTLINK_BASE_URL}/plan/c/{compact_encode(form_json)}"
+        if mode == "short":
+            return f"{PLAN_SHORTLINK_BASE_URL}/plan/s/{get_shortlink_store().save(form_json)}"
 
-        return complete_url
+        # Build the complete URL
+        return plan_listing_url(form_json)
 
     except Exception as e:
         logger.error(f"Error building URL: {e}")
@@ -135,8 +155,8 @@ async def generate_plan_listing_url(json_data):
     try:
         print("URL Generator Tool called with data:", json_data)
         
-        # Generate the URL
-        url = build_plan_listing_url(json_data)
+        # Generate the URL (in a thread: short links are saved to SQLite)
+        url = await asyncio.to_thread(build_plan_listing_url, json_data)
         
         if url:
             return {
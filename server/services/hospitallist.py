@@ -1,79 +1,136 @@
-from mcp.server.fastmcp import FastMCP
-import http.client
-import json
+from mcp.server.fastmcp import FastMCP, Context
 from urllib.parse import quote
 import logging
+import os
+from cache import TTLCache
+from cursors import CursorStore
+from gateway import gateway_get_items
+from provider_index import ProviderIndex, get_shared_index
+from records import ProviderRecord
+from zipgeo import rank_by_distance
 
 logger = logging.getLogger(__name__)
 mcp = FastMCP("hospital_list")
 
-global_context = {
-    "current_zip": None,
-    "current_page": 1  # Track the current page
-}
+# Pagination state per MCP session / cursor token
+hospital_cursors = CursorStore()
+
+PROVIDER_TYPE = "Facility"
+PLAN_YEAR = 2024
+LOCAL_MATCH_LIMIT = 50
+# Nobody pages past a few hundred results; stop reading broad searches there (0 = no limit)
+PROVIDER_RESULT_LIMIT = int(os.getenv("PROVIDER_RESULT_LIMIT", "1000")) or None
+
+# Result lists per search, so page navigation does not refetch them
+_search_cache = TTLCache(
+    maxsize=int(os.getenv("PROVIDER_SEARCH_CACHE_SIZE", "1000")),
+    ttl=int(os.getenv("PROVIDER_SEARCH_CACHE_TTL", "900")),
+    shared="hospital_search",
+)
 # Import check_zip_code_validity safely
 try:
     from zipcode import check_zip_code_validity
 except ImportError as e:
     logger.error(f"Failed to import check_zip_code_validity: {e}")
-    def check_zip_code_validity(zip_code):
+    async def check_zip_code_validity(zip_code):
         logger.warning("check_zip_code_validity not available; returning False")
         return False
 
-def fetch_hospital(zipcode, query):
+async def fetch_hospital(zipcode, query, limit=PROVIDER_RESULT_LIMIT):
     try:
-        conn = http.client.HTTPSConnection('gateway-dev.nextere.com')
-        headers = {"accept": "application/json"}
-
         encoded_query = quote(query)
 
-        endpoint = f"/api/quotingtool-service/provider-and-drug-coverage/search-providers-all?zipcode={zipcode}&query={encoded_query}&year=2024&providerType=Facility"
-        conn.request("GET", endpoint, headers=headers)
-        res = conn.getresponse()
-        data = res.read().decode("utf-8")
+        endpoint = f"/api/quotingtool-service/provider-and-drug-coverage/search-providers-all?zipcode={zipcode}&query={encoded_query}&year={PLAN_YEAR}&providerType={PROVIDER_TYPE}"
+        # Parsed while streaming; only the displayed fields of each hospital are kept
+        res, json_data = await gateway_get_items(endpoint, project=ProviderRecord.from_item, limit=limit)
 
-        if res.status == 200:
-            json_data = json.loads(data)
+        if res.status_code == 200:
             return json_data
         else:
-            logger.error(f"HTTP error occurred: {res.status} {res.reason}")
+            logger.error(f"HTTP error occurred: {res.status_code} {res.reason_phrase}")
             return None
     except Exception as e:
         print("error", e)
         logger.error(f"error:{str(e)}")
         return None
     
-@mcp.tool()
-async def get_hospitals_by_zipcode(hospital_name: str, zipcode: str, page: int = 1, items_per_page: int = 5) -> dict:
-    """Find hospitals in your area by name and location with pagination.
-    
+async def search_hospitals(hospital_name, zipcode, max_miles=None):
+    """
+    Fetch the hospitals for a search, cached per (query, zipcode, providerType, year, max_miles).
+
+    Hospitals matching the name come first, then the gateway's other results;
+    each group is ordered nearest-first to the zip code. Only the gateway's first
+    PROVIDER_RESULT_LIMIT results are read, and pagination totals count those.
+    Failed or empty searches are not cached.
+
     Args:
-        hospital_name: Name of hospital or facility (e.g., "Memorial", "General Hospital")
-        zipcode: 5 digit number (e.g., 33601) for location search
-        page: Page number (starting from 1, default: 1)
-        items_per_page: Number of hospitals per page (default: 5)
-    
+        hospital_name (str): Hospital or facility name
+        zipcode (str): 5 digit zip code
+        max_miles (float): Optional maximum distance from the zip code
+
     Returns:
-        Dictionary with hospitals and pagination metadata
+        list: Matching hospital records, or None if the gateway request failed
     """
-    print(
-        f"Tool get_hospitals_by_zipcode called with hospital_name: {hospital_name}, zipcode: {zipcode}, page: {page}, items_per_page: {items_per_page}"
-    )
-    
-    # Update global context
-    global_context["current_hospital_name"] = hospital_name
-    global_context["current_hospital_zip"] = zipcode
-    global_context["current_hospital_page"] = page
-    global_context["hospital_items_per_page"] = items_per_page
-    
-    if not check_zip_code_validity(zipcode):
+    key = ((hospital_name or "").strip().lower(), zipcode, PROVIDER_TYPE, PLAN_YEAR, max_miles)
+    cached = await _search_cache.aget(key)
+    if cached is not None:
+        return cached
+
+    all_hospitals = await fetch_hospital(zipcode, hospital_name)
+    shared_index = get_shared_index(PROVIDER_TYPE)
+    if all_hospitals:
+        shared_index.add_all(all_hospitals)
+        matches = []
+        if hospital_name:
+            # Best name matches first; the gateway's other results follow
+            index = ProviderIndex()
+            index.add_all(all_hospitals)
+            matches = index.search(hospital_name)
+            matched = {id(hospital) for hospital in matches}
+            all_hospitals = [hospital for hospital in all_hospitals if id(hospital) not in matched]
+        all_hospitals = (
+            rank_by_distance(matches, zipcode, max_miles=max_miles)
+            + rank_by_distance(all_hospitals, zipcode, max_miles=max_miles)
+        )
+    elif hospital_name:
+        # Typos and reordered names: look among facilities already seen near this zip
+        local_matches = shared_index.search(
+            hospital_name,
+            limit=LOCAL_MATCH_LIMIT,
+            predicate=lambda doc: str(doc.zipcode)[:3] == str(zipcode)[:3],
+        )
+        if local_matches:
+            all_hospitals = rank_by_distance(local_matches, zipcode, max_miles=max_miles)
+
+    if not all_hospitals:
+        # Failed and empty searches are not cached, as for doctors
+        return all_hospitals
+    all_hospitals = tuple(all_hospitals)
+    _search_cache.set(key, all_hospitals)
+    return all_hospitals
+
+async def build_hospital_page(hospital_name, zipcode, page=1, items_per_page=5, max_miles=None):
+    """
+    Build one page of hospital results for a search.
+
+    Args:
+        hospital_name (str): Hospital or facility name
+        zipcode (str): 5 digit zip code
+        page (int): Page number, clamped to the available pages
+        items_per_page (int): Number of hospitals per page
+        max_miles (float): Optional maximum distance from the zip code
+
+    Returns:
+        dict: "hospitals" and "pagination", or "needs_input"/"error" if the search failed
+    """
+    if not await check_zip_code_validity(zipcode):
         return {
             "needs_input": "zipcode",
             "message": "Please provide a valid 5-digit zip code to continue the hospital search."
         }
     
     # Get all hospitals matching the search
-    all_hospitals = fetch_hospital(zipcode, hospital_name)
+    all_hospitals = await search_hospitals(hospital_name, zipcode, max_miles)
     
     if not all_hospitals:
         return {"error": "No hospitals found matching your criteria."}
@@ -96,27 +153,7 @@ async def get_hospitals_by_zipcode(hospital_name: str, zipcode: str, page: int =
     current_page_hospitals = all_hospitals[start_idx:end_idx]
     
     # Format the hospital data
-    formatted_hospitals = []
-    for doc in current_page_hospitals:
-        provider = doc.get("provider", {})
-        address = doc.get("address", {})
-        name = provider.get("name", "N/A")
-        taxonomy = provider.get("taxonomy", "N/A")
-        phone = address.get("phone", "N/A")
-        specialties = ", ".join(provider.get("specialties", [])) or "N/A"
-        street1 = address.get("street1", "")
-        street2 = address.get("street2", "")
-        city = address.get("city", "")
-        state = address.get("state", "")
-        zipcode = address.get("zipcode", "")
-        full_address = f"{street1} {street2}, {city}, {state} {zipcode}".strip().replace(" ,", ",")
-        formatted_hospitals.append({
-            "name": name,
-            "phone": phone,
-            "specialties": specialties,
-            "taxonomy": taxonomy,
-            "address": full_address
-        })
+    formatted_hospitals = [doc.to_hospital() for doc in current_page_hospitals]
     
     # Create pagination metadata
     pagination = {
@@ -133,71 +170,108 @@ async def get_hospitals_by_zipcode(hospital_name: str, zipcode: str, page: int =
         "pagination": pagination
     }
 
+async def show_hospital_page(state, ctx, cursor=None):
+    """Build the page described by a cursor state and remember it for the session."""
+    result = await build_hospital_page(
+        state["hospital_name"], state["zipcode"], state["page"], state["items_per_page"], state.get("max_miles")
+    )
+    if "pagination" in result:
+        state["page"] = result["pagination"]["current_page"]
+        result["cursor"] = hospital_cursors.save(state, ctx, cursor)
+    return result
+
+@mcp.tool()
+async def get_hospitals_by_zipcode(hospital_name: str, zipcode: str, page: int = 1, items_per_page: int = 5, max_miles: float = None, ctx: Context = None) -> dict:
+    """Find hospitals in your area by name and location with pagination.
+    
+    Args:
+        hospital_name: Name of hospital or facility (e.g., "Memorial", "General Hospital")
+        zipcode: 5 digit number (e.g., 33601) for location search
+        page: Page number (starting from 1, default: 1)
+        items_per_page: Number of hospitals per page (default: 5)
+        max_miles: Optional - Only show hospitals within this many miles of the zip code
+    
+    Returns:
+        Dictionary with hospitals (nearest first), pagination metadata and a cursor for page navigation
+    """
+    print(
+        f"Tool get_hospitals_by_zipcode called with hospital_name: {hospital_name}, zipcode: {zipcode}, page: {page}, items_per_page: {items_per_page}"
+    )
+    state = {
+        "hospital_name": hospital_name,
+        "zipcode": zipcode,
+        "page": page,
+        "items_per_page": items_per_page,
+        "max_miles": max_miles,
+    }
+    return await show_hospital_page(state, ctx)
+
 @mcp.tool()
-async def next_hospital_page(items_per_page: int = None) -> dict:
+async def next_hospital_page(items_per_page: int = None, cursor: str = None, ctx: Context = None) -> dict:
     """Get the next page of hospital results.
     
     Args:
         items_per_page: Optional - Number of hospitals per page
+        cursor: Optional - Cursor returned by the hospital search (defaults to this conversation's last search)
         
     Returns:
         Dictionary with hospitals and pagination metadata
     """
-    current_hospital_name = global_context.get("current_hospital_name")
-    current_zip = global_context.get("current_hospital_zip")
-    current_page = global_context.get("current_hospital_page", 1)
+    cursor, state = hospital_cursors.load(cursor, ctx)
     
-    if not current_hospital_name or not current_zip:
+    if not state or not state.get("hospital_name") or not state.get("zipcode"):
         return {"error": "No previous hospital search found. Please search for hospitals first."}
     
     # Use current items_per_page if not specified
-    if items_per_page is None:
-        items_per_page = global_context.get("hospital_items_per_page", 5)
+    if items_per_page is not None:
+        state["items_per_page"] = items_per_page
+    state["page"] += 1
     
-    return await get_hospitals_by_zipcode(current_hospital_name, current_zip, current_page + 1, items_per_page)
+    return await show_hospital_page(state, ctx, cursor)
 
 @mcp.tool()
-async def previous_hospital_page(items_per_page: int = None) -> dict:
+async def previous_hospital_page(items_per_page: int = None, cursor: str = None, ctx: Context = None) -> dict:
     """Get the previous page of hospital results.
     
     Args:
         items_per_page: Optional - Number of hospitals per page
+        cursor: Optional - Cursor returned by the hospital search (defaults to this conversation's last search)
         
     Returns:
         Dictionary with hospitals and pagination metadata
     """
-    current_hospital_name = global_context.get("current_hospital_name")
-    current_zip = global_context.get("current_hospital_zip")
-    current_page = global_context.get("current_hospital_page", 1)
+    cursor, state = hospital_cursors.load(cursor, ctx)
     
-    if not current_hospital_name or not current_zip:
+    if not state or not state.get("hospital_name") or not state.get("zipcode"):
         return {"error": "No previous hospital search found. Please search for hospitals first."}
     
     # Use current items_per_page if not specified
-    if items_per_page is None:
-        items_per_page = global_context.get("hospital_items_per_page", 5)
+    if items_per_page is not None:
+        state["items_per_page"] = items_per_page
+    state["page"] -= 1
     
-    return await get_hospitals_by_zipcode(current_hospital_name, current_zip, current_page - 1, items_per_page)
+    return await show_hospital_page(state, ctx, cursor)
 
 @mcp.tool()
-async def go_to_hospital_page(page_num: int, items_per_page: int = None) -> dict:
+async def go_to_hospital_page(page_num: int, items_per_page: int = None, cursor: str = None, ctx: Context = None) -> dict:
     """Go to a specific page of hospital results.
     
     Args:
         page_num: Page number to navigate to
         items_per_page: Optional - Number of hospitals per page
+        cursor: Optional - Cursor returned by the hospital search (defaults to this conversation's last search)
         
     Returns:
         Dictionary with hospitals and pagination metadata
     """
-    current_hospital_name = global_context.get("current_hospital_name")
-    current_zip = global_context.get("current_hospital_zip")
+    cursor, state = hospital_cursors.load(cursor, ctx)
     
-    if not current_hospital_name or not current_zip:
+    if not state or not state.get("hospital_name") or not state.get("zipcode"):
         return {"error": "No previous hospital search found. Please search for hospitals first."}
     
     # Use current items_per_page if not specified
-    if items_per_page is None:
-        items_per_page = global_context.get("hospital_items_per_page", 5)
+    if items_per_page is not None:
+        state["items_per_page"] = items_per_page
+    state["page"] = page_num
     
-    return await get_hospitals_by_zipcode(current_hospital_name, current_zip, page_num, items_per_page)
+    return await show_hospital_page(state, ctx, cursor)
\ No newline at end of file
@@ -1,67 +1,110 @@
-from mcp.server.fastmcp import FastMCP
-import http.client
-import json
+from mcp.server.fastmcp import FastMCP, Context
 from urllib.parse import quote
 import logging
+import os
+from cache import PrefixCache
+from cursors import CursorStore
+from drugcatalog import AUTOCOMPLETE_LIMIT, lookup_drugs, normalize_drug_name
+from gateway import gateway_get
+from records import MedicineRecord
 
 logger = logging.getLogger(__name__)
 mcp = FastMCP("medicine_list")
 
-global_context = {
-    "current_zip": None,
-    "current_page": 1  # Track the current page
-}
+# Pagination state per MCP session / cursor token
+medicine_cursors = CursorStore()
 
+PLAN_YEAR = 2024
+
+# Autocomplete results per query; lists shorter than the gateway's result cap are
+# complete, so longer queries with the same prefix are filtered locally
+_medicine_cache = PrefixCache(
+    maxsize=int(os.getenv("MEDICINE_CACHE_SIZE", "2000")),
+    ttl=int(os.getenv("MEDICINE_CACHE_TTL", "3600")),
+    complete_below=AUTOCOMPLETE_LIMIT,
+    shared="medicine",
+)
+
+
+def _medicine_matches(medicine, query):
+    return query in (medicine.name or "").lower() or query in (medicine.full_name or "").lower()
+
+
+def get_medicine_cache_stats():
+    return _medicine_cache.stats()
 
-def fetch_medicine(query):
-    try:
-        conn = http.client.HTTPSConnection("gateway-dev.nextere.com")
-        headers = {"accept": "application/json"}
 
+async def fetch_medicine(query, year=PLAN_YEAR):
+    # The offline catalog snapshot answers without the network; the gateway only handles misses.
+    # The catalog matches word prefixes only, the gateway also matches inside words.
+    medicines = lookup_drugs(query, year)
+    if medicines is not None:
+        logger.info(f"Serving {len(medicines)} medicines from the {year} catalog for query: '{query}'")
+        return medicines
+    cached = await _medicine_cache.aget(query, _medicine_matches, scope=year)
+    if cached is not None:
+        logger.info(f"Serving {len(cached)} cached medicines for query: '{query}'")
+        return cached
+    try:
         encoded_query = quote(query)
 
-        endpoint = f"/api/quotingtool-service/provider-and-drug-coverage/drugs-by-name-autocomplete?name={encoded_query}&year=2024"
-        conn.request("GET", endpoint, headers=headers)
-        res = conn.getresponse()
-        data = res.read().decode("utf-8")
+        endpoint = f"/api/quotingtool-service/provider-and-drug-coverage/drugs-by-name-autocomplete?name={encoded_query}&year={year}"
+        res = await gateway_get(endpoint)
 
-        if res.status == 200:
-            json_data = json.loads(data)
-            conn.close()
-            return json_data
+        if res.status_code == 200:
+            medicines = tuple(MedicineRecord.from_item(item) for item in res.json() or [])
+            _medicine_cache.set(query, medicines, scope=year)
+            return medicines
         else:
-            print(f"HTTP error occurred: {res.status} {res.reason}")
+            print(f"HTTP error occurred: {res.status_code} {res.reason_phrase}")
             return None
     except Exception as e:
         logger.error(f"error:{str(e)}")
         return None
 
-@mcp.tool()
-async def get_medicine_list(medicine_name: str, page: int = 1, items_per_page: int = 5) -> dict:
-    """Find detailed information about medications and drugs with pagination.
-    
+def group_medicines(medicines):
+    """
+    Collapse strength variants of the same drug into one entry.
+
     Args:
-        medicine_name: Name of medicine or drug (e.g., "Lipitor", "Amoxicillin")
-        page: Page number (starting from 1, default: 1)
-        items_per_page: Number of medications per page (default: 5)
-        
+        medicines (tuple): MedicineRecord results in gateway order
+
     Returns:
-        Dictionary with medicines and pagination metadata
+        list: {"name", "strengths"} per normalized drug name, in order of first
+              appearance
+    """
+    groups = {}
+    for medicine in medicines:
+        key = normalize_drug_name(medicine.name)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {"name": medicine.name, "strengths": []}
+        if medicine.strength not in group["strengths"]:
+            group["strengths"].append(medicine.strength)
+    return list(groups.values())
+
+async def build_medicine_page(medicine_name, page=1, items_per_page=5, grouped=False):
+    """
+    Build one page of medicine results for a search.
+
+    Args:
+        medicine_name (str): Name of medicine or drug
+        page (int): Page number, clamped to the available pages
+        items_per_page (int): Number of medications (or drug groups) per page
+        grouped (bool): Page over drugs with their strengths listed together
+                        instead of one row per strength
+
+    Returns:
+        dict: "medicines" and "pagination", or "error" if nothing was found
     """
-    print(
-        f"Tool get_medicine_list called with medicine_name: {medicine_name}, page: {page}, items_per_page: {items_per_page}"
-    )
-    
-    # Update global context
-    global_context["current_medicine_name"] = medicine_name
-    global_context["current_medicine_page"] = page
-    global_context["medicine_items_per_page"] = items_per_page
-    
     # Get all medicines matching the search
-    all_medicines = fetch_medicine(medicine_name)
+    all_medicines = await fetch_medicine(medicine_name)
     
     if not all_medicines:
         return {"error": "No medicines found matching your criteria."}
+
+    if grouped:
+        all_medicines = group_medicines(all_medicines)
     
     # Calculate pagination details
     total_items = len(all_medicines)
@@ -81,14 +124,7 @@ async def get_medicine_list(medicine_name: str, page: int = 1, items_per_page: i
     current_page_medicines = all_medicines[start_idx:end_idx]
     
     # Format the medicine data
-    formatted_medicines = []
-    for medicine in current_page_medicines:
-        medicine_info = {
-            "name": medicine.get("name", "N/A"),
-            "strength": medicine.get("strength", "N/A"),
-            "full_name": medicine.get("full_Name", "N/A")
-        }
-        formatted_medicines.append(medicine_info)
+    formatted_medicines = current_page_medicines if grouped else [medicine.to_medicine() for medicine in current_page_medicines]
     
     # Create pagination metadata
     pagination = {
@@ -105,68 +141,107 @@ async def get_medicine_list(medicine_name: str, page: int = 1, items_per_page: i
         "pagination": pagination
     }
 
+async def _show_medicine_page(state, ctx, cursor=None):
+    """Build the page described by a cursor state and remember it for the session."""
+    result = await build_medicine_page(
+        state["medicine_name"], state["page"], state["items_per_page"], state.get("grouped", False)
+    )
+    if "pagination" in result:
+        state["page"] = result["pagination"]["current_page"]
+        result["cursor"] = medicine_cursors.save(state, ctx, cursor)
+    return result
+
+@mcp.tool()
+async def get_medicine_list(medicine_name: str, page: int = 1, items_per_page: int = 5, grouped: bool = False, ctx: Context = None) -> dict:
+    """Find detailed information about medications and drugs with pagination.
+    
+    Args:
+        medicine_name: Name of medicine or drug (e.g., "Lipitor", "Amoxicillin")
+        page: Page number (starting from 1, default: 1)
+        items_per_page: Number of medications per page (default: 5)
+        grouped: Optional - List each drug once with all of its strengths, so fewer
+                 pages are needed; page navigation keeps this setting
+        
+    Returns:
+        Dictionary with medicines, pagination metadata and a cursor for page navigation
+    """
+    print(
+        f"Tool get_medicine_list called with medicine_name: {medicine_name}, page: {page}, items_per_page: {items_per_page}, grouped: {grouped}"
+    )
+    state = {
+        "medicine_name": medicine_name,
+        "page": page,
+        "items_per_page": items_per_page,
+        "grouped": grouped,
+    }
+    return await _show_medicine_page(state, ctx)
+
 @mcp.tool()
-async def next_medicine_page(items_per_page: int = None) -> dict:
+async def next_medicine_page(items_per_page: int = None, cursor: str = None, ctx: Context = None) -> dict:
     """Get the next page of medicine results.
     
     Args:
         items_per_page: Optional - Number of medicines per page
+        cursor: Optional - Cursor returned by the medicine search (defaults to this conversation's last search)
         
     Returns:
         Dictionary with medicines and pagination metadata
     """
-    current_medicine_name = global_context.get("current_medicine_name")
-    current_page = global_context.get("current_medicine_page", 1)
+    cursor, state = medicine_cursors.load(cursor, ctx)
     
-    if not current_medicine_name:
+    if not state or not state.get("medicine_name"):
         return {"error": "No previous medicine search found. Please search for medicines first."}
     
     # Use current items_per_page if not specified
-    if items_per_page is None:
-        items_per_page = global_context.get("medicine_items_per_page", 5)
+    if items_per_page is not None:
+        state["items_per_page"] = items_per_page
+    state["page"] += 1
     
-    return await get_medicine_list(current_medicine_name, current_page + 1, items_per_page)
+    return await _show_medicine_page(state, ctx, cursor)
 
 @mcp.tool()
-async def previous_medicine_page(items_per_page: int = None) -> dict:
+async def previous_medicine_page(items_per_page: int = None, cursor: str = None, ctx: Context = None) -> dict:
     """Get the previous page of medicine results.
     
     Args:
         items_per_page: Optional - Number of medicines per page
+        cursor: Optional - Cursor returned by the medicine search (defaults to this conversation's last search)
         
     Returns:
         Dictionary with medicines and pagination metadata
     """
-    current_medicine_name = global_context.get("current_medicine_name")
-    current_page = global_context.get("current_medicine_page", 1)
+    cursor, state = medicine_cursors.load(cursor, ctx)
     
-    if not current_medicine_name:
+    if not state or not state.get("medicine_name"):
         return {"error": "No previous medicine search found. Please search for medicines first."}
     
     # Use current items_per_page if not specified
-    if items_per_page is None:
-        items_per_page = global_context.get("medicine_items_per_page", 5)
+    if items_per_page is not None:
+        state["items_per_page"] = items_per_page
+    state["page"] -= 1
     
-    return await get_medicine_list(current_medicine_name, current_page - 1, items_per_page)
+    return await _show_medicine_page(state, ctx, cursor)
 
 @mcp.tool()
-async def go_to_medicine_page(page_num: int, items_per_page: int = None) -> dict:
+async def go_to_medicine_page(page_num: int, items_per_page: int = None, cursor: str = None, ctx: Context = None) -> dict:
     """Go to a specific page of medicine results.
     
     Args:
         page_num: Page number to navigate to
         items_per_page: Optional - Number of medicines per page
+        cursor: Optional - Cursor returned by the medicine search (defaults to this conversation's last search)
         
     Returns:
         Dictionary with medicines and pagination metadata
     """
-    current_medicine_name = global_context.get("current_medicine_name")
+    cursor, state = medicine_cursors.load(cursor, ctx)
     
-    if not current_medicine_name:
+    if not state or not state.get("medicine_name"):
         return {"error": "No previous medicine search found. Please search for medicines first."}
     
     # Use current items_per_page if not specified
-    if items_per_page is None:
-        items_per_page = global_context.get("medicine_items_per_page", 5)
+    if items_per_page is not None:
+        state["items_per_page"] = items_per_page
+    state["page"] = page_num
     
-    return await get_medicine_list(current_medicine_name, page_num, items_per_page)
\ No newline at end of file
+    return await _show_medicine_page(state, ctx, cursor)
\ No newline at end of file
@@ -0,0 +1,266 @@
+import asyncio
+import bisect
+import json
+import logging
+import os
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+# "off" leaves tools unwrapped and serves no /metrics route
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "on").lower() != "off"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            yield self.name + _labels(self.labels, label_values), value
+
+
+class Histogram:
+    """Observation counts in cumulative buckets, plus their sum and count, per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [count per bucket (last is +Inf), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, *label_values, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = [(label_values, list(counts), total) for label_values, (counts, total) in self._values.items()]
+        for label_values, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield self.name + "_bucket" + _labels(self.labels, label_values, [("le", _number(bound))]), cumulative
+            yield self.name + "_sum" + _labels(self.labels, label_values), total
+            yield self.name + "_count" + _labels(self.labels, label_values), cumulative
+
+
+class Gauge:
+    """A value read when metrics are scraped, from `collect()` -> [(label values, value)]."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labels, collect, kind="gauge"):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self):
+        for label_values, value in self.collect():
+            yield self.name + _labels(self.labels, label_values), value
+
+
+TOOL_CALLS = Counter("mcp_tool_calls_total", "Tool calls by outcome (ok, error result, exception).", ("tool", "outcome"))
+TOOL_DURATION = Histogram("mcp_tool_duration_seconds", "Tool call latency.", ("tool",))
+TOOL_RESULT_BYTES = Histogram("mcp_tool_result_bytes", "Size of tool results as JSON.", ("tool",), SIZE_BUCKETS)
+GATEWAY_REQUESTS = Counter(
+    "gateway_requests_total", "Gateway requests by HTTP status, or failure kind when there was no response.",
+    ("endpoint", "status"),
+)
+GATEWAY_DURATION = Histogram("gateway_request_duration_seconds", "Gateway request latency per attempt.", ("endpoint",))
+
+
+def observe_tool(tool, seconds, result=None, exception=False):
+    """
+    Record one tool call.
+
+    Results that are dicts with an "error" key (how tools report failures) count
+    as errors; exceptions that escape the tool count separately.
+    """
+    if exception:
+        outcome = "exception"
+    elif isinstance(result, dict) and "error" in result:
+        outcome = "error"
+    else:
+        outcome = "ok"
+    TOOL_CALLS.inc(tool, outcome)
+    TOOL_DURATION.observe(tool, value=seconds)
+    if not exception:
+        try:
+            size = len(result.encode("utf-8")) if isinstance(result, str) else len(json.dumps(result, default=str))
+        except (TypeError, ValueError):
+            return
+        TOOL_RESULT_BYTES.observe(tool, value=size)
+
+
+def observe_gateway(endpoint, status, seconds):
+    GATEWAY_REQUESTS.inc(endpoint, str(status))
+    GATEWAY_DURATION.observe(endpoint, value=seconds)
+
+
+def _gateway_stat(key):
+    def collect():
+        gateway = sys.modules.get("gateway")
+        if gateway is None:
+            return []
+        return [((name,), stats[key]) for name, stats in list(gateway._stats.items())]
+    return collect
+
+
+def _circuit_open():
+    gateway = sys.modules.get("gateway")
+    if gateway is None:
+        return []
+    return [((name,), int(breaker.state != "closed")) for name, breaker in list(gateway._breakers.items())]
+
+
+def _cache_stat(key):
+    def collect():
+        from cache import named_caches
+        return [((name,), cache.stats()[key]) for name, cache in sorted(named_caches().items())]
+    return collect
+
+
+METRICS = [
+    TOOL_CALLS,
+    TOOL_DURATION,
+    TOOL_RESULT_BYTES,
+    GATEWAY_REQUESTS,
+    GATEWAY_DURATION,
+    Gauge("gateway_retries_total", "Gateway request retries.", ("endpoint",), _gateway_stat("retries"), "counter"),
+    Gauge("gateway_hedged_requests_total", "Hedged second gateway requests.", ("endpoint",), _gateway_stat("hedged"), "counter"),
+    Gauge("gateway_circuit_rejections_total", "Requests refused by an open circuit breaker.", ("endpoint",),
+          _gateway_stat("circuit_open"), "counter"),
+    Gauge("gateway_circuit_open", "1 while the endpoint's circuit breaker is open or half open.", ("endpoint",), _circuit_open),
+    Gauge("cache_hits_total", "Cache hits, including hits from the shared cache.", ("cache",), _cache_stat("hits"), "counter"),
+    Gauge("cache_shared_hits_total", "Cache hits served from the cross-worker shared cache.", ("cache",),
+          _cache_stat("shared_hits"), "counter"),
+    Gauge("cache_misses_total", "Cache misses.", ("cache",), _cache_stat("misses"), "counter"),
+    Gauge("cache_evictions_total", "Entries evicted to stay under the size limit.", ("cache",), _cache_stat("evictions"), "counter"),
+    Gauge("cache_entries", "Entries held in this process.", ("cache",), _cache_stat("size")),
+]
+
+
+def render(metrics=METRICS):
+    """This process's metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in metrics:
+        try:
+            samples = list(metric.samples())
+        except Exception as e:
+            logger.warning(f"Cannot collect {metric.name}: {e}")
+            continue
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(f"{sample} {_number(value)}" for sample, value in samples)
+    return "\n".join(lines) + "\n"
+
+
+def merge(texts):
+    """
+    Add up the samples of several processes' expositions.
+
+    Counters and histogram buckets add up directly; gauges become totals over
+    the workers (entries held, breakers open).
+    """
+    comments = {}
+    samples = {}
+    families = []
+    for text in texts:
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# "):
+                family = line.split(" ", 3)[2]
+                if family not in comments:
+                    comments[family] = []
+                    families.append(family)
+                if line not in comments[family]:
+                    comments[family].append(line)
+            elif line.strip():
+                sample, value = line.rsplit(" ", 1)
+                samples.setdefault(family, {})
+                samples[family][sample] = samples[family].get(sample, 0.0) + float(value)
+    lines = []
+    for family in families:
+        lines.extend(comments[family])
+        lines.extend(
+            f"{sample} {_number(int(value) if value.is_integer() else value)}"
+            for sample, value in samples.get(family, {}).items()
+        )
+    return "\n".join(lines) + "\n"
+
+
+def metrics_routes():
+    """
+    The /metrics route. It reports the totals of all worker processes: the worker
+    that receives the scrape asks its peers for their own numbers (/metrics?scope=local).
+    """
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+
+    async def metrics(request):
+        text = render()
+        if request.query_params.get("scope") != "local":
+            from workers import peer_client, peer_socket_paths
+
+            async def scrape(path):
+                try:
+                    res = await peer_client(path).get("/metrics?scope=local", timeout=5)
+                    return res.text if res.status_code == 200 else None
+                except Exception as e:
+                    logger.warning(f"Cannot scrape worker {path}: {e}")
+                    return None
+
+            peer_texts = await asyncio.gather(*(scrape(path) for path in peer_socket_paths()))
+            others = [peer_text for peer_text in peer_texts if peer_text]
+            if others:
+                text = merge([text] + others)
+        return PlainTextResponse(text, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    return [Route("/metrics", endpoint=metrics)]
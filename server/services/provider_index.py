@@ -0,0 +1,213 @@
+import heapq
+import json
+import logging
+import os
+import re
+import time
+from array import array
+from collections import OrderedDict, defaultdict
+
+from records import ProviderRecord
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_SNAPSHOT_DIR = os.getenv("PROVIDER_SNAPSHOT_DIR", "")
+# The shared index keeps the most recently seen providers up to this many, and
+# forgets providers not seen again for PROVIDER_INDEX_TTL seconds (0 = never)
+PROVIDER_INDEX_MAX_RECORDS = int(os.getenv("PROVIDER_INDEX_MAX_RECORDS", "500000"))
+PROVIDER_INDEX_TTL = float(os.getenv("PROVIDER_INDEX_TTL", "0"))
+
+# Share of the query's trigrams a name must contain to count as a match
+MIN_SCORE = 0.5
+
+# Titles and suffixes that carry no signal when matching provider names
+STOPWORDS = {"dr", "md", "do", "mr", "mrs", "ms", "jr", "sr", "phd", "np", "pa", "dds", "inc", "llc"}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def tokenize(text):
+    """Lowercase a name and split it into tokens, dropping titles and punctuation."""
+    tokens = _NON_ALNUM.sub(" ", (text or "").lower()).split()
+    return [token for token in tokens if token not in STOPWORDS] or tokens
+
+
+def trigrams(tokens):
+    """Trigrams of each token, padded so short tokens and word edges count."""
+    grams = set()
+    for token in tokens:
+        padded = f"${token}$"
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def provider_name(record):
+    return record.name
+
+
+def provider_identity(record):
+    return record.npi or (record.name, record.street1, record.zipcode)
+
+
+class ProviderIndex:
+    """
+    In-memory token and trigram index over provider names.
+
+    Trigram postings make matching tolerant to typos and to reordered names
+    ("Calder Jeffrey"); exact token hits rank above partial ones.
+
+    With `max_records` or `ttl`, the least recently added records are evicted
+    once the index is full or they have expired; adding a record that is
+    already indexed (by `identity_of`) replaces it and makes it the most recent.
+    Evicted records are dropped from the postings when they outnumber the live
+    ones.
+    """
+
+    def __init__(self, name_of=provider_name, identity_of=None, max_records=None, ttl=None):
+        self.records = []
+        self._name_of = name_of
+        self._identity_of = identity_of
+        self._max_records = max_records
+        self._ttl = ttl or None
+        self._live = OrderedDict()  # identity (or record id) -> record id, least recent first
+        self._added_at = array("d")
+        self._tokens = defaultdict(lambda: array("I"))
+        self._trigrams = defaultdict(lambda: array("I"))
+        self._sizes = array("I")
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._live)
+
+    def add(self, record):
+        """Add a record; returns False if it was already indexed."""
+        now = time.monotonic()
+        identity = self._identity_of(record) if self._identity_of is not None else None
+        replaced = identity is not None and identity in self._live
+        if replaced:
+            self.records[self._live.pop(identity)] = None
+        self._expire(now)
+        if self._max_records is not None:
+            while len(self._live) >= self._max_records:
+                self._evict()
+
+        self._insert(identity, record, now)
+        if len(self.records) > 2 * len(self._live) + 1024:
+            self._compact()
+        return not replaced
+
+    def _insert(self, identity, record, added_at):
+        record_id = len(self.records)
+        self.records.append(record)
+        self._live[record_id if identity is None else identity] = record_id
+        self._added_at.append(added_at)
+        tokens = set(tokenize(self._name_of(record)))
+        grams = trigrams(tokens)
+        for token in tokens:
+            self._tokens[token].append(record_id)
+        for gram in grams:
+            self._trigrams[gram].append(record_id)
+        self._sizes.append(len(grams))
+
+    def add_all(self, records):
+        return sum(1 for record in records if self.add(record))
+
+    def _evict(self):
+        _, record_id = self._live.popitem(last=False)
+        self.records[record_id] = None
+        self.evictions += 1
+
+    def _expire(self, now):
+        if self._ttl is None:
+            return
+        while self._live and self._added_at[next(iter(self._live.values()))] + self._ttl <= now:
+            self._evict()
+
+    def _compact(self):
+        """Rebuild the postings from the live records, keeping their order and age."""
+        live = [
+            (None if self._identity_of is None else key, self.records[record_id], self._added_at[record_id])
+            for key, record_id in self._live.items()
+        ]
+        self.records = []
+        self._live = OrderedDict()
+        self._added_at = array("d")
+        self._tokens.clear()
+        self._trigrams.clear()
+        self._sizes = array("I")
+        for identity, record, added_at in live:
+            self._insert(identity, record, added_at)
+
+    def search(self, query, limit=None, min_score=MIN_SCORE, predicate=None):
+        """
+        Rank records by how well their name matches `query`.
+
+        Args:
+            query (str): Name or partial name, in any word order
+            limit (int): Return only the top `limit` matches
+            min_score (float): Minimum share of query trigrams a name must contain
+            predicate (callable): Optional filter applied to candidate records
+
+        Returns:
+            list: Matching records, best match first
+        """
+        query_tokens = set(tokenize(query))
+        query_grams = trigrams(query_tokens)
+        if not query_grams:
+            return []
+
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for record_id in self._trigrams.get(gram, ()):
+                shared[record_id] += 1
+        token_hits = defaultdict(int)
+        for token in query_tokens:
+            for record_id in self._tokens.get(token, ()):
+                token_hits[record_id] += 1
+
+        expired_before = time.monotonic() - self._ttl if self._ttl else None
+        scored = []
+        for record_id, count in shared.items():
+            score = count / len(query_grams)
+            if score < min_score or self.records[record_id] is None:
+                continue
+            if expired_before is not None and self._added_at[record_id] <= expired_before:
+                continue
+            if predicate is not None and not predicate(self.records[record_id]):
+                continue
+            # Prefer exact token hits, then names with fewer unrelated trigrams
+            jaccard = count / (len(query_grams) + self._sizes[record_id] - count)
+            scored.append((score + token_hits[record_id] / len(query_tokens), jaccard, -record_id))
+
+        best = heapq.nlargest(limit, scored) if limit else sorted(scored, reverse=True)
+        return [self.records[-negated_id] for _, _, negated_id in best]
+
+    def rank(self, query, min_score=MIN_SCORE):
+        """All records, matches first (best first) followed by the rest in original order."""
+        matches = self.search(query, min_score=min_score)
+        matched = {id(record) for record in matches}
+        return matches + [record for record in self.records if record is not None and id(record) not in matched]
+
+
+_shared_indexes = {}
+
+
+def get_shared_index(provider_type):
+    """
+    Process-wide index of every provider seen for a provider type.
+
+    It is seeded from PROVIDER_SNAPSHOT_DIR/<provider_type>.jsonl when present and
+    grows with each gateway result, so name searches the gateway misses (typos,
+    reordered names) can still be answered locally. Providers not seen recently
+    are evicted once it holds PROVIDER_INDEX_MAX_RECORDS.
+    """
+    index = _shared_indexes.get(provider_type)
+    if index is None:
+        index = ProviderIndex(identity_of=provider_identity, max_records=PROVIDER_INDEX_MAX_RECORDS, ttl=PROVIDER_INDEX_TTL)
+        snapshot = os.path.join(PROVIDER_SNAPSHOT_DIR, f"{provider_type}.jsonl") if PROVIDER_SNAPSHOT_DIR else ""
+        if snapshot and os.path.exists(snapshot):
+            with open(snapshot, encoding="utf-8") as f:
+                added = index.add_all(ProviderRecord.from_item(json.loads(line)) for line in f if line.strip())
+            logger.info(f"Loaded {added} {provider_type} providers from {snapshot}")
+        _shared_indexes[provider_type] = index
+    return index
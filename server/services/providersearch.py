@@ -0,0 +1,69 @@
+from mcp.server.fastmcp import FastMCP, Context
+import asyncio
+import logging
+from zipcode import resolve_zip
+from doctorlist import show_doctor_page
+from hospitallist import show_hospital_page
+
+logger = logging.getLogger(__name__)
+mcp = FastMCP("provider_search")
+
+# Facility query used when the user has not named a hospital yet
+DEFAULT_HOSPITAL_QUERY = "hospital"
+
+
+@mcp.tool()
+async def get_providers_by_zipcode(doctor_name: str, zipcode: str, hospital_name: str = "", items_per_page: int = 5, max_miles: float = None, ctx: Context = None) -> dict:
+    """Find doctors and hospitals in your area in a single call.
+
+    Searches doctors and hospitals at the same time, so hospital results are ready
+    while the user is still choosing a doctor. Use the usual doctor and hospital
+    navigation tools (next_page, next_hospital_page, ...) to page through either list.
+
+    Args:
+        doctor_name: Name of doctor or specialty (e.g., "Calder", "Cardiologist")
+        zipcode: 5 digit number (e.g., 33601) for location search
+        hospital_name: Optional - Name of hospital or facility; nearby hospitals if omitted
+        items_per_page: Number of results per page for each list (default: 5)
+        max_miles: Optional - Only show providers within this many miles of the zip code
+
+    Returns:
+        Dictionary with county_data plus "doctors" and "hospitals" results, each in the
+        same format as get_doctors_by_zipcode and get_hospitals_by_zipcode
+    """
+    logger.info(
+        f"Tool get_providers_by_zipcode called with doctor_name: {doctor_name}, hospital_name: {hospital_name}, zipcode: {zipcode}, items_per_page: {items_per_page}"
+    )
+    doctor_state = {
+        "doctor_name": doctor_name or "",
+        "zipcode": zipcode,
+        "page": 1,
+        "items_per_page": items_per_page,
+        "max_miles": max_miles,
+    }
+    hospital_state = {
+        "hospital_name": hospital_name or DEFAULT_HOSPITAL_QUERY,
+        "zipcode": zipcode,
+        "page": 1,
+        "items_per_page": items_per_page,
+        "max_miles": max_miles,
+    }
+
+    # The zip lookup is shared: all three resolve it through one gateway request at most
+    counties, doctors, hospitals = await asyncio.gather(
+        resolve_zip(zipcode),
+        show_doctor_page(doctor_state, ctx),
+        show_hospital_page(hospital_state, ctx),
+    )
+
+    if not counties:
+        return {
+            "needs_input": "zipcode",
+            "message": "Please provide a valid 5-digit zip code to continue the provider search."
+        }
+
+    return {
+        "county_data": dict(counties[0]),
+        "doctors": doctors,
+        "hospitals": hospitals,
+    }
@@ -0,0 +1,113 @@
+import sys
+
+from cache import shared_type
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@shared_type
+class ProviderRecord:
+    """
+    Compact form of a search-providers-all result, holding only displayed fields.
+
+    Slots avoid a per-record dict, and values repeated across many providers
+    (city, state, zip code, taxonomy, specialties) are interned so cached result
+    sets share a single copy of each string.
+    """
+
+    __slots__ = ("name", "npi", "specialties", "taxonomy", "street1", "street2", "city", "state", "zipcode", "phone")
+
+    def __init__(self, name="N/A", npi=None, specialties=(), taxonomy="N/A",
+                 street1="", street2="", city="", state="", zipcode="", phone="N/A"):
+        self.name = name
+        self.npi = npi
+        self.specialties = tuple(_intern(specialty) for specialty in specialties or ())
+        self.taxonomy = _intern(taxonomy)
+        self.street1 = street1
+        self.street2 = street2
+        self.city = _intern(city)
+        self.state = _intern(state)
+        self.zipcode = _intern(zipcode)
+        self.phone = phone
+
+    @classmethod
+    def from_item(cls, item):
+        """Build a record from a raw gateway provider item."""
+        provider = item.get("provider") or {}
+        address = item.get("address") or {}
+        return cls(
+            name=provider.get("name", "N/A"),
+            npi=provider.get("npi"),
+            specialties=provider.get("specialties", []),
+            taxonomy=provider.get("taxonomy", "N/A"),
+            street1=address.get("street1", ""),
+            street2=address.get("street2", ""),
+            city=address.get("city", ""),
+            state=address.get("state", ""),
+            zipcode=address.get("zipcode", ""),
+            phone=address.get("phone", "N/A"),
+        )
+
+    def __getstate__(self):
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def __setstate__(self, state):
+        for field, value in zip(self.__slots__, state):
+            setattr(self, field, value)
+
+    @property
+    def full_address(self):
+        return f"{self.street1} {self.street2}, {self.city}, {self.state} {self.zipcode}".strip().replace(" ,", ",")
+
+    def to_doctor(self):
+        return {
+            "name": self.name,
+            "phone": self.phone,
+            "specialties": ", ".join(self.specialties) or "N/A",
+            "address": self.full_address
+        }
+
+    def to_hospital(self):
+        return {
+            "name": self.name,
+            "phone": self.phone,
+            "specialties": ", ".join(self.specialties) or "N/A",
+            "taxonomy": self.taxonomy,
+            "address": self.full_address
+        }
+
+
+@shared_type
+class MedicineRecord:
+    """Compact form of a drugs-by-name-autocomplete result."""
+
+    __slots__ = ("name", "strength", "full_name")
+
+    def __init__(self, name="N/A", strength="N/A", full_name="N/A"):
+        self.name = _intern(name)
+        self.strength = _intern(strength)
+        self.full_name = full_name
+
+    @classmethod
+    def from_item(cls, item):
+        """Build a record from a raw gateway drug item."""
+        return cls(
+            name=item.get("name", "N/A"),
+            strength=item.get("strength", "N/A"),
+            full_name=item.get("full_Name", "N/A"),
+        )
+
+    def __getstate__(self):
+        return (self.name, self.strength, self.full_name)
+
+    def __setstate__(self, state):
+        self.name, self.strength, self.full_name = state
+
+    def to_medicine(self):
+        return {
+            "name": self.name,
+            "strength": self.strength,
+            "full_name": self.full_name
+        }
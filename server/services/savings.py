@@ -1,122 +1,285 @@
 from mcp.server.fastmcp import FastMCP
+import asyncio
 import logging
-import json
-import requests
-from zipcode import fetchCountyData
-import urllib.parse
+import os
+from aptc import estimate_household, unavailable_reason
+from cache import TTLCache
+from gateway import gateway_post
+from zipcode import resolve_zip
 
 logger = logging.getLogger(__name__)
 mcp = FastMCP("savings")
-    
-def fetch_savings(user_data):
+
+PLAN_YEAR = 2024
+ELIGIBILITY_ENDPOINT = "/api/quotingtool-service/households-and-eligibility/household-eligibility-estimates"
+BRONZE_PLAN_ENDPOINT = "/api/quotingtool-service/households-and-eligibility/lowest-cost-bronze-plan-aI"
+NO_SAVINGS = {"savings": "0", "healthplan": "", "roundedplan": 0}
+
+# Estimates per household profile; many users share age, income band and county.
+# Kept in this process only: the keys are personal data (age, income, pregnancy,
+# tobacco use, zip) that must not be written to the shared cache file.
+_savings_cache = TTLCache(
+    maxsize=int(os.getenv("SAVINGS_CACHE_SIZE", "10000")),
+    ttl=int(os.getenv("SAVINGS_CACHE_TTL", "3600")),
+)
+# Round incomes to this many dollars before quoting (0 = exact incomes). Bucketed
+# quotes are previews: every income in a bucket gets the quote for its midpoint.
+SAVINGS_INCOME_BUCKET = int(os.getenv("SAVINGS_INCOME_BUCKET", "0"))
+
+# Where the APTC amount comes from: "gateway" (eligibility service), "local" (aptc.py
+# estimate, gateway only when there is none) or "crosscheck" (gateway amount, with
+# the local estimate compared against it and differences logged). No benchmark
+# premium table ships with the repository, so local and crosscheck quote through
+# the gateway until server/data/slcsp_<year>.csv is supplied (see aptc.py).
+SAVINGS_APTC_MODE = os.getenv("SAVINGS_APTC_MODE", "gateway").lower()
+APTC_CROSSCHECK_TOLERANCE = float(os.getenv("APTC_CROSSCHECK_TOLERANCE", "5"))
+_crosscheck = {"compared": 0, "mismatched": 0, "max_difference": 0.0}
+if SAVINGS_APTC_MODE in ("local", "crosscheck") and unavailable_reason(PLAN_YEAR):
+    logger.warning(
+        f"SAVINGS_APTC_MODE={SAVINGS_APTC_MODE} but local APTC estimates are unavailable "
+        f"({unavailable_reason(PLAN_YEAR)}); every amount will come from the gateway"
+    )
+
+
+class SavingsUnavailable(Exception):
+    """The gateway did not return a usable eligibility or plan answer; worth retrying."""
+
+
+class InvalidHousehold(ValueError):
+    """The household itself cannot be quoted (e.g. an unknown zip code); retrying will not help."""
+
+
+def _bucket_income(income, bucket):
+    """Parse an income answer ("45,000", "$45000", 45000) and round it to the bucket."""
     try:
-        url_eligibility = "https://gateway-dev.nextere.com/api/quotingtool-service/households-and-eligibility/household-eligibility-estimates"
-        income = user_data.get("annual_income")
-        age = user_data.get("age")
-        gender = user_data.get("gender")
-        gender = gender.capitalize() if gender else None
-        valueOfPrehganant = user_data.get("pregnancy_status") == "Yes"
-        valueOfTobbaco = str(user_data.get("tobacco_use", "")).strip().lower() == "yes"
-        valueOfCoverage = not user_data.get("employer_coverage", False)
-        zip_code_data = user_data.get("zip_code")
-        zip_data = fetchCountyData(zip_code_data)
-        county_fips = zip_data.get("fips")
-        state = zip_data.get("state")
-
-        eligibility_payload = {
-            "household": {
-                "income": income,
-                "people": [
-                    {
-                        "age": age,
-                        "gender": gender,
-                        "isPregnant": valueOfPrehganant,
-                        "usesTobacco": valueOfTobbaco,
-                        "relationship": "Self",
-                        "hasMec": valueOfCoverage,
-                    }
-                ],
-            },
-            "market": "Individual",
-            "place": {
-                "countyFips": county_fips,
-                "state": state,
-                "zipcode": zip_code_data,
-            },
-            "year": 2024,
-        }
-
-        print("eligibility_payload:", eligibility_payload)
-        response = requests.post(
-            url=url_eligibility,
-            data=json.dumps(eligibility_payload),
-            headers={"Content-Type": "application/json"},
-        )
-
-        aptc = 0
-        aptcEligible = False
-        if response.status_code == 200:
-            data = response.json()
-            estimates = data.get("estimates", [])
-            if estimates:
-                aptc = estimates[0].get("aptc", 0)
-                aptcEligible = aptc > 0
-
-        url_plan = "https://gateway-dev.nextere.com/api/quotingtool-service/households-and-eligibility/lowest-cost-bronze-plan-aI"
-        plan_payload = {
-            "household": {
-                "income": income,
-                "people": [
-                    {
-                        "aptcEligible": aptcEligible,
-                        "age": age,
-                        "hasMec": valueOfCoverage,
-                        "isPregnant": valueOfPrehganant,
-                        "usesTobacco": valueOfTobbaco,
-                        "gender": gender,
-                        "relationship": "Self",
-                        "utilizationLevel": "Low",
-                    }
-                ],
-                "hasMarriedCouple": False,
-            },
-            "place": {
-                "countyFips": county_fips,
-                "state": state,
-                "zipcode": zip_code_data,
-            },
-        }
-
-        plan_response = requests.post(
-            url=url_plan,
-            data=json.dumps(plan_payload),
-            headers={"Content-Type": "application/json"},
-        )
-
-        if plan_response.status_code == 200:
-            plan_data = plan_response.json()
-            plans = plan_data.get("plans", [])
-            if plans:
-                plan_name = plans[0].get("name", "")
-                plan_with_discount = plans[0].get("premium_W_Credit", 0)
-                rounded_plan = round(plan_with_discount)
-                return {
-                    "savings": str(aptc),  # Ensure savings is a string as per tool schema
-                    "healthplan": plan_name,
-                    "roundedplan": rounded_plan
+        value = float(str(income).replace(",", "").replace("$", "").strip())
+    except (TypeError, ValueError):
+        return income
+    if bucket:
+        value = (value // bucket) * bucket + bucket / 2
+    return int(value) if value == int(value) else value
+
+
+def _profile_key(household, county):
+    """Canonical household tuple the savings estimate depends on."""
+    return (
+        household["age"],
+        household["income"],
+        household["gender"],
+        household["isPregnant"],
+        household["usesTobacco"],
+        household["hasMec"],
+        county.get("fips"),
+        county.get("state"),
+        household["zipcode"],
+        PLAN_YEAR,
+    )
+
+
+def get_savings_cache_stats():
+    return _savings_cache.stats()
+
+
+def get_aptc_crosscheck_stats():
+    return dict(_crosscheck)
+
+
+def _record_crosscheck(key, gateway_aptc, local_aptc):
+    difference = abs(float(gateway_aptc) - local_aptc)
+    _crosscheck["compared"] += 1
+    _crosscheck["max_difference"] = max(_crosscheck["max_difference"], round(difference, 2))
+    if difference > APTC_CROSSCHECK_TOLERANCE:
+        _crosscheck["mismatched"] += 1
+        logger.warning(f"APTC mismatch for {key}: gateway {gateway_aptc}, local {local_aptc}")
+
+
+def _household(user_data, income_bucket=0):
+    """Normalize the collected answers into the fields the gateway payloads use."""
+    gender = user_data.get("gender")
+    age = user_data.get("age")
+    return {
+        "income": _bucket_income(user_data.get("annual_income"), income_bucket),
+        "age": int(age) if str(age).strip().isdigit() else age,
+        "gender": gender.capitalize() if gender else None,
+        "isPregnant": user_data.get("pregnancy_status") == "Yes",
+        "usesTobacco": str(user_data.get("tobacco_use", "")).strip().lower() == "yes",
+        "hasMec": not user_data.get("employer_coverage", False),
+        "zipcode": user_data.get("zip_code"),
+    }
+
+
+def _place(household, county):
+    return {
+        "countyFips": county.get("fips"),
+        "state": county.get("state"),
+        "zipcode": household["zipcode"],
+    }
+
+
+def _eligibility_payload(household, county):
+    return {
+        "household": {
+            "income": household["income"],
+            "people": [
+                {
+                    "age": household["age"],
+                    "gender": household["gender"],
+                    "isPregnant": household["isPregnant"],
+                    "usesTobacco": household["usesTobacco"],
+                    "relationship": "Self",
+                    "hasMec": household["hasMec"],
                 }
+            ],
+        },
+        "market": "Individual",
+        "place": _place(household, county),
+        "year": PLAN_YEAR,
+    }
 
-        return {"savings": "0", "healthplan": "", "roundedplan": 0}
 
+def _plan_payload(household, county, aptc_eligible):
+    return {
+        "household": {
+            "income": household["income"],
+            "people": [
+                {
+                    "aptcEligible": aptc_eligible,
+                    "age": household["age"],
+                    "hasMec": household["hasMec"],
+                    "isPregnant": household["isPregnant"],
+                    "usesTobacco": household["usesTobacco"],
+                    "gender": household["gender"],
+                    "relationship": "Self",
+                    "utilizationLevel": "Low",
+                }
+            ],
+            "hasMarriedCouple": False,
+        },
+        "place": _place(household, county),
+    }
+
+
+def _read_aptc(response):
+    """
+    The APTC amount from an eligibility response.
+
+    A 200 without estimates means the household gets no credit (0). Any other
+    status or an unreadable body raises SavingsUnavailable, so a gateway failure
+    is never mistaken for "no savings".
+    """
+    if response.status_code != 200:
+        raise SavingsUnavailable(f"Eligibility request failed: {response.status_code} {response.reason_phrase}")
+    try:
+        estimates = response.json().get("estimates") or []
+        return estimates[0].get("aptc", 0) if estimates else 0
+    except (ValueError, AttributeError, TypeError, IndexError) as e:
+        raise SavingsUnavailable(f"Unreadable eligibility response: {e}") from e
+
+
+async def _gateway_savings(household, county):
+    """
+    Ask the gateway for the APTC amount and the matching bronze plan.
+
+    Returns:
+        tuple: (aptc, bronze plan httpx.Response)
+    """
+    eligibility_payload = _eligibility_payload(household, county)
+    logger.debug(f"eligibility_payload: {eligibility_payload}")
+    eligibility = asyncio.ensure_future(gateway_post(ELIGIBILITY_ENDPOINT, eligibility_payload))
+    plans = {
+        aptc_eligible: asyncio.ensure_future(gateway_post(BRONZE_PLAN_ENDPOINT, _plan_payload(household, county, aptc_eligible)))
+        for aptc_eligible in (True, False)
+    }
+    try:
+        aptc = _read_aptc(await eligibility)
+        aptc_eligible = aptc > 0
+        plans.pop(not aptc_eligible).cancel()
+        return aptc, await plans.pop(aptc_eligible)
+    finally:
+        for task in (eligibility, *plans.values()):
+            task.cancel()
+
+
+async def quote_savings(user_data, county=None, income_bucket=None):
+    """
+    Compute the savings estimate for a household, raising on any failure.
+
+    The bronze-plan request depends on the eligibility result only through the
+    aptcEligible flag, so both variants are sent together with the eligibility
+    request and the one that does not match is cancelled. The three requests
+    share the pooled gateway client, so the step takes one round trip instead
+    of two. With SAVINGS_APTC_MODE=local the amount comes from the local
+    estimator instead and only one bronze request is sent. Complete estimates
+    are cached per household profile.
+
+    Args:
+        user_data (dict): Answers collected from the user
+        county (dict): Optional county record ("fips", "state") already resolved
+                       for the zip code; looked up through the zip cache otherwise
+        income_bucket (int): Income rounding in dollars; SAVINGS_INCOME_BUCKET if None
+
+    Returns:
+        dict: "savings", "healthplan" and "roundedplan"
+    """
+    household = _household(user_data, SAVINGS_INCOME_BUCKET if income_bucket is None else income_bucket)
+    if county is None:
+        counties = await resolve_zip(household["zipcode"])
+        if counties is None:
+            raise SavingsUnavailable(f"Zip code lookup failed for {household['zipcode']}")
+        if not counties:
+            raise InvalidHousehold(f"No county found for zip code {household['zipcode']}")
+        county = counties[0]
+
+    key = _profile_key(household, county)
+    cached = _savings_cache.get(key)
+    if cached is not None:
+        logger.info(f"Serving cached savings estimate for {key}")
+        return dict(cached)
+
+    local_aptc = None
+    if SAVINGS_APTC_MODE in ("local", "crosscheck"):
+        local_aptc = estimate_household(household, county, PLAN_YEAR, has_other_coverage=not household["hasMec"])
+
+    if SAVINGS_APTC_MODE == "local" and local_aptc is not None:
+        # The amount is known up front, so only the matching bronze plan is requested
+        aptc = local_aptc
+        plan_response = await gateway_post(BRONZE_PLAN_ENDPOINT, _plan_payload(household, county, aptc > 0))
+    else:
+        aptc, plan_response = await _gateway_savings(household, county)
+        if local_aptc is not None:
+            _record_crosscheck(key, aptc, local_aptc)
+
+    if plan_response.status_code != 200:
+        raise SavingsUnavailable(f"Bronze plan request failed: {plan_response.status_code} {plan_response.reason_phrase}")
+    try:
+        plans = plan_response.json().get("plans") or []
+    except (ValueError, AttributeError) as e:
+        raise SavingsUnavailable(f"Unreadable bronze plan response: {e}") from e
+    if not plans:
+        return dict(NO_SAVINGS)
+    # Only answers backed by both gateway responses reach the cache
+    result = {
+        "savings": str(aptc),  # Ensure savings is a string as per tool schema
+        "healthplan": plans[0].get("name", ""),
+        "roundedplan": round(plans[0].get("premium_W_Credit", 0)),
+    }
+    _savings_cache.set(key, result)
+    return dict(result)
+
+
+async def fetch_savings(user_data, county=None, income_bucket=None):
+    """quote_savings for the chat tools: failures are logged and answered with NO_SAVINGS."""
+    try:
+        return await quote_savings(user_data, county, income_bucket)
     except Exception as e:
         logger.error(f"Error calculating savings: {e}")
-        return {"savings": "0", "healthplan": "", "roundedplan": 0}
+        return dict(NO_SAVINGS)
 
 @mcp.tool()
 async def get_saving_info(json_data):
     try:
         print("Saving Tool called with data:", json_data)
-        result = fetch_savings(json_data)
+        result = await fetch_savings(json_data)
         return result
     except Exception as e:
         logger.error(f"Error in get_saving_info: {e}")
@@ -0,0 +1,120 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+import zlib
+
+logger = logging.getLogger(__name__)
+
+PLAN_LISTING_URL = "https://nexquoting.com/nextere/plan/plan-listing"
+DEFAULT_SHORTLINK_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "shortlinks.sqlite")
+# Links older than this are removed (and their tokens stop resolving)
+SHORTLINK_TTL_DAYS = float(os.getenv("PLAN_SHORTLINK_TTL_DAYS", "30"))
+TOKEN_LENGTH = 12
+# Expired links are deleted at most this often (seconds), not on every save
+SHORTLINK_PRUNE_INTERVAL = 3600
+
+
+def compact_encode(form_json):
+    """zlib-compress a form JSON string and encode it as unpadded base64url."""
+    data = zlib.compress(form_json.encode("utf-8"), 9)
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def compact_decode(text):
+    data = base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+    return zlib.decompress(data).decode("utf-8")
+
+
+def plan_listing_url(form_json):
+    """The full plan listing URL with the form JSON in the query string."""
+    return f"{PLAN_LISTING_URL}?form={urllib.parse.quote(form_json)}"
+
+
+class ShortLinkStore:
+    """
+    Short tokens for plan listing forms, kept in a local SQLite file.
+
+    The token is derived from the form itself, so the same profile always gets
+    the same link and saving it twice stores it once. Calls block on SQLite, so
+    async code runs them in a thread. The file is local to one container, so
+    tokens do not resolve on other replicas; compact links have no such limit.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS links (token TEXT PRIMARY KEY, form TEXT NOT NULL, created REAL NOT NULL)")
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+
+    def save(self, form_json):
+        digest = hashlib.sha256(form_json.encode("utf-8")).digest()
+        token = base64.urlsafe_b64encode(digest).decode("ascii")[:TOKEN_LENGTH]
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO links (token, form, created) VALUES (?, ?, ?) "
+                "ON CONFLICT(token) DO UPDATE SET created = excluded.created",
+                (token, form_json, now),
+            )
+            if now - self._pruned_at >= SHORTLINK_PRUNE_INTERVAL:
+                self._db.execute("DELETE FROM links WHERE created < ?", (now - SHORTLINK_TTL_DAYS * 86400,))
+                self._pruned_at = now
+            self._db.commit()
+        return token
+
+    def load(self, token):
+        with self._lock:
+            row = self._db.execute("SELECT form FROM links WHERE token = ?", (token,)).fetchone()
+        return row[0] if row else None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_shortlink_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ShortLinkStore(os.getenv("PLAN_SHORTLINK_DB", DEFAULT_SHORTLINK_DB))
+    return _store
+
+
+def plan_link_routes():
+    """
+    Starlette routes that expand compact and short plan links into plan listing redirects.
+
+    /plan/c/<data> carries the compressed form itself; /plan/s/<token> looks it up
+    in the short-link store.
+    """
+    from starlette.responses import PlainTextResponse, RedirectResponse
+    from starlette.routing import Route
+
+    async def expand_compact(request):
+        try:
+            form_json = compact_decode(request.path_params["data"])
+        except Exception as e:
+            logger.warning(f"Invalid compact plan link: {e}")
+            return PlainTextResponse("Invalid plan link", status_code=400)
+        return RedirectResponse(plan_listing_url(form_json), status_code=302)
+
+    async def expand_short(request):
+        form_json = await asyncio.to_thread(get_shortlink_store().load, request.path_params["token"])
+        if form_json is None:
+            return PlainTextResponse("Plan link not found or expired", status_code=404)
+        return RedirectResponse(plan_listing_url(form_json), status_code=302)
+
+    return [
+        Route("/plan/c/{data}", endpoint=expand_compact),
+        Route("/plan/s/{token}", endpoint=expand_short),
+    ]
@@ -0,0 +1,123 @@
+import mmap
+import os
+import struct
+import logging
+
+logger = logging.getLogger(__name__)
+
+# File layout: header, then `count` fixed-width records sorted by their
+# leading `key_width` bytes, then an optional blob region for variable data.
+MAGIC = b"SRTTBL01"
+HEADER = struct.Struct("<8sIIQQ")  # magic, record_width, key_width, count, blob_offset
+
+
+def pad(value, width):
+    """Encode a string as UTF-8 and null-pad (or truncate) it to a fixed width."""
+    data = (value or "").encode("utf-8")[:width]
+    return data + b"\0" * (width - len(data))
+
+
+def unpad(data):
+    """Decode a null-padded fixed-width field back to a string."""
+    return data.rstrip(b"\0").decode("utf-8", errors="ignore")
+
+
+class SortedTable:
+    """
+    Read-only view over a sorted fixed-width record file.
+
+    The file is memory-mapped, so every process that opens the same table
+    shares a single copy of it through the OS page cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        magic, self.record_width, self.key_width, self.count, self.blob_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a sorted table file")
+
+    def __len__(self):
+        return self.count
+
+    def key_at(self, index):
+        offset = HEADER.size + index * self.record_width
+        return self._map[offset:offset + self.key_width]
+
+    def record_at(self, index):
+        offset = HEADER.size + index * self.record_width
+        return self._map[offset:offset + self.record_width]
+
+    def blob(self, offset, length):
+        start = self.blob_offset + offset
+        return self._map[start:start + length]
+
+    def lower_bound(self, key):
+        """Index of the first record whose key is >= `key`."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, key):
+        """Return every record whose key equals `key` (bytes, unpadded)."""
+        return list(self.prefix(key.ljust(self.key_width, b"\0")))
+
+    def prefix(self, prefix, limit=None):
+        """Yield records whose key starts with `prefix`, in key order."""
+        index = self.lower_bound(prefix)
+        found = 0
+        while index < self.count and (limit is None or found < limit):
+            if not self.key_at(index).startswith(prefix):
+                break
+            yield self.record_at(index)
+            index += 1
+            found += 1
+
+    def close(self):
+        try:
+            self._map.close()
+        finally:
+            self._file.close()
+
+
+def write_table(path, records, key_width, record_width, blob=b""):
+    """
+    Write a sorted table file atomically.
+
+    Args:
+        path (str): Destination file path
+        records (iterable): (key, record) byte pairs; keys are sorted here
+        key_width (int): Width of the sort key at the start of each record
+        record_width (int): Width of every record, including the key
+        blob (bytes): Optional variable-length data stored after the records
+
+    Returns:
+        int: Number of records written
+    """
+    rows = sorted(records, key=lambda row: row[0])
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as out:
+        blob_offset = HEADER.size + len(rows) * record_width
+        out.write(HEADER.pack(MAGIC, record_width, key_width, len(rows), blob_offset))
+        for key, record in rows:
+            if len(record) != record_width or record[:key_width] != key:
+                raise ValueError("record does not match the table layout")
+            out.write(record)
+        out.write(blob)
+    # Readers that already mapped the old file keep their view; new readers see the new one.
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote {len(rows)} records to {path}")
+    return len(rows)
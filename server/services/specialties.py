@@ -0,0 +1,148 @@
+import re
+
+# Specialty key -> (display name, NUCC taxonomy codes, synonyms users type)
+SPECIALTIES = {
+    "allergy": ("Allergy & Immunology", ("207K00000X",), ("allergist", "immunologist", "immunology", "allergy doctor")),
+    "anesthesiology": ("Anesthesiology", ("207L00000X",), ("anesthesiologist", "anesthesia")),
+    "cardiology": ("Cardiovascular Disease", ("207RC0000X", "207RI0011X", "207RC0001X"), (
+        "cardiologist", "cardiology", "cardiac", "heart", "heart doctor", "heart specialist",
+        "interventional cardiology", "electrophysiology",
+    )),
+    "chiropractic": ("Chiropractor", ("111N00000X",), ("chiropractor", "chiro", "chiropractic")),
+    "dentistry": ("Dentist", ("122300000X",), ("dentist", "dental", "dentistry")),
+    "dermatology": ("Dermatology", ("207N00000X",), ("dermatologist", "dermatology", "skin", "skin doctor")),
+    "emergency": ("Emergency Medicine", ("207P00000X",), ("emergency", "emergency medicine", "er doctor")),
+    "endocrinology": ("Endocrinology, Diabetes & Metabolism", ("207RE0101X",), (
+        "endocrinologist", "endocrinology", "diabetes", "diabetes doctor", "thyroid",
+    )),
+    "family": ("Family Medicine", ("207Q00000X",), (
+        "family medicine", "family doctor", "family practice", "family physician", "family practitioner",
+    )),
+    "gastroenterology": ("Gastroenterology", ("207RG0100X",), ("gastroenterologist", "gastroenterology", "gi", "stomach doctor")),
+    "general_practice": ("General Practice", ("208D00000X",), ("general", "general practice", "general practitioner", "gp")),
+    "general_surgery": ("Surgery", ("208600000X",), ("surgeon", "general surgeon", "general surgery", "surgery")),
+    "geriatrics": ("Geriatric Medicine", ("207RG0300X",), ("geriatrician", "geriatrics", "geriatric medicine")),
+    "hematology_oncology": ("Hematology & Oncology", ("207RH0003X", "207RX0202X"), (
+        "oncologist", "oncology", "cancer", "cancer doctor", "hematologist", "hematology", "medical oncology",
+    )),
+    "infectious_disease": ("Infectious Disease", ("207RI0200X",), ("infectious disease", "infectious disease specialist")),
+    "internal": ("Internal Medicine", ("207R00000X",), ("internal medicine", "internist")),
+    "nephrology": ("Nephrology", ("207RN0300X",), ("nephrologist", "nephrology", "kidney", "kidney doctor")),
+    "neurology": ("Neurology", ("2084N0400X",), ("neurologist", "neurology", "brain doctor")),
+    "neurosurgery": ("Neurological Surgery", ("207T00000X",), ("neurosurgeon", "neurosurgery", "neurological surgery")),
+    "nurse_practitioner": ("Nurse Practitioner", ("363L00000X", "363LF0000X"), ("nurse practitioner", "np", "aprn")),
+    "obgyn": ("Obstetrics & Gynecology", ("207V00000X",), (
+        "obgyn", "ob gyn", "ob", "gyn", "gynecologist", "gynecology", "obstetrician", "obstetrics",
+        "obstetrics gynecology", "womens health",
+    )),
+    "ophthalmology": ("Ophthalmology", ("207W00000X",), ("ophthalmologist", "ophthalmology", "eye doctor", "eye surgeon")),
+    "optometry": ("Optometrist", ("152W00000X",), ("optometrist", "optometry")),
+    "orthopedics": ("Orthopaedic Surgery", ("207X00000X",), (
+        "orthopedist", "orthopedic", "orthopedics", "orthopaedic", "orthopaedic surgery", "orthopedic surgeon",
+        "bone doctor", "ortho",
+    )),
+    "otolaryngology": ("Otolaryngology", ("207Y00000X",), ("ent", "otolaryngologist", "otolaryngology", "ear nose throat")),
+    "pediatrics": ("Pediatrics", ("208000000X",), (
+        "pediatrician", "pediatrics", "pediatric", "paediatrician", "child doctor", "kids doctor", "childrens doctor",
+    )),
+    "physical_therapy": ("Physical Therapist", ("225100000X",), ("physical therapist", "physical therapy", "pt", "physiotherapist")),
+    "physician_assistant": ("Physician Assistant", ("363A00000X",), ("physician assistant", "pa")),
+    "plastic_surgery": ("Plastic Surgery", ("208200000X",), ("plastic surgeon", "plastic surgery", "cosmetic surgeon")),
+    "podiatry": ("Podiatrist", ("213E00000X",), ("podiatrist", "podiatry", "foot doctor")),
+    "psychiatry": ("Psychiatry", ("2084P0800X",), ("psychiatrist", "psychiatry", "mental health doctor")),
+    "psychology": ("Psychologist", ("103T00000X",), ("psychologist", "psychology", "therapist", "counselor")),
+    "pulmonology": ("Pulmonary Disease", ("207RP1001X",), ("pulmonologist", "pulmonology", "pulmonary", "lung doctor")),
+    "radiology": ("Diagnostic Radiology", ("2085R0202X",), ("radiologist", "radiology")),
+    "rheumatology": ("Rheumatology", ("207RR0500X",), ("rheumatologist", "rheumatology", "arthritis doctor")),
+    "urology": ("Urology", ("208800000X",), ("urologist", "urology")),
+}
+
+# Queries that cover several specialties at once
+SPECIALTY_GROUPS = {
+    "primary care": ("family", "internal", "general_practice"),
+    "primary care doctor": ("family", "internal", "general_practice"),
+    "primary care physician": ("family", "internal", "general_practice"),
+    "pcp": ("family", "internal", "general_practice"),
+}
+
+# Words that do not change which specialty is meant ("a cardiologist near me")
+FILLER_WORDS = {"a", "an", "the", "my", "me", "near", "doctor", "dr", "physician", "specialist", "md", "in", "for"}
+
+# Short synonyms that are also surnames or initials ("Dr. Heart", "P. A. Smith"):
+# on their own they are a name search, with a qualifier ("skin doctor") a specialty
+NAME_LIKE_LABELS = {"pa", "np", "ob", "gyn", "pt", "gi", "gp", "ent", "heart", "skin"}
+QUALIFIER_WORDS = {"doctor", "specialist", "physician"}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def _singular(token):
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def normalize_specialty(text):
+    """Normalized lookup form: lowercase words without punctuation, plurals or filler."""
+    tokens = [_singular(token) for token in _NON_ALNUM.sub(" ", (text or "").lower().replace("'", "")).split()]
+    meaningful = [token for token in tokens if token not in FILLER_WORDS]
+    return " ".join(meaningful or tokens)
+
+
+def _build_indexes():
+    labels = {}
+    codes = {}
+    for key, (display_name, taxonomy_codes, synonyms) in SPECIALTIES.items():
+        for label in (display_name, key.replace("_", " "), *synonyms):
+            labels.setdefault(normalize_specialty(label), set()).add(key)
+        for code in taxonomy_codes:
+            codes[code.upper()] = key
+    for phrase, keys in SPECIALTY_GROUPS.items():
+        labels.setdefault(normalize_specialty(phrase), set()).update(keys)
+    return {label: frozenset(keys) for label, keys in labels.items()}, codes
+
+
+# Built once at import: normalized label -> specialty keys, taxonomy code -> specialty key
+_LABELS, _CODES = _build_indexes()
+
+
+def classify_specialty(query):
+    """
+    Decide whether a doctor search is for a specialty.
+
+    Args:
+        query (str): What the user asked for (e.g. "dermatologist", "Family Medicine")
+
+    Returns:
+        frozenset: Matching specialty keys, or None if the query looks like a name
+    """
+    label = normalize_specialty(query)
+    if label in NAME_LIKE_LABELS:
+        words = set(_NON_ALNUM.sub(" ", (query or "").lower()).split())
+        if words.isdisjoint(QUALIFIER_WORDS):
+            return None
+    return _LABELS.get(label)
+
+
+def specialty_search_term(keys):
+    """Display name to send to the gateway for a specialty search."""
+    return SPECIALTIES[sorted(keys)[0]][0]
+
+
+def record_specialties(record):
+    """Specialty keys of a provider record, from its taxonomy code and specialty labels."""
+    keys = set()
+    for value in (record.taxonomy, *record.specialties):
+        if not isinstance(value, str):
+            continue
+        code = _CODES.get(value.strip().upper())
+        if code:
+            keys.add(code)
+        for part in (value, *value.split(",")):
+            keys.update(_LABELS.get(normalize_specialty(part), ()))
+    return keys
+
+
+def filter_by_specialty(records, keys):
+    """Keep records whose taxonomy or specialties match any of the specialty keys."""
+    return [record for record in records if not keys.isdisjoint(record_specialties(record))]
@@ -0,0 +1,58 @@
+import asyncio
+
+import httpx
+
+import appointment
+from appointment import AvailabilityCalendar
+
+
+def test_taken_answer_overrides_earlier_available():
+    calendar = AvailabilityCalendar()
+    calendar.record("2024-05-20T14:00:00", {"isAvailable": True})
+    assert calendar.lookup("2024-05-20T14:00:00") == {"isAvailable": True}
+
+    calendar.record("2024-05-20T14:00:00", {"isAvailable": False, "availableDate": "2024-05-20T15:00:00"})
+    assert calendar.lookup("2024-05-20T14:00:00") == {"isAvailable": False, "availableDate": "2024-05-20T15:00:00"}
+
+
+def test_busy_interval_answers_times_inside_it():
+    calendar = AvailabilityCalendar()
+    calendar.record("2024-05-20T14:00:00", {"isAvailable": False, "availableDate": "2024-05-20T15:00:00"})
+    assert calendar.lookup("2024-05-20T14:30:00")["availableDate"] == "2024-05-20T15:00:00"
+    assert calendar.lookup("2024-05-20T15:00:00") == {"isAvailable": True}
+    assert calendar.lookup("2024-05-20T16:00:00") is None
+
+    # An authoritative "available" inside the interval replaces it
+    calendar.record("2024-05-20T14:30:00", {"isAvailable": True})
+    assert calendar.lookup("2024-05-20T14:15:00") is None
+
+
+def test_rejected_booking_invalidates_calendar(monkeypatch):
+    calendar = AvailabilityCalendar()
+    calendar.record("2024-05-20T14:00:00", {"isAvailable": True})
+    appointment._calendars.set((appointment.AGENT_USERNAME, appointment.tennatid), calendar)
+
+    async def gateway_post(endpoint, payload):
+        return httpx.Response(409, text="slot taken")
+    monkeypatch.setattr(appointment, "gateway_post", gateway_post)
+    result = asyncio.run(appointment.book_appointment("2024-05-20T14:00:00"))
+    assert result["appointment_confirmed"] is False
+    assert appointment._calendars.get((appointment.AGENT_USERNAME, appointment.tennatid)) is None
+
+
+def test_prefetch_tasks_are_held_until_done(monkeypatch):
+    monkeypatch.setattr(appointment, "APPOINTMENT_PREFETCH_PROBES", 1)
+    appointment.invalidate_availability()
+
+    async def gateway_get(endpoint):
+        return httpx.Response(200, json={"isAvailable": True})
+    monkeypatch.setattr(appointment, "gateway_get", gateway_get)
+
+    async def run():
+        await appointment.check_appointment_in_data("2024-05-20T14:00:00")
+        assert len(appointment._prefetch_tasks) == 1
+        await asyncio.gather(*appointment._prefetch_tasks)
+        await asyncio.sleep(0)
+    asyncio.run(run())
+    assert not appointment._prefetch_tasks
+    appointment.invalidate_availability()
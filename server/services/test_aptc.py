@@ -0,0 +1,54 @@
+import math
+
+import pytest
+
+import aptc
+
+# Monthly age-21 benchmark premiums, made up for the tests
+BENCHMARKS = {"12086": 400.0, "06037": 400.0, "48201": 400.0, "02020": 400.0}
+
+
+@pytest.fixture(autouse=True)
+def slcsp_table(tmp_path, monkeypatch):
+    with open(tmp_path / "slcsp_2024.csv", "w", encoding="utf-8") as f:
+        f.write("county_fips,slcsp_age21\n")
+        f.writelines(f"{fips},{premium}\n" for fips, premium in BENCHMARKS.items())
+    monkeypatch.setenv("SLCSP_DIR", str(tmp_path))
+    monkeypatch.setattr(aptc, "_slcsp", {})
+
+
+def _estimate(income, age, state, fips, **options):
+    return float(aptc.estimate_aptc([income], [age], [state], [fips], **options)[0])
+
+
+@pytest.mark.parametrize("income, age, state, fips, size, expected", [
+    # 200% FPL (2 x 14,580) pays 2% of income: 29,160 * 0.02 / 12 = 48.60; age 40 factor 1.278
+    (29160, 40, "FL", "12086", 1, 400 * 1.278 - 48.60),
+    # 300% FPL pays 6%: 43,740 * 0.06 / 12 = 218.70
+    (43740, 21, "FL", "12086", 1, 400 - 218.70),
+    # 225% FPL is halfway between 2% and 4%: 32,805 * 0.03 / 12; age 64 factor 3.0
+    (32805, 64, "FL", "12086", 1, 1200 - 32805 * 0.03 / 12),
+    # Above 400% FPL the contribution is capped at 8.5%: 100,000 * 0.085 / 12
+    (100000, 64, "FL", "12086", 1, 1200 - 100000 * 0.085 / 12),
+    (100000, 21, "FL", "12086", 1, 0.0),
+    # Two people: FPL 14,580 + 5,140 = 19,720, so 39,440 is 200%
+    (39440, 21, "FL", "12086", 2, 400 - 39440 * 0.02 / 12),
+    # Alaska guideline 18,210: 36,420 is 200%
+    (36420, 21, "AK", "02020", 1, 400 - 36420 * 0.02 / 12),
+    # 120% FPL: a non-expansion state pays nothing, an expansion state leaves it to Medicaid
+    (17496, 21, "TX", "48201", 1, 400.0),
+    (17496, 21, "CA", "06037", 1, 0.0),
+])
+def test_hand_computed_households(income, age, state, fips, size, expected):
+    assert _estimate(income, age, state, fips, household_sizes=size) == pytest.approx(expected)
+
+
+def test_other_coverage_and_unknown_counties():
+    assert _estimate(29160, 40, "FL", "12086", has_other_coverage=True) == 0.0
+    assert math.isnan(_estimate(29160, 40, "FL", "99999"))
+
+
+def test_household_estimate_rounds_to_cents():
+    household = {"income": 32805, "age": 64}
+    assert aptc.estimate_household(household, {"state": "FL", "fips": "12086"}) == round(1200 - 32805 * 0.03 / 12, 2)
+    assert aptc.estimate_household(household, {"state": "FL", "fips": "99999"}) is None
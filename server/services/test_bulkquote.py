@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import bulkquote
+from savings import SavingsUnavailable
+
+COUNTY = {"fips": "12086", "state": "FL"}
+QUOTE = {"savings": "250", "healthplan": "Bronze", "roundedplan": 10}
+
+
+def _patch(monkeypatch, compute, counties=(COUNTY,)):
+    async def resolve_zip(zip_code):
+        return list(counties)
+    monkeypatch.setattr(bulkquote, "resolve_zip", resolve_zip)
+    monkeypatch.setattr(bulkquote, "quote_savings", compute)
+
+
+def _results(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_gateway_failures_are_retryable_errors(tmp_path, monkeypatch):
+    async def compute(household, county, income_bucket):
+        raise SavingsUnavailable("Eligibility request failed: 500")
+    _patch(monkeypatch, compute)
+    output = tmp_path / "out.jsonl"
+    report = asyncio.run(bulkquote.quote_households([(0, {"zip_code": "33101"})], str(output), retries=0))
+    assert report["failed"] == 1
+    assert _results(output) == [{"row": 0, "error": "Eligibility request failed: 500", "retryable": True}]
+    assert bulkquote.completed_rows(str(output)) == set()
+
+
+def test_decode_errors_are_retried(monkeypatch):
+    calls = []
+
+    async def compute(household, county, income_bucket):
+        calls.append(1)
+        if len(calls) == 1:
+            json.loads("<html>")
+        return dict(QUOTE)
+    _patch(monkeypatch, compute)
+    assert asyncio.run(bulkquote.quote_household({"zip_code": "33101"}, retries=1, backoff=0)) == QUOTE
+    assert len(calls) == 2
+
+
+def test_invalid_zip_is_not_retryable(tmp_path, monkeypatch):
+    async def compute(household, county, income_bucket):
+        raise AssertionError("not reached")
+    _patch(monkeypatch, compute, counties=())
+    output = tmp_path / "out.jsonl"
+    asyncio.run(bulkquote.quote_households([(0, {"zip_code": "00000"})], str(output)))
+    assert _results(output)[0]["retryable"] is False
+    assert bulkquote.completed_rows(str(output)) == {0}
+
+
+def test_resume_drops_unfinished_last_line(tmp_path, monkeypatch):
+    async def compute(household, county, income_bucket):
+        return dict(QUOTE)
+    _patch(monkeypatch, compute)
+    output = tmp_path / "out.jsonl"
+    output.write_text(json.dumps({"row": 0, **QUOTE}) + "\n" + '{"row": 1, "sav')
+    report = asyncio.run(bulkquote.quote_households(
+        [(0, {"zip_code": "33101"}), (1, {"zip_code": "33101"})], str(output)
+    ))
+    assert report["skipped"] == 1 and report["quoted"] == 1
+    assert [result["row"] for result in _results(output)] == [0, 1]
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+import cache
+from cache import PrefixCache, SharedStore
+from records import MedicineRecord
+
+
+def _matches(item, query):
+    return query in item
+
+
+def test_complete_prefix_answers_longer_queries():
+    cache = PrefixCache(complete_below=3)
+    cache.set("lip", ("lipitor", "lipofen"))
+    assert cache.get("Lipi", _matches) == ("lipitor",)
+    assert cache.get("lipo", _matches) == ("lipofen",)
+    assert cache.prefix_hits == 2
+
+
+def test_capped_prefix_is_not_used():
+    cache = PrefixCache(complete_below=2)
+    cache.set("lip", ("lipitor", "lipofen"))
+    assert cache.get("lipi", _matches) is None
+    assert cache.get("lip", _matches) == ("lipitor", "lipofen")
+
+
+def test_scopes_are_kept_apart():
+    cache = PrefixCache()
+    cache.set("lip", ("lipitor",), scope=2024)
+    assert cache.get("lipi", _matches, scope=2025) is None
+    assert cache.get("lipi", _matches, scope=2024) == ("lipitor",)
+
+
+def test_shared_store_writes_reach_other_processes(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    writer, reader = SharedStore(path), SharedStore(path)
+    writer.set("zip", "33101", ("12086",), time.time() + 60)
+    writer.set("zip", "10001", ("36061",), time.time() - 1)
+    writer.flush()
+    assert reader.get("zip", "33101")[1] == ("12086",)
+    assert reader.get("zip", "10001") is None
+
+    writer.delete("zip", "33101")
+    writer.flush()
+    assert reader.get("zip", "33101") is None
+
+
+def test_shared_values_round_trip_as_json(tmp_path):
+    store = SharedStore(str(tmp_path / "cache.sqlite"))
+    value = ((MedicineRecord("Lipitor", "10 MG", "Lipitor 10 MG"),), True)
+    store.set("medicine", (2024, "lip"), value, time.time() + 60)
+    store.set("zip", "33101", [{"name": "Miami-Dade", "fips": "12086"}], time.time() + 60)
+    store.flush()
+    (records, complete) = store.get("medicine", (2024, "lip"))[1]
+    assert complete is True and records[0].to_medicine() == value[0][0].to_medicine()
+    assert store.get("zip", "33101")[1] == [{"name": "Miami-Dade", "fips": "12086"}]
+    with pytest.raises(TypeError):
+        store.set("zip", "x", object(), time.time() + 60)
+
+
+def test_async_lookups_read_the_shared_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "_shared_store", SharedStore(str(tmp_path / "cache.sqlite")))
+    monkeypatch.setattr(cache, "_shared_store_pid", os.getpid())
+    monkeypatch.setattr(cache, "SHARED_CACHE_PATH", str(tmp_path / "cache.sqlite"))
+    writer = PrefixCache(shared="test-medicine")
+    writer.set("lip", ("lipitor", "lipofen"))
+    cache._shared_store.flush()
+
+    reader = PrefixCache(shared="test-medicine")
+    assert asyncio.run(reader.aget("lipi", _matches)) == ("lipitor",)
+    assert asyncio.run(reader.aget("aspirin", _matches)) is None
+    assert reader.stats()["shared_hits"] == 0 and reader.stats()["misses"] == 2
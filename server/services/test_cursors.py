@@ -0,0 +1,41 @@
+from cursors import CursorStore
+
+
+class _Session:
+    pass
+
+
+class _Context:
+    def __init__(self, session):
+        self.session = session
+
+
+def test_sessions_only_see_their_own_search():
+    store = CursorStore()
+    first, second = _Context(_Session()), _Context(_Session())
+    store.save({"query": "lipitor", "page": 1}, first)
+    store.save({"query": "aspirin", "page": 3}, second)
+    assert store.load(ctx=first)[1] == {"query": "lipitor", "page": 1}
+    assert store.load(ctx=second)[1] == {"query": "aspirin", "page": 3}
+    assert store.load(ctx=_Context(_Session())) == (None, None)
+    assert store.load() == (None, None)
+
+
+def test_explicit_cursor_is_reused_and_updated():
+    store = CursorStore()
+    ctx = _Context(_Session())
+    cursor = store.save({"query": "lipitor", "page": 1}, ctx)
+    other = store.save({"query": "aspirin", "page": 1}, ctx)
+
+    # The older search stays reachable by its token, from any session
+    assert store.save({"query": "lipitor", "page": 2}, None, cursor) == cursor
+    assert store.load(cursor) == (cursor, {"query": "lipitor", "page": 2})
+    assert store.load(ctx=ctx) == (other, {"query": "aspirin", "page": 1})
+    assert store.load("unknown") == (None, None)
+
+
+def test_loaded_state_is_a_copy():
+    store = CursorStore()
+    cursor = store.save({"page": 1})
+    store.load(cursor)[1]["page"] = 5
+    assert store.load(cursor)[1] == {"page": 1}
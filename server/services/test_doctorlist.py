@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+import doctorlist
+from records import ProviderRecord
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    doctorlist._search_cache.clear()
+    yield
+    doctorlist._search_cache.clear()
+
+
+def _fetch_returning(doctors, calls=None):
+    async def fetch_doctor(query, zipcode, limit=None):
+        if calls is not None:
+            calls.append((query, zipcode, limit))
+        return list(doctors)
+    return fetch_doctor
+
+
+def test_specialty_search_keeps_matching_doctors(monkeypatch):
+    cardiologist = ProviderRecord(name="Ann Lee", taxonomy="207RC0000X", zipcode="33101")
+    dentist = ProviderRecord(name="Bob Ray", taxonomy="122300000X", zipcode="33101")
+    monkeypatch.setattr(doctorlist, "fetch_doctor", _fetch_returning([cardiologist, dentist]))
+    assert list(asyncio.run(doctorlist.search_doctors("cardiologist", "33101"))) == [cardiologist]
+
+
+def test_unrecognised_specialty_labels_fall_back_to_the_gateway_match(monkeypatch):
+    unlabelled = [ProviderRecord(name="Ann Lee", taxonomy="Heart Stuff", zipcode="33101")]
+    monkeypatch.setattr(doctorlist, "fetch_doctor", _fetch_returning(unlabelled))
+    assert list(asyncio.run(doctorlist.search_doctors("cardiologist", "33101"))) == unlabelled
+
+
+def test_search_cache_keeps_radius_and_plan_year_apart(monkeypatch):
+    calls = []
+    monkeypatch.setattr(doctorlist, "fetch_doctor", _fetch_returning([ProviderRecord(name="Ann Lee", zipcode="33101")], calls))
+    for max_miles in (None, 10, None, 10):
+        asyncio.run(doctorlist.search_doctors("Ann Lee", "33101", max_miles))
+    assert len(calls) == 2
+
+    monkeypatch.setattr(doctorlist, "PLAN_YEAR", 2025)
+    asyncio.run(doctorlist.search_doctors("Ann Lee", "33101"))
+    assert len(calls) == 3
+
+
+def test_failed_searches_are_not_cached(monkeypatch):
+    calls = []
+    monkeypatch.setattr(doctorlist, "fetch_doctor", _fetch_returning([], calls))
+    asyncio.run(doctorlist.search_doctors("Nobody Known", "33101"))
+    asyncio.run(doctorlist.search_doctors("Nobody Known", "33101"))
+    assert len(calls) == 2
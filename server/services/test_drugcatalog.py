@@ -0,0 +1,50 @@
+import asyncio
+
+import httpx
+import pytest
+
+import drugcatalog
+import gateway
+
+
+def test_crawl_extends_full_prefixes_with_digits_and_separators(monkeypatch):
+    queried = []
+
+    async def gateway_get(endpoint):
+        prefix = httpx.URL(endpoint).params["name"]
+        queried.append(prefix)
+        if prefix == "vi":
+            return httpx.Response(200, json=[{"name": f"vi {i}"} for i in range(drugcatalog.AUTOCOMPLETE_LIMIT)])
+        return httpx.Response(200, json=[])
+    monkeypatch.setattr(gateway, "gateway_get", gateway_get)
+
+    asyncio.run(drugcatalog.crawl_catalog(2024))
+    assert {"vit", "vi1", "vi ", "vi-"} <= set(queried)
+    assert len(queried) == 26 * 26 + len(drugcatalog.PREFIX_ALPHABET)
+
+
+def test_lookup_returns_at_most_the_autocomplete_limit(tmp_path, monkeypatch):
+    monkeypatch.setenv("DRUG_CATALOG_DIR", str(tmp_path))
+    monkeypatch.setattr(drugcatalog, "_catalogs", {})
+    items = [{"name": f"Lipitor {i}", "strength": "10 MG"} for i in range(drugcatalog.AUTOCOMPLETE_LIMIT + 5)]
+    drugcatalog.build_catalog(items, drugcatalog.catalog_path(2024))
+
+    medicines = drugcatalog.lookup_drugs("lipi", 2024)
+    assert len(medicines) == drugcatalog.AUTOCOMPLETE_LIMIT
+    assert drugcatalog.lookup_drugs("aspirin", 2024) is None
+
+
+def test_crawl_skips_failed_prefixes_up_to_a_threshold(monkeypatch):
+    async def gateway_get(endpoint):
+        prefix = httpx.URL(endpoint).params["name"]
+        if prefix == "ab":
+            raise gateway.GatewayUnavailable("circuit open")
+        if prefix == "ac":
+            return httpx.Response(200, text="<html>")
+        return httpx.Response(200, json=[{"name": prefix}])
+    monkeypatch.setattr(gateway, "gateway_get", gateway_get)
+
+    items = asyncio.run(drugcatalog.crawl_catalog(2024))
+    assert len(items) == 26 * 26 - 2
+    with pytest.raises(drugcatalog.CrawlFailed):
+        asyncio.run(drugcatalog.crawl_catalog(2024, max_skipped=0.001))
@@ -0,0 +1,161 @@
+import asyncio
+
+import httpx
+import pytest
+
+import gateway
+
+
+@pytest.fixture(autouse=True)
+def fresh_gateway(monkeypatch):
+    monkeypatch.setattr(gateway, "GATEWAY_RETRY_BACKOFF", 0)
+    gateway._breakers.clear()
+    gateway._stats.clear()
+    yield
+    gateway._breakers.clear()
+    gateway._stats.clear()
+
+
+def _run_with_transport(handler, calls):
+    """Run `calls(results)` against a gateway client backed by `handler`."""
+    async def run():
+        gateway._client = httpx.AsyncClient(base_url="http://gateway", transport=httpx.MockTransport(handler))
+        gateway._client_loop = asyncio.get_running_loop()
+        try:
+            return await calls()
+        finally:
+            await gateway.close_client()
+    return asyncio.run(run())
+
+
+def test_circuit_opens_after_consecutive_failures(monkeypatch):
+    monkeypatch.setattr(gateway, "GATEWAY_GET_RETRIES", 0)
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(500)
+
+    async def calls():
+        for _ in range(gateway.GATEWAY_BREAKER_FAILURES):
+            assert (await gateway.gateway_get("/api/zip-by-details?zip=1")).status_code == 500
+        with pytest.raises(gateway.GatewayUnavailable):
+            await gateway.gateway_get("/api/zip-by-details?zip=1")
+
+    _run_with_transport(handler, calls)
+    assert len(requests) == gateway.GATEWAY_BREAKER_FAILURES
+    assert gateway.get_gateway_stats()["zip-by-details"]["circuit"] == "open"
+    assert gateway.get_gateway_stats()["zip-by-details"]["circuit_open"] == 1
+
+
+def test_half_open_trial_closes_the_circuit(monkeypatch):
+    breaker = gateway.CircuitBreaker(failures=1, reset_after=0)
+    breaker.failure()
+    assert breaker.state == "half_open"
+    assert breaker.allow() and not breaker.allow()  # a single trial
+    breaker.success()
+    assert breaker.state == "closed"
+
+
+def test_only_the_trial_holder_frees_the_trial_slot():
+    breaker = gateway.CircuitBreaker(failures=1, reset_after=0)
+    other = breaker.allow()  # sent while closed, still in flight
+    breaker.failure()
+    trial = breaker.allow()
+    assert trial is not None and breaker.allow() is None
+
+    # Cancelling or failing another request leaves the trial in place
+    breaker.release(other)
+    breaker.failure(other)
+    assert breaker.allow() is None
+    breaker.release(trial)
+    assert breaker.allow() is not None
+
+
+def test_cancelled_request_does_not_release_a_running_trial(monkeypatch):
+    monkeypatch.setattr(gateway, "GATEWAY_HEDGE_DELAY", 0)
+    breaker = gateway._breakers.setdefault("slow", gateway.CircuitBreaker(failures=1, reset_after=0))
+
+    async def run():
+        async def slow():
+            await asyncio.sleep(10)
+        closed_call = asyncio.ensure_future(gateway._call("/api/slow", slow))
+        await asyncio.sleep(0)
+        breaker.failure()
+        trial_call = asyncio.ensure_future(gateway._call("/api/slow", slow))
+        await asyncio.sleep(0)
+        closed_call.cancel()
+        await asyncio.sleep(0)
+        allowed = breaker.allow()
+        trial_call.cancel()
+        return allowed
+    assert asyncio.run(run()) is None
+
+
+def test_gets_retry_transient_statuses_and_posts_do_not():
+    statuses = {"GET": [503, 200], "POST": [503, 200]}
+
+    def handler(request):
+        return httpx.Response(statuses[request.method].pop(0))
+
+    async def calls():
+        return (await gateway.gateway_get("/api/a")).status_code, (await gateway.gateway_post("/api/b", {})).status_code
+
+    assert _run_with_transport(handler, calls) == (200, 503)
+    assert gateway.get_gateway_stats()["a"]["retries"] == 1
+    assert gateway.get_gateway_stats()["b"].get("retries", 0) == 0
+
+
+def test_attempt_deadline_covers_slow_bodies(monkeypatch):
+    monkeypatch.setitem(gateway.ENDPOINT_TIMEOUTS, "slow", 0.05)
+
+    async def send():
+        await asyncio.sleep(1)  # e.g. a body trickling in under the read timeout
+
+    async def calls():
+        started = asyncio.get_running_loop().time()
+        with pytest.raises(gateway.GatewayTimeout):
+            await gateway._call("/api/slow", send, retries=1)
+        return asyncio.get_running_loop().time() - started
+
+    assert asyncio.run(calls()) < 0.5
+    assert gateway.get_gateway_stats()["slow"]["timeout"] == 2
+
+
+def test_hedged_request_wins_when_first_is_slow(monkeypatch):
+    monkeypatch.setattr(gateway, "GATEWAY_HEDGE_DELAY", 0.01)
+    attempts = []
+
+    async def send():
+        attempts.append(1)
+        await asyncio.sleep(1 if len(attempts) == 1 else 0)
+        return httpx.Response(200)
+
+    result = asyncio.run(gateway._call("/api/search-providers-all", send, hedge=True))
+    assert result.status_code == 200
+    assert gateway.get_gateway_stats()["search-providers-all"]["hedged"] == 1
+
+
+def _parse(chunks):
+    async def source():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [item async for item in gateway.iter_json_array(source())]
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("chunks, expected", [
+    (["[12", "34]"], [1234]),
+    (["[1.", "5, tr", "ue, nu", "ll]"], [1.5, True, None]),
+    (['[{"a": 1}', ', "x"', "]"], [{"a": 1}, "x"]),
+    (["[1", " ", ", 2 ", " ]"], [1, 2]),
+])
+def test_json_array_split_across_chunks(chunks, expected):
+    assert _parse(chunks) == expected
+
+
+def test_truncated_json_array_raises():
+    with pytest.raises(ValueError):
+        _parse(["[1, 2"])
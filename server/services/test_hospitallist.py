@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+import hospitallist
+from records import ProviderRecord
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    hospitallist._search_cache.clear()
+    yield
+    hospitallist._search_cache.clear()
+
+
+def _fetch_returning(results, calls):
+    async def fetch_hospital(zipcode, query, limit=None):
+        calls.append((zipcode, query))
+        return results
+    return fetch_hospital
+
+
+@pytest.mark.parametrize("results", [[], None])
+def test_empty_and_failed_searches_are_not_cached(monkeypatch, results):
+    calls = []
+    monkeypatch.setattr(hospitallist, "fetch_hospital", _fetch_returning(results, calls))
+    asyncio.run(hospitallist.search_hospitals("", "33101"))
+    asyncio.run(hospitallist.search_hospitals("", "33101"))
+    assert len(calls) == 2
+
+
+def test_found_hospitals_are_cached(monkeypatch):
+    calls = []
+    hospital = ProviderRecord(name="Mercy Hospital", zipcode="33101")
+    monkeypatch.setattr(hospitallist, "fetch_hospital", _fetch_returning([hospital], calls))
+    assert asyncio.run(hospitallist.search_hospitals("", "33101")) == (hospital,)
+    assert asyncio.run(hospitallist.search_hospitals("", "33101")) == (hospital,)
+    assert len(calls) == 1
@@ -0,0 +1,38 @@
+import asyncio
+
+import medicinelist
+from records import MedicineRecord
+
+MEDICINES = (
+    MedicineRecord("Lipitor", "10 MG", "Lipitor 10 MG Oral Tablet"),
+    MedicineRecord("Aspirin", "81 MG", "Aspirin 81 MG Chewable Tablet"),
+    MedicineRecord("LIPITOR", "20 MG", "Lipitor 20 MG Oral Tablet"),
+    MedicineRecord("Lipitor", "10 MG", "Lipitor 10 MG Oral Tablet"),
+    MedicineRecord("Zocor", "5 MG", "Zocor 5 MG Oral Tablet"),
+    MedicineRecord("Aspirin", "325 MG", "Aspirin 325 MG Oral Tablet"),
+)
+
+
+def test_groups_keep_first_appearance_order_and_drop_repeated_strengths():
+    assert medicinelist.group_medicines(MEDICINES) == [
+        {"name": "Lipitor", "strengths": ["10 MG", "20 MG"]},
+        {"name": "Aspirin", "strengths": ["81 MG", "325 MG"]},
+        {"name": "Zocor", "strengths": ["5 MG"]},
+    ]
+
+
+def test_grouped_pages_count_drugs_not_strengths(monkeypatch):
+    async def fetch_medicine(query, year=medicinelist.PLAN_YEAR):
+        return MEDICINES
+    monkeypatch.setattr(medicinelist, "fetch_medicine", fetch_medicine)
+
+    first = asyncio.run(medicinelist.build_medicine_page("lip", page=1, items_per_page=2, grouped=True))
+    assert [group["name"] for group in first["medicines"]] == ["Lipitor", "Aspirin"]
+    assert first["pagination"]["total_items"] == 3 and first["pagination"]["has_next"]
+
+    last = asyncio.run(medicinelist.build_medicine_page("lip", page=9, items_per_page=2, grouped=True))
+    assert last["medicines"] == [{"name": "Zocor", "strengths": ["5 MG"]}]
+    assert last["pagination"]["current_page"] == 2 and not last["pagination"]["has_next"]
+
+    rows = asyncio.run(medicinelist.build_medicine_page("lip", page=1, items_per_page=2))
+    assert rows["pagination"]["total_items"] == len(MEDICINES)
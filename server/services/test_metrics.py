@@ -0,0 +1,54 @@
+from metrics import Counter, Gauge, Histogram, merge, render
+
+
+def _samples(text):
+    return dict(line.rsplit(" ", 1) for line in text.splitlines() if line and not line.startswith("#"))
+
+
+def _worker(calls, latencies, entries):
+    counter = Counter("tool_calls_total", "Tool calls.", ("tool", "outcome"))
+    for outcome in calls:
+        counter.inc("zip", outcome)
+    histogram = Histogram("tool_seconds", "Latency.", ("tool",), buckets=(0.1, 1.0))
+    for value in latencies:
+        histogram.observe("zip", value=value)
+    gauge = Gauge("cache_entries", "Entries.", ("cache",), lambda: [(("zip",), entries)])
+    return render([counter, histogram, gauge])
+
+
+def test_exposition_format():
+    text = _worker(["ok", "ok", "error"], [0.05, 0.5, 2.0], 7)
+    lines = text.splitlines()
+    assert lines[:2] == ["# HELP tool_calls_total Tool calls.", "# TYPE tool_calls_total counter"]
+    assert "# TYPE tool_seconds histogram" in lines and "# TYPE cache_entries gauge" in lines
+    assert _samples(text) == {
+        'tool_calls_total{tool="zip",outcome="ok"}': "2",
+        'tool_calls_total{tool="zip",outcome="error"}': "1",
+        'tool_seconds_bucket{tool="zip",le="0.1"}': "1",
+        'tool_seconds_bucket{tool="zip",le="1.0"}': "2",
+        'tool_seconds_bucket{tool="zip",le="+Inf"}': "3",
+        'tool_seconds_sum{tool="zip"}': "2.55",
+        'tool_seconds_count{tool="zip"}': "3",
+        'cache_entries{cache="zip"}': "7",
+    }
+    assert text.endswith("\n")
+
+
+def test_label_values_are_escaped():
+    counter = Counter("c_total", "C.", ("tool",))
+    counter.inc('a"b\\c\nd')
+    assert 'c_total{tool="a\\"b\\\\c\\nd"} 1' in render([counter])
+
+
+def test_merge_adds_up_two_workers():
+    first = _worker(["ok", "ok"], [0.05], 7)
+    second = _worker(["ok", "error"], [0.5, 3.0], 3)
+    merged = merge([first, second])
+    assert merged.count("# TYPE tool_calls_total counter") == 1
+    samples = _samples(merged)
+    assert samples['tool_calls_total{tool="zip",outcome="ok"}'] == "3"
+    assert samples['tool_calls_total{tool="zip",outcome="error"}'] == "1"
+    assert samples['tool_seconds_bucket{tool="zip",le="0.1"}'] == "1"
+    assert samples['tool_seconds_bucket{tool="zip",le="+Inf"}'] == "3"
+    assert samples['tool_seconds_sum{tool="zip"}'] == "3.55"
+    assert samples['cache_entries{cache="zip"}'] == "10"
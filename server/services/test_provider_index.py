@@ -0,0 +1,51 @@
+import provider_index
+from provider_index import ProviderIndex, provider_identity
+from records import ProviderRecord
+
+
+def _doctor(name, npi):
+    return ProviderRecord(name=name, npi=npi)
+
+
+def _names(records):
+    return [record.name for record in records]
+
+
+def test_search_tolerates_typos_and_word_order():
+    index = ProviderIndex()
+    index.add_all([_doctor("Jeffrey Calder MD", "1"), _doctor("Maria Lopez", "2")])
+    assert _names(index.search("calder jefrey")) == ["Jeffrey Calder MD"]
+    assert index.search("zzzz") == []
+
+
+def test_full_index_evicts_least_recently_seen():
+    index = ProviderIndex(identity_of=provider_identity, max_records=2)
+    index.add(_doctor("Jeffrey Calder", "1"))
+    index.add(_doctor("Maria Lopez", "2"))
+    # Seeing Calder again makes Lopez the least recent
+    assert index.add(_doctor("Jeffrey Calder", "1")) is False
+    index.add(_doctor("Anne Smith", "3"))
+    assert len(index) == 2 and index.evictions == 1
+    assert index.search("lopez") == []
+    assert _names(index.search("calder")) == ["Jeffrey Calder"]
+
+
+def test_expired_records_are_not_returned(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(provider_index.time, "monotonic", lambda: now[0])
+    index = ProviderIndex(identity_of=provider_identity, ttl=60)
+    index.add(_doctor("Jeffrey Calder", "1"))
+    now[0] += 61
+    assert index.search("calder") == []
+    index.add(_doctor("Maria Lopez", "2"))
+    assert len(index) == 1
+
+
+def test_compaction_keeps_live_records_searchable():
+    index = ProviderIndex(identity_of=provider_identity, max_records=10)
+    for i in range(2000):
+        index.add(_doctor(f"Doctor Number{i}", str(i)))
+    assert len(index) == 10
+    assert len(index.records) < 2000
+    assert _names(index.search("number1999"))[0] == "Doctor Number1999"
+    assert "Doctor Number5" not in _names(index.search("number5"))
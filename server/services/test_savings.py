@@ -0,0 +1,55 @@
+import asyncio
+
+import httpx
+import pytest
+
+import savings
+
+COUNTY = {"fips": "12086", "state": "FL"}
+USER = {
+    "annual_income": 30000, "age": 30, "gender": "male", "pregnancy_status": "No",
+    "tobacco_use": "No", "employer_coverage": False, "zip_code": "33101",
+}
+
+
+def _fake_gateway(eligibility_status):
+    async def gateway_post(endpoint, payload):
+        if endpoint == savings.ELIGIBILITY_ENDPOINT:
+            if eligibility_status != 200:
+                return httpx.Response(eligibility_status, text="upstream error")
+            return httpx.Response(200, json={"estimates": [{"aptc": 250}]})
+        return httpx.Response(200, json={"plans": [{"name": "Bronze", "premium_W_Credit": 10.4}]})
+    return gateway_post
+
+
+@pytest.fixture(autouse=True)
+def clean_cache(monkeypatch):
+    monkeypatch.setattr(savings, "SAVINGS_APTC_MODE", "gateway")
+    savings._savings_cache.clear()
+    yield
+    savings._savings_cache.clear()
+
+
+def test_failed_eligibility_raises_and_is_not_cached(monkeypatch):
+    monkeypatch.setattr(savings, "gateway_post", _fake_gateway(500))
+    with pytest.raises(savings.SavingsUnavailable):
+        asyncio.run(savings.quote_savings(USER, COUNTY))
+    assert len(savings._savings_cache) == 0
+
+    # Once the gateway is back the real amount is returned, not a cached $0
+    monkeypatch.setattr(savings, "gateway_post", _fake_gateway(200))
+    result = asyncio.run(savings.quote_savings(USER, COUNTY))
+    assert result == {"savings": "250", "healthplan": "Bronze", "roundedplan": 10}
+    assert len(savings._savings_cache) == 1
+
+
+def test_malformed_eligibility_body_raises():
+    with pytest.raises(savings.SavingsUnavailable):
+        savings._read_aptc(httpx.Response(200, text="<html>busy</html>"))
+    assert savings._read_aptc(httpx.Response(200, json={"estimates": []})) == 0
+
+
+def test_fetch_savings_falls_back_without_caching(monkeypatch):
+    monkeypatch.setattr(savings, "gateway_post", _fake_gateway(503))
+    assert asyncio.run(savings.fetch_savings(USER, COUNTY)) == savings.NO_SAVINGS
+    assert len(savings._savings_cache) == 0
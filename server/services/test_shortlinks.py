@@ -0,0 +1,18 @@
+import shortlinks
+from shortlinks import ShortLinkStore
+
+
+def test_save_is_idempotent_and_prunes_at_most_once_per_interval(tmp_path, monkeypatch):
+    store = ShortLinkStore(str(tmp_path / "links.sqlite"))
+    token = store.save('{"a":1}')
+    assert store.save('{"a":1}') == token
+    assert store.load(token) == '{"a":1}'
+
+    # Expired since the last prune, but not deleted until the interval has passed
+    monkeypatch.setattr(shortlinks, "SHORTLINK_TTL_DAYS", -1)
+    other = store.save('{"b":2}')
+    assert store.load(token) == '{"a":1}'
+
+    store._pruned_at -= shortlinks.SHORTLINK_PRUNE_INTERVAL
+    store.save('{"c":3}')
+    assert store.load(token) is None and store.load(other) is None
@@ -0,0 +1,48 @@
+import pytest
+
+from sortedtable import SortedTable, pad, write_table
+
+KEY_WIDTH = 5
+RECORD_WIDTH = 9
+
+
+def _record(key, value):
+    return pad(key, KEY_WIDTH) + pad(value, RECORD_WIDTH - KEY_WIDTH)
+
+
+@pytest.fixture
+def table(tmp_path):
+    rows = [("10001", "a"), ("33101", "b"), ("33101", "c"), ("99950", "z"), ("02134", "f")]
+    path = tmp_path / "table.idx"
+    write_table(str(path), ((pad(key, KEY_WIDTH), _record(key, value)) for key, value in rows), KEY_WIDTH, RECORD_WIDTH)
+    table = SortedTable(str(path))
+    yield table
+    table.close()
+
+
+def test_exact_hit_returns_every_record_for_the_key(table):
+    assert table.find(b"33101") == [_record("33101", "b"), _record("33101", "c")]
+
+
+def test_miss_returns_nothing(table):
+    assert table.find(b"33102") == []
+    assert table.find(b"00000") == []
+    assert table.find(b"99999") == []
+
+
+def test_first_and_last_keys(table):
+    assert len(table) == 5
+    assert table.find(b"02134") == [_record("02134", "f")]
+    assert table.find(b"99950") == [_record("99950", "z")]
+
+
+def test_prefix_and_limit(table):
+    assert [record[:KEY_WIDTH] for record in table.prefix(b"3")] == [b"33101", b"33101"]
+    assert len(list(table.prefix(b"", limit=2))) == 2
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.idx"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        SortedTable(str(path))
@@ -0,0 +1,34 @@
+import pytest
+
+from records import ProviderRecord
+from specialties import classify_specialty, filter_by_specialty, record_specialties
+
+
+@pytest.mark.parametrize("query, keys", [
+    ("dermatologist", {"dermatology"}),
+    ("Family Medicine", {"family"}),
+    ("a cardiologist near me", {"cardiology"}),
+    ("Pediatricians", {"pediatrics"}),
+    ("heart doctor", {"cardiology"}),
+    ("PCP", {"family", "internal", "general_practice"}),
+])
+def test_specialty_queries(query, keys):
+    assert classify_specialty(query) == keys
+
+
+@pytest.mark.parametrize("query", ["Jeffrey Calder", "Heart", "Dr. Heart", "pa", "skin", "", None])
+def test_name_queries(query):
+    assert classify_specialty(query) is None
+
+
+def test_short_synonyms_need_a_qualifier():
+    assert classify_specialty("PA specialist") == {"physician_assistant"}
+
+
+def test_records_match_by_taxonomy_code_or_label():
+    by_code = ProviderRecord(name="A", taxonomy="207N00000X")
+    by_label = ProviderRecord(name="B", specialties=("Internal Medicine, Cardiovascular Disease",))
+    other = ProviderRecord(name="C", taxonomy="122300000X")
+    assert record_specialties(by_code) == {"dermatology"}
+    assert "cardiology" in record_specialties(by_label)
+    assert filter_by_specialty([by_code, by_label, other], frozenset({"cardiology", "dermatology"})) == [by_code, by_label]
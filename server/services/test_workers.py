@@ -0,0 +1,67 @@
+import asyncio
+import os
+
+import workers
+
+
+def test_last_worker_removes_the_socket_directory(tmp_path):
+    directory = tmp_path / f"mcp-workers-{os.getppid()}"
+    directory.mkdir()
+    first, second = directory / "1.sock", directory / "2.sock"
+    first.touch()
+    second.touch()
+
+    workers._remove_socket(str(first))
+    assert directory.exists() and not first.exists()
+    workers._remove_socket(str(second))
+    assert not directory.exists()
+    # Already gone, e.g. at exit after the lifespan shutdown
+    workers._remove_socket(str(second))
+
+
+def _run(router, scope, body=b""):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+    asyncio.run(router(scope, receive, send))
+    return sent
+
+
+def _scope(method, path, query=b""):
+    return {"type": "http", "method": method, "path": path, "query_string": query, "headers": []}
+
+
+def test_endpoint_event_names_the_owning_worker():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.body", "body": b"event: endpoint\r\ndata: /messages/?session_id=ab\r\n\r\n"})
+
+    router = workers.SessionRouter(app)
+    router.peer_server = object()
+    sent = _run(router, _scope("GET", "/sse"))
+    assert f"data: /messages/?worker={os.getpid()}&session_id=ab".encode() in sent[0]["body"]
+
+
+def test_messages_go_only_to_the_owning_worker(monkeypatch):
+    handled = []
+
+    async def app(scope, receive, send):
+        handled.append(scope["query_string"])
+
+    forwarded = []
+
+    async def forward(self, path, scope, body, send):
+        forwarded.append((os.path.basename(path), body))
+    monkeypatch.setattr(workers.SessionRouter, "_forward", forward)
+
+    router = workers.SessionRouter(app)
+    _run(router, _scope("POST", "/messages/", b"worker=1234&session_id=ab"), b"{}")
+    assert forwarded == [("1234.sock", b"{}")] and handled == []
+
+    own = f"worker={os.getpid()}&session_id=ab".encode()
+    for query in (own, b"worker=../x&session_id=ab", b"session_id=ab"):
+        _run(router, _scope("POST", "/messages/", query))
+    assert len(forwarded) == 1 and len(handled) == 3
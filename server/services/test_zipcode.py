@@ -0,0 +1,57 @@
+import asyncio
+
+import httpx
+import pytest
+
+import zipcode
+
+COUNTY = [{"name": "Miami-Dade", "fips": "12086", "state": "FL"}]
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    """Answers of the fake zip-by-details endpoint, by zip; records the zips requested."""
+    answers = {}
+    requested = []
+
+    async def gateway_get(endpoint):
+        zip_code = httpx.URL(endpoint).params["zipCode"]
+        requested.append(zip_code)
+        return answers[zip_code]
+    monkeypatch.setattr(zipcode, "gateway_get", gateway_get)
+    monkeypatch.setattr(zipcode, "lookup_zip", lambda zip_code: None)
+    zipcode._zip_cache.clear()
+    yield answers, requested
+    zipcode._zip_cache.clear()
+
+
+@pytest.mark.parametrize("zip_code", ["1234", "123456", "abcde", "3310 ", "", None])
+def test_malformed_zips_are_rejected_without_a_request(gateway, zip_code):
+    answers, requested = gateway
+    assert asyncio.run(zipcode.resolve_zip(zip_code)) == []
+    assert requested == []
+
+
+def test_valid_zips_are_fetched_once(gateway):
+    answers, requested = gateway
+    answers["33101"] = httpx.Response(200, json=COUNTY)
+    assert asyncio.run(zipcode.resolve_zip("33101")) == COUNTY
+    assert asyncio.run(zipcode.resolve_zip(" 33101 ")) == COUNTY
+    assert requested == ["33101"]
+
+
+def test_unknown_zips_are_cached_as_invalid(gateway):
+    answers, requested = gateway
+    answers["00000"] = httpx.Response(200, json=[])
+    assert asyncio.run(zipcode.resolve_zip("00000")) == []
+    assert asyncio.run(zipcode.resolve_zip("00000")) == []
+    assert requested == ["00000"]
+
+
+def test_gateway_errors_are_not_cached(gateway):
+    answers, requested = gateway
+    answers["33101"] = httpx.Response(503)
+    assert asyncio.run(zipcode.resolve_zip("33101")) is None
+    answers["33101"] = httpx.Response(200, json=COUNTY)
+    assert asyncio.run(zipcode.resolve_zip("33101")) == COUNTY
+    assert requested == ["33101", "33101"]
@@ -0,0 +1,52 @@
+import math
+import random
+import zipfile
+
+import pytest
+
+import zipgeo
+from zipgeo import ZipCentroids
+
+
+def _brute_force(centroids, zip_code, miles):
+    return {
+        other for other in centroids.zips
+        if centroids.distance_miles(zip_code, other) <= miles
+    }
+
+
+@pytest.fixture
+def centroids():
+    rng = random.Random(7)
+    zips = [f"{i:05d}" for i in range(500)]
+    lats = [rng.uniform(25, 48) for _ in zips]
+    lons = [rng.uniform(-124, -67) for _ in zips]
+    return ZipCentroids(zips, lats, lons)
+
+
+@pytest.mark.parametrize("miles", [10, 150, 600])
+def test_radius_query_matches_brute_force(centroids, miles):
+    for zip_code in ("00000", "00123", "00499"):
+        found = centroids.within(zip_code, miles)
+        assert set(found) == _brute_force(centroids, zip_code, miles)
+        for other, distance in found.items():
+            assert math.isclose(distance, centroids.distance_miles(zip_code, other), abs_tol=0.5)
+
+
+def test_rank_by_distance_orders_nearest_first(centroids, monkeypatch):
+    monkeypatch.setattr(zipgeo, "get_zip_centroids", lambda: centroids)
+    records = [{"zip": z} for z in ("00300", "00010", "99999", "00000")]
+    ranked = zipgeo.rank_by_distance(records, "00000", zip_of=lambda record: record["zip"])
+    assert ranked[0]["zip"] == "00000"
+    assert ranked[-1]["zip"] == "99999"  # unknown zips go last
+    distances = [centroids.distance_miles("00000", record["zip"]) for record in ranked[:-1]]
+    assert distances == sorted(distances)
+
+
+def test_build_from_zipped_gazetteer(tmp_path):
+    source = tmp_path / "gaz.zip"
+    text = "GEOID\tALAND\tINTPTLAT\tINTPTLONG                                    \n33101\t1\t25.7791\t-80.1978\n10001\t1\t40.7506\t-73.9972\n"
+    with zipfile.ZipFile(source, "w") as archive:
+        archive.writestr("2020_Gaz_zcta_national.txt", text)
+    output = tmp_path / "centroids.idx"
+    assert zipgeo.build_centroids(str(source), str(output)) == 2
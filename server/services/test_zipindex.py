@@ -0,0 +1,33 @@
+import zipindex
+from sortedtable import SortedTable
+
+HEADER = (
+    "OID_ZCTA5_20|GEOID_ZCTA5_20|NAMELSAD_ZCTA5_20|AREALAND_ZCTA5_20|AREAWATER_ZCTA5_20|MTFCC_ZCTA5_20|"
+    "CLASSFP_ZCTA5_20|FUNCSTAT_ZCTA5_20|OID_COUNTY_20|GEOID_COUNTY_20|NAMELSAD_COUNTY_20|AREALAND_COUNTY_20|"
+    "AREAWATER_COUNTY_20|MTFCC_COUNTY_20|CLASSFP_COUNTY_20|FUNCSTAT_COUNTY_20|AREALAND_PART|AREAWATER_PART"
+)
+
+
+def _row(zcta, fips, name, land):
+    return f"1|{zcta}|ZCTA5 {zcta}|0|0|G6350|B5|S|2|{fips}|{name}|0|0|G4020|H1|A|{land}|0"
+
+
+def test_census_relationship_build_orders_counties_by_land_area(tmp_path, monkeypatch):
+    source = tmp_path / "rel.txt"
+    source.write_text("\n".join([
+        HEADER,
+        _row("", "12086", "Miami-Dade County", 5),  # county area outside any ZCTA
+        _row("30002", "13121", "Fulton County", 100),
+        _row("30002", "13089", "DeKalb County", 900),
+        _row("33101", "12086", "Miami-Dade County", 50),
+    ]) + "\n")
+    output = tmp_path / "zip_county.idx"
+    assert zipindex.build_index(str(source), str(output)) == 3
+
+    table = SortedTable(str(output))
+    try:
+        counties = [zipindex.decode_record(record) for record in table.find(b"30002")]
+    finally:
+        table.close()
+    assert [county["name"] for county in counties] == ["DeKalb County", "Fulton County"]
+    assert counties[0] == {"zipcode": "30002", "fips": "13089", "state": "GA", "name": "DeKalb County", "stateName": "Georgia"}
@@ -0,0 +1,230 @@
+import asyncio
+import atexit
+import contextlib
+import logging
+import os
+import tempfile
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Worker processes of one server find each other through unix sockets in this
+# directory; it is keyed by the parent (gunicorn arbiter) pid, so separate
+# deployments and restarts on the same host never see each other's sockets.
+WORKER_SOCKET_DIR = os.getenv("WORKER_SOCKET_DIR", tempfile.gettempdir())
+# "off" disables forwarding of messages for sessions held by another worker
+WORKER_SESSION_ROUTING = os.getenv("WORKER_SESSION_ROUTING", "on").lower()
+FORWARDED_HEADER = "x-mcp-forwarded"
+FORWARD_TIMEOUT = float(os.getenv("WORKER_FORWARD_TIMEOUT", "30"))
+
+_peer_clients = {}
+
+
+def socket_dir():
+    return os.path.join(WORKER_SOCKET_DIR, f"mcp-workers-{os.getppid()}")
+
+
+def own_socket_path():
+    return os.path.join(socket_dir(), f"{os.getpid()}.sock")
+
+
+def peer_socket_paths():
+    """Sockets of the other workers of this server."""
+    try:
+        names = os.listdir(socket_dir())
+    except FileNotFoundError:
+        return []
+    own = os.path.basename(own_socket_path())
+    return [os.path.join(socket_dir(), name) for name in sorted(names) if name.endswith(".sock") and name != own]
+
+
+def peer_client(path):
+    client = _peer_clients.get(path)
+    if client is None:
+        client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(uds=path),
+            base_url="http://worker",
+            timeout=FORWARD_TIMEOUT,
+        )
+        _peer_clients[path] = client
+    return client
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _remove_socket(path):
+    """Remove a worker socket, and the socket directory once no worker is left in it."""
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
+    with contextlib.suppress(OSError):
+        os.rmdir(os.path.dirname(path))
+
+
+def _query_param(scope, name):
+    for part in scope["query_string"].decode("latin-1").split("&"):
+        if part.startswith(name + "="):
+            return part[len(name) + 1:]
+    return None
+
+
+class _PeerServer:
+    """Serves the app on this worker's unix socket, for messages forwarded by its peers."""
+
+    def __init__(self, app):
+        import uvicorn
+
+        class Server(uvicorn.Server):
+            # The worker process owns the signal handlers; this server is stopped
+            # from the app's lifespan instead
+            def capture_signals(self):
+                return contextlib.nullcontext()
+
+            def install_signal_handlers(self):
+                pass
+
+        self.path = own_socket_path()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)
+        self.server = Server(uvicorn.Config(app, uds=self.path, lifespan="off", log_level="warning"))
+        self.task = None
+        # Also on exits that skip the lifespan shutdown
+        atexit.register(_remove_socket, self.path)
+
+    async def start(self):
+        self.task = asyncio.create_task(self.server.serve())
+        while not self.server.started and not self.task.done():
+            await asyncio.sleep(0.01)
+        logger.info(f"Worker {os.getpid()} accepting forwarded messages on {self.path}")
+
+    async def stop(self):
+        self.server.should_exit = True
+        if self.task is not None:
+            with contextlib.suppress(Exception):
+                await self.task
+        _remove_socket(self.path)
+
+
+class SessionRouter:
+    """
+    ASGI wrapper that lets several worker processes serve one MCP SSE endpoint.
+
+    An SSE session lives in the worker that accepted its GET /sse stream, but the
+    load balancer (the shared gunicorn socket) may hand the session's message
+    POSTs to any worker. The router adds the owning worker's pid to the message
+    URL announced in the stream's endpoint event (?worker=<pid>&session_id=...),
+    so a worker that receives a message for another worker's session forwards
+    it straight to that worker's unix socket, without handling it itself.
+    """
+
+    def __init__(self, app, message_path="/messages/"):
+        self.app = app
+        self.message_path = message_path
+        self.peer_server = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if WORKER_SESSION_ROUTING == "off" or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["method"] == "GET" and self.peer_server is not None:
+            await self.app(scope, receive, self._tag_endpoint(send))
+            return
+        owner = _query_param(scope, "worker")
+        if (
+            scope["method"] != "POST"
+            or not scope["path"].startswith(self.message_path)
+            or owner is None
+            or not owner.isdigit()
+            or owner == str(os.getpid())
+            or any(name == FORWARDED_HEADER.encode() for name, _ in scope["headers"])
+        ):
+            await self.app(scope, receive, send)
+            return
+        await self._forward(os.path.join(socket_dir(), f"{owner}.sock"), scope, await _read_body(receive), send)
+
+    def _tag_endpoint(self, send):
+        """Wrap `send` so the SSE endpoint event names this worker."""
+        marker = f"{self.message_path}?session_id=".encode()
+        tagged = f"{self.message_path}?worker={os.getpid()}&session_id=".encode()
+        done = False
+
+        async def tag(message):
+            nonlocal done
+            if not done and message["type"] == "http.response.body" and b"event: endpoint" in message.get("body", b""):
+                message = dict(message, body=message["body"].replace(marker, tagged, 1))
+                done = True
+            await send(message)
+        return tag
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    if WORKER_SESSION_ROUTING != "off":
+                        self.peer_server = _PeerServer(self.app)
+                        await self.peer_server.start()
+                except Exception as e:
+                    logger.error(f"Could not start worker socket: {e}")
+                    self.peer_server = None
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.peer_server is not None:
+                    await self.peer_server.stop()
+                for client in list(_peer_clients.values()):
+                    await client.aclose()
+                _peer_clients.clear()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _forward(self, path, scope, body, send):
+        headers = {FORWARDED_HEADER: "1"}
+        for name, value in scope["headers"]:
+            if name.lower() in (b"content-type", b"accept"):
+                headers[name.decode("latin-1")] = value.decode("latin-1")
+        url = scope["path"] + ("?" + scope["query_string"].decode("latin-1") if scope["query_string"] else "")
+        response = None
+        try:
+            response = await peer_client(path).post(url, content=body, headers=headers)
+        except httpx.ConnectError:
+            # Nothing listens there any more: the worker exited and its sessions with it
+            logger.warning(f"Worker socket {path} is gone")
+            _remove_socket(path)
+            client = _peer_clients.pop(path, None)
+            if client is not None:
+                await client.aclose()
+        except Exception as e:
+            logger.warning(f"Forwarding message to {path} failed: {e}")
+
+        if response is None:
+            await send({
+                "type": "http.response.start",
+                "status": 404,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+            })
+            await send({"type": "http.response.body", "body": b"Could not find session"})
+            return
+        await send({
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": [
+                (name.encode("latin-1"), value.encode("latin-1"))
+                for name, value in response.headers.items()
+                if name.lower() not in ("content-length", "transfer-encoding", "connection")
+            ] + [(b"content-length", str(len(response.content)).encode())],
+        })
+        await send({"type": "http.response.body", "body": response.content})
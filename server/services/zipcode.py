@@ -1,80 +1,188 @@
 from mcp.server.fastmcp import FastMCP
-import http.client
-import json
+import asyncio
 import logging
+import os
+import re
+from cache import TTLCache
+from gateway import gateway_get
+from zipindex import lookup_zip
 
 logger = logging.getLogger(__name__)
 
 mcp = FastMCP("zipcode")
 
-def check_zip_code_validity(zip_code):
+ZIP_PATTERN = re.compile(r"^\d{5}$")
+
+# Resolved zips rarely change; invalid ones are kept for less time in case the gateway catches up.
+_zip_cache = TTLCache(
+    maxsize=int(os.getenv("ZIP_CACHE_SIZE", "50000")),
+    ttl=int(os.getenv("ZIP_CACHE_TTL", "86400")),
+    shared="zip",
+)
+ZIP_NEGATIVE_TTL = int(os.getenv("ZIP_NEGATIVE_CACHE_TTL", "3600"))
+ZIP_BATCH_CONCURRENCY = int(os.getenv("ZIP_BATCH_CONCURRENCY", "20"))
+
+_pending = {}
+
+
+async def resolve_zip(zip_code):
+    """
+    Resolve a zip code to its county records, shared by every service.
+
+    Args:
+        zip_code (str): 5 digit zip code
+
+    Returns:
+        list: County records (first one is the primary county), [] if the zip code
+              is invalid, or None if the gateway could not be reached
+    """
+    zip_code = str(zip_code or "").strip()
+    if not ZIP_PATTERN.match(zip_code):
+        return []
+
+    cached = await _zip_cache.aget(zip_code)
+    if cached is not None:
+        return cached
+
+    counties = lookup_zip(zip_code)
+    if counties:
+        _zip_cache.set(zip_code, counties)
+        return counties
+
+    # Concurrent lookups of the same zip share one gateway request
+    task = _pending.get(zip_code)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_zip(zip_code))
+        _pending[zip_code] = task
+        task.add_done_callback(lambda _: _pending.pop(zip_code, None))
+    return await asyncio.shield(task)
+
+
+async def _fetch_zip(zip_code):
     try:
-        conn = http.client.HTTPSConnection('gateway-dev.nextere.com')
-        headers = {"accept": "application/json"}
-    
         endpoint = f"/api/quotingtool-service/geography/zip-by-details?zipCode={zip_code}&year=2024"
-
-        conn.request("GET", endpoint, headers=headers)
-        res = conn.getresponse()
-        data = res.read().decode("utf-8")
-        logger.info(f"Zip code {zip_code} response: {data}")
-        if res.status == 200:
-            json_data = json.loads(data)
-            if json_data[0]["name"]:
-                return True
-            else:
-                return False
-        else:
-            return False
+        res = await gateway_get(endpoint)
+        logger.info(f"Zip code {zip_code} response: {res.text}")
+        if res.status_code == 200:
+            json_data = res.json()
+            if isinstance(json_data, list) and json_data and json_data[0].get("name"):
+                _zip_cache.set(zip_code, json_data)
+                return json_data
+            _zip_cache.set(zip_code, [], ttl=ZIP_NEGATIVE_TTL)
+            return []
+        if res.status_code < 500:
+            _zip_cache.set(zip_code, [], ttl=ZIP_NEGATIVE_TTL)
+            return []
+        logger.error(f"Gateway error resolving zip code {zip_code}: {res.status_code} {res.reason_phrase}")
+        return None
     except Exception as e:
-        logger.error(f"Error validating zip code {zip_code}: {e}")
+        logger.error(f"Error resolving zip code {zip_code}: {e}")
         return None
-    
 
-def fetchCountyData(zipcode):
-    try:
-        conn = http.client.HTTPSConnection('gateway-dev.nextere.com')
-        headers = {"accept": "application/json"}
-        endpoint = f"/api/quotingtool-service/geography/zip-by-details?zipCode={zipcode}&year=2024"
-        conn.request("GET", endpoint, headers=headers)
-        res = conn.getresponse()
-        fetch_data_of_county = res.read().decode("utf-8")
-        fetch_county_data = json.loads(fetch_data_of_county)
-        # Check if data is a list and has at least one item
-        if isinstance(fetch_county_data, list) and fetch_county_data:
-            return fetch_county_data[0]
-        else:
-            return {"error": "Invalid or unsupported zip code. Please provide a valid zip code."}
 
-    except Exception as e:
-        logger.error(f"Error while fetching county data for zip code {zipcode}: {str(e)}")
+async def resolve_zip_batch(zip_codes, concurrency=ZIP_BATCH_CONCURRENCY):
+    """
+    Resolve many zip codes concurrently.
+
+    Duplicates are resolved once; zips found in the local index or the cache
+    never reach the gateway, the rest are fetched at most `concurrency` at a time.
+
+    Args:
+        zip_codes (list): Zip codes (strings, or integers that lost leading zeros)
+        concurrency (int): Maximum number of gateway lookups in flight
+
+    Returns:
+        dict: Zip code -> result of resolve_zip, in first-seen order
+    """
+    unique = list(dict.fromkeys(
+        str(zip_code).zfill(5) if isinstance(zip_code, int) else str(zip_code or "").strip()
+        for zip_code in zip_codes
+    ))
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def resolve(zip_code):
+        async with semaphore:
+            return zip_code, await resolve_zip(zip_code)
+
+    return dict(await asyncio.gather(*(resolve(zip_code) for zip_code in unique)))
+
+
+def get_zip_cache_stats():
+    """Hit/miss counters of the shared zip cache, for sizing ZIP_CACHE_SIZE."""
+    return _zip_cache.stats()
+
+
+async def check_zip_code_validity(zip_code):
+    counties = await resolve_zip(zip_code)
+    if counties is None:
+        return None
+    return bool(counties)
+
+
+async def fetchCountyData(zipcode):
+    counties = await resolve_zip(zipcode)
+    if counties is None:
         return {"error": "Failed to fetch county data due to a server error."}
+    if not counties:
+        return {"error": "Invalid or unsupported zip code. Please provide a valid zip code."}
+    return dict(counties[0])
 
 @mcp.tool()
 async def get_county_info(zipcode):
     """
     Trigger this tool whenever a zipcode is mentioned.
-    
+
     This tool provides county information when someone:
     - Mentions any 5-digit number that could be a zipcode
     - Says "my zipcode is [number]"
     - Shares just a zipcode with no other context
     - Asks anything related to a zipcode
-    
+
     Args:
         zipcode: 5 digit numbers (e.g. 33601)
     """
     print("Zipcode Tool called")
-    validate_zip = check_zip_code_validity(zipcode)
-    
-    if validate_zip == None:
-        return {"alert_status": "Invalid zipcode", "county_data": None}
-    elif validate_zip:
-        zip_data = fetchCountyData(zipcode)
+    counties = await resolve_zip(zipcode)
+
+    if counties:
         return {
             "alert_status": "County information found",
-            "county_data": zip_data
+            "county_data": dict(counties[0])
         }
     else:
         return {"alert_status": "Invalid zipcode", "county_data": None}
-        
\ No newline at end of file
+
+
+@mcp.tool()
+async def get_county_info_batch(zipcodes: list[str]) -> dict:
+    """
+    Look up county information for a list of zip codes in one call.
+
+    Use this instead of calling get_county_info repeatedly when several zip codes
+    need to be resolved at once (e.g. a list of leads).
+
+    Args:
+        zipcodes: List of 5 digit zip codes (e.g. ["33601", "10001"])
+
+    Returns:
+        Dictionary with:
+          - county_data: zip code -> county information (None if invalid)
+          - invalid: zip codes that are not valid
+          - failed: zip codes that could not be looked up right now
+    """
+    logger.info(f"Zipcode batch tool called with {len(zipcodes or [])} zip codes")
+    resolved = await resolve_zip_batch(zipcodes or [])
+    county_data = {}
+    invalid = []
+    failed = []
+    for zip_code, counties in resolved.items():
+        county_data[zip_code] = dict(counties[0]) if counties else None
+        if counties is None:
+            failed.append(zip_code)
+        elif not counties:
+            invalid.append(zip_code)
+    return {
+        "county_data": county_data,
+        "invalid": invalid,
+        "failed": failed,
+    }
@@ -0,0 +1,251 @@
+import argparse
+import csv
+import io
+import logging
+import math
+import os
+import struct
+import threading
+import time
+import zipfile
+from array import array
+
+from sortedtable import SortedTable, write_table
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CENTROIDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "zip_centroids.idx")
+
+EARTH_RADIUS_MILES = 3958.8
+
+# Record layout: zipcode (5 bytes) | latitude (float32) | longitude (float32)
+KEY_WIDTH = 5
+POINT = struct.Struct("<ff")
+RECORD_WIDTH = KEY_WIDTH + POINT.size
+
+ZIP_COLUMNS = ("zipcode", "zip", "zip_code", "zcta5", "geoid")
+LAT_COLUMNS = ("lat", "latitude", "intptlat")
+LON_COLUMNS = ("lon", "lng", "long", "longitude", "intptlong")
+
+
+def _unit_vector(lat, lon):
+    lat, lon = math.radians(lat), math.radians(lon)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def _chord_for_miles(miles):
+    """Straight-line distance on the unit sphere for a great-circle distance in miles."""
+    return 2 * math.sin(min(miles / EARTH_RADIUS_MILES, math.pi) / 2)
+
+
+class ZipCentroids:
+    """
+    Zip code centroids with a k-d tree for radius queries.
+
+    Points are stored as 3D unit vectors in flat arrays, and the tree is implicit:
+    `order` is arranged so the median of every index range is that node's split
+    point, cycling through the x, y and z axes.
+    """
+
+    def __init__(self, zips, lats, lons):
+        self.zips = zips
+        self.position = {zip_code: i for i, zip_code in enumerate(zips)}
+        self.lats = array("f", lats)
+        self.lons = array("f", lons)
+        coords = array("d")
+        for lat, lon in zip(lats, lons):
+            coords.extend(_unit_vector(lat, lon))
+        self.coords = coords
+        order = list(range(len(zips)))
+        self._build(order, 0, len(order), 0)
+        self.order = array("I", order)
+
+    def _build(self, order, lo, hi, axis):
+        if hi - lo <= 1:
+            return
+        order[lo:hi] = sorted(order[lo:hi], key=lambda i: self.coords[3 * i + axis])
+        mid = (lo + hi) // 2
+        self._build(order, lo, mid, (axis + 1) % 3)
+        self._build(order, mid + 1, hi, (axis + 1) % 3)
+
+    def centroid(self, zip_code):
+        i = self.position.get(str(zip_code)[:KEY_WIDTH])
+        return None if i is None else (self.lats[i], self.lons[i])
+
+    def distance_miles(self, zip_a, zip_b):
+        a = self.position.get(str(zip_a)[:KEY_WIDTH])
+        b = self.position.get(str(zip_b)[:KEY_WIDTH])
+        if a is None or b is None:
+            return None
+        dot = sum(self.coords[3 * a + k] * self.coords[3 * b + k] for k in range(3))
+        return EARTH_RADIUS_MILES * math.acos(max(-1.0, min(1.0, dot)))
+
+    def within(self, zip_code, miles):
+        """
+        Zip codes whose centroid lies within `miles` of the given zip's centroid.
+
+        Returns:
+            dict: zip code -> distance in miles, or None if the zip code is unknown
+        """
+        origin = self.position.get(str(zip_code)[:KEY_WIDTH])
+        if origin is None:
+            return None
+        center = tuple(self.coords[3 * origin + k] for k in range(3))
+        radius = _chord_for_miles(miles)
+        found = {}
+        stack = [(0, len(self.order), 0)]
+        while stack:
+            lo, hi, axis = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            point = self.order[mid]
+            offset = 3 * point
+            chord = math.sqrt(sum((self.coords[offset + k] - center[k]) ** 2 for k in range(3)))
+            if chord <= radius:
+                found[self.zips[point]] = EARTH_RADIUS_MILES * 2 * math.asin(min(1.0, chord / 2))
+            delta = center[axis] - self.coords[offset + axis]
+            near, far = ((lo, mid), (mid + 1, hi)) if delta < 0 else ((mid + 1, hi), (lo, mid))
+            stack.append((near[0], near[1], (axis + 1) % 3))
+            if abs(delta) <= radius:
+                stack.append((far[0], far[1], (axis + 1) % 3))
+        return found
+
+
+_centroids = None
+_centroids_loaded = False
+_centroids_lock = threading.Lock()
+
+
+def get_zip_centroids():
+    """Load the centroid table and build its k-d tree once per process; None if not installed."""
+    global _centroids, _centroids_loaded
+    if _centroids_loaded:
+        return _centroids
+    with _centroids_lock:
+        if not _centroids_loaded:
+            path = os.getenv("ZIP_CENTROIDS_PATH", DEFAULT_CENTROIDS_PATH)
+            if os.path.exists(path):
+                started = time.perf_counter()
+                table = SortedTable(path)
+                try:
+                    zips, lats, lons = [], [], []
+                    for i in range(len(table)):
+                        record = table.record_at(i)
+                        lat, lon = POINT.unpack_from(record, KEY_WIDTH)
+                        zips.append(record[:KEY_WIDTH].decode("ascii"))
+                        lats.append(lat)
+                        lons.append(lon)
+                finally:
+                    table.close()
+                _centroids = ZipCentroids(zips, lats, lons)
+                logger.info(f"Loaded {len(zips)} zip centroids from {path} in {time.perf_counter() - started:.2f}s")
+            else:
+                logger.info(f"No zip centroid table found at {path}; results keep gateway order")
+            _centroids_loaded = True
+    return _centroids
+
+
+def rank_by_distance(records, zip_code, max_miles=None, zip_of=lambda record: record.zipcode, sort=True):
+    """
+    Sort records nearest-first to a zip code, optionally dropping far ones.
+
+    Records whose zip code has no known centroid keep their relative order after
+    the located ones, and are dropped when `max_miles` is set. Without a centroid
+    table (or for an unknown origin zip) the records are returned unchanged.
+
+    Args:
+        records (list): Records to rank
+        zip_code (str): The user's 5 digit zip code
+        max_miles (float): Optional maximum distance from the user's zip code
+        zip_of (callable): Returns a record's zip code
+        sort (bool): Set to False to only apply `max_miles` and keep the input order
+
+    Returns:
+        list: Ranked records
+    """
+    centroids = get_zip_centroids()
+    if centroids is None or centroids.centroid(zip_code) is None:
+        return list(records)
+
+    if max_miles is not None:
+        # Radius query on the k-d tree; only zips inside the radius get a score
+        scores = {zip_of_record: -miles for zip_of_record, miles in centroids.within(zip_code, max_miles).items()}
+    else:
+        # Cosine of the angle to the origin orders zips by distance without trigonometry
+        origin = 3 * centroids.position[str(zip_code)[:KEY_WIDTH]]
+        ox, oy, oz = centroids.coords[origin:origin + 3]
+        coords = centroids.coords
+        position = centroids.position
+        scores = {}
+        for record in records:
+            record_zip = str(zip_of(record) or "")[:KEY_WIDTH]
+            if record_zip not in scores:
+                i = position.get(record_zip)
+                scores[record_zip] = None if i is None else ox * coords[3 * i] + oy * coords[3 * i + 1] + oz * coords[3 * i + 2]
+
+    ranked = []
+    unknown = []
+    for record in records:
+        score = scores.get(str(zip_of(record) or "")[:KEY_WIDTH])
+        if score is None:
+            if max_miles is None:
+                unknown.append(record)
+            continue
+        ranked.append((score, record))
+    if sort:
+        ranked.sort(key=lambda pair: -pair[0])
+    return [record for _, record in ranked] + unknown
+
+
+def _pick(row, names):
+    for key, value in row.items():
+        if key and key.strip().lower() in names:
+            return value
+    raise KeyError(f"None of the columns {names} found")
+
+
+def _open_source(input_path):
+    """Open a CSV/TSV file, or the gazetteer text file inside the Census .zip download."""
+    if input_path.endswith(".zip"):
+        archive = zipfile.ZipFile(input_path)
+        member = next(name for name in archive.namelist() if name.endswith(".txt"))
+        return io.TextIOWrapper(archive.open(member), encoding="utf-8", newline=""), "excel-tab"
+    dialect = "excel-tab" if input_path.endswith((".txt", ".tsv")) else "excel"
+    return open(input_path, newline="", encoding="utf-8"), dialect
+
+
+def build_centroids(input_path, output_path=DEFAULT_CENTROIDS_PATH):
+    """Build the centroid table from a CSV (or tab-separated gazetteer, optionally zipped) of zip, latitude, longitude."""
+    rows = {}
+    f, dialect = _open_source(input_path)
+    with f:
+        for row in csv.DictReader(f, dialect=dialect):
+            zip_code = str(_pick(row, ZIP_COLUMNS)).strip().zfill(KEY_WIDTH)
+            if len(zip_code) != KEY_WIDTH or not zip_code.isdigit():
+                continue
+            lat, lon = float(_pick(row, LAT_COLUMNS)), float(_pick(row, LON_COLUMNS))
+            key = zip_code.encode("ascii")
+            rows[key] = key + POINT.pack(lat, lon)
+    return write_table(output_path, rows.items(), KEY_WIDTH, RECORD_WIDTH)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Build or query the zip centroid table.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build the table from a zip,lat,lon CSV or Census gazetteer file (.txt or .zip)")
+    build.add_argument("input")
+    build.add_argument("-o", "--output", default=DEFAULT_CENTROIDS_PATH)
+    near = commands.add_parser("near", help="List zip codes within a radius of a zip code")
+    near.add_argument("zipcode")
+    near.add_argument("miles", type=float)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_centroids(args.input, args.output)
+    else:
+        centroids = get_zip_centroids()
+        found = centroids.within(args.zipcode, args.miles) if centroids else None
+        for zip_code, miles in sorted((found or {}).items(), key=lambda item: item[1]):
+            print(f"{zip_code}\t{miles:.1f}")
@@ -0,0 +1,178 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import threading
+
+from sortedtable import SortedTable, pad, unpad, write_table
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "zip_county.idx")
+
+# Record layout: zipcode | fips | state | county name | state name
+FIELDS = (("zipcode", 5), ("fips", 5), ("state", 2), ("name", 48), ("stateName", 24))
+KEY_WIDTH = 5
+RECORD_WIDTH = sum(width for _, width in FIELDS)
+
+# State FIPS code -> (postal abbreviation, name), for Census files that only carry county GEOIDs
+STATE_FIPS = {
+    "01": ("AL", "Alabama"), "02": ("AK", "Alaska"), "04": ("AZ", "Arizona"), "05": ("AR", "Arkansas"),
+    "06": ("CA", "California"), "08": ("CO", "Colorado"), "09": ("CT", "Connecticut"), "10": ("DE", "Delaware"),
+    "11": ("DC", "District of Columbia"), "12": ("FL", "Florida"), "13": ("GA", "Georgia"), "15": ("HI", "Hawaii"),
+    "16": ("ID", "Idaho"), "17": ("IL", "Illinois"), "18": ("IN", "Indiana"), "19": ("IA", "Iowa"),
+    "20": ("KS", "Kansas"), "21": ("KY", "Kentucky"), "22": ("LA", "Louisiana"), "23": ("ME", "Maine"),
+    "24": ("MD", "Maryland"), "25": ("MA", "Massachusetts"), "26": ("MI", "Michigan"), "27": ("MN", "Minnesota"),
+    "28": ("MS", "Mississippi"), "29": ("MO", "Missouri"), "30": ("MT", "Montana"), "31": ("NE", "Nebraska"),
+    "32": ("NV", "Nevada"), "33": ("NH", "New Hampshire"), "34": ("NJ", "New Jersey"), "35": ("NM", "New Mexico"),
+    "36": ("NY", "New York"), "37": ("NC", "North Carolina"), "38": ("ND", "North Dakota"), "39": ("OH", "Ohio"),
+    "40": ("OK", "Oklahoma"), "41": ("OR", "Oregon"), "42": ("PA", "Pennsylvania"), "44": ("RI", "Rhode Island"),
+    "45": ("SC", "South Carolina"), "46": ("SD", "South Dakota"), "47": ("TN", "Tennessee"), "48": ("TX", "Texas"),
+    "49": ("UT", "Utah"), "50": ("VT", "Vermont"), "51": ("VA", "Virginia"), "53": ("WA", "Washington"),
+    "54": ("WV", "West Virginia"), "55": ("WI", "Wisconsin"), "56": ("WY", "Wyoming"), "72": ("PR", "Puerto Rico"),
+}
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def encode_record(county):
+    return b"".join(pad(str(county.get(field) or ""), width) for field, width in FIELDS)
+
+
+def decode_record(record):
+    county = {}
+    offset = 0
+    for field, width in FIELDS:
+        county[field] = unpad(record[offset:offset + width])
+        offset += width
+    return county
+
+
+def get_zip_index():
+    """Open the zip→county index once per process; None when it is not installed."""
+    global _index, _index_loaded
+    if _index_loaded:
+        return _index
+    with _index_lock:
+        if not _index_loaded:
+            path = os.getenv("ZIP_INDEX_PATH", DEFAULT_INDEX_PATH)
+            if os.path.exists(path):
+                try:
+                    _index = SortedTable(path)
+                    logger.info(f"Loaded zip index with {len(_index)} records from {path}")
+                except Exception as e:
+                    logger.error(f"Error loading zip index {path}: {e}")
+            else:
+                logger.info(f"No zip index found at {path}; zip lookups will use the gateway")
+            _index_loaded = True
+    return _index
+
+
+def lookup_zip(zip_code):
+    """
+    Look up the counties for a zip code in the local index.
+
+    Args:
+        zip_code (str): 5 digit zip code
+
+    Returns:
+        list: County records in gateway order, or None if the index is unavailable
+              or does not contain the zip code
+    """
+    index = get_zip_index()
+    if index is None or not zip_code:
+        return None
+    records = index.find(str(zip_code).encode("ascii", errors="ignore")[:KEY_WIDTH])
+    if not records:
+        return None
+    return [decode_record(record) for record in records]
+
+
+def _read_census_relationship(path):
+    """
+    County records from the Census ZCTA-to-county relationship file (pipe-delimited).
+
+    A zip code's counties are ordered by how much of its land area they hold, so
+    the first one is the primary county. ZCTAs approximate USPS zip codes; zips
+    without a ZCTA (e.g. PO box only) are not in the index and use the gateway.
+    """
+    parts = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f, delimiter="|"):
+            zip_code = (row.get("GEOID_ZCTA5_20") or "").strip()
+            fips = (row.get("GEOID_COUNTY_20") or "").strip()
+            if not zip_code or not fips:
+                continue
+            state, state_name = STATE_FIPS.get(fips[:2], ("", ""))
+            county = {"fips": fips, "state": state, "name": row.get("NAMELSAD_COUNTY_20", ""), "stateName": state_name}
+            parts.setdefault(zip_code, []).append((int(row.get("AREALAND_PART") or 0), county))
+    for zip_code, counties in parts.items():
+        for _, county in sorted(counties, key=lambda part: -part[0]):
+            yield {"zipcode": zip_code, **county}
+
+
+def _read_counties(path):
+    """Read county records from a gateway JSON dump, a JSONL file, a CSV file or a Census relationship file."""
+    if path.endswith(".txt"):
+        yield from _read_census_relationship(path)
+        return
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+        return
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                line = line.strip()
+                if line:
+                    row = json.loads(line)
+                    yield from (row if isinstance(row, list) else [row])
+            return
+        data = json.load(f)
+    # Either a flat list of records or {zipcode: [records]} as returned per zip by zip-by-details
+    if isinstance(data, dict):
+        for zip_code, counties in data.items():
+            for county in counties or []:
+                yield {"zipcode": zip_code, **county}
+    else:
+        yield from data
+
+
+def build_index(input_path, output_path=DEFAULT_INDEX_PATH):
+    """
+    Build the zip→county index from a gateway dump or CSV export.
+
+    Records for the same zip keep their input order, so the first one stays the
+    primary county just like `fetchCountyData` returns the first gateway record.
+    """
+    rows = []
+    for position, county in enumerate(_read_counties(input_path)):
+        zip_code = str(county.get("zipcode") or county.get("zipCode") or "").strip().zfill(5)
+        if len(zip_code) != KEY_WIDTH or not zip_code.isdigit():
+            logger.warning(f"Skipping record with invalid zip code: {county}")
+            continue
+        county = {**county, "zipcode": zip_code}
+        rows.append((zip_code.encode("ascii") + position.to_bytes(4, "big"), encode_record(county)))
+    rows.sort(key=lambda row: row[0])
+    return write_table(output_path, ((key[:KEY_WIDTH], record) for key, record in rows), KEY_WIDTH, RECORD_WIDTH)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Build or query the offline zip→county index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build the index from a JSON, JSONL or CSV dump, or a Census "
+                                              "ZCTA-to-county relationship file (.txt)")
+    build.add_argument("input")
+    build.add_argument("-o", "--output", default=DEFAULT_INDEX_PATH)
+    lookup = commands.add_parser("lookup", help="Look up a zip code in the index")
+    lookup.add_argument("zipcode")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_index(args.input, args.output)
+    else:
+        print(json.dumps(lookup_zip(args.zipcode), indent=2))
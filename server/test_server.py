@@ -0,0 +1,87 @@
+import asyncio
+import json
+import typing
+
+import pytest
+from mcp.server.fastmcp import Context, FastMCP
+
+import server
+
+
+@pytest.mark.parametrize("name, annotation", [
+    ("str", str),
+    ("list[str]", list[str]),
+    ("Context", Context),
+    ("Optional[int]", typing.Optional[int]),
+    ("str | None", typing.Optional[str]),
+])
+def test_known_annotations_are_restored(name, annotation):
+    assert server._annotation_from_name(name) == annotation
+
+
+@pytest.mark.parametrize("name", ["__import__('os').system('true')", "Optional[object]", "type"])
+def test_other_annotations_are_rejected(name):
+    with pytest.raises(ValueError):
+        server._annotation_from_name(name)
+
+
+def test_invalid_manifest_entry_falls_back_to_import(tmp_path, monkeypatch):
+    services = server.discover_services()
+    module_name = "zipcode"
+    manifest = {"services": {module_name: {"source_sha1": services[module_name], "tools": [
+        {"name": "get_county_info", "doc": "", "params": [{"name": "zipcode", "annotation": "os.system"}], "returns": None},
+    ]}}}
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps(manifest))
+    monkeypatch.setattr(server, "MANIFEST_PATH", str(path))
+
+    main_mcp = FastMCP(name="test")
+    server.register_services(main_mcp, loading="lazy")
+    tools = {tool.name: tool for tool in main_mcp._tool_manager.list_tools()}
+    assert "get_county_info_batch" in tools
+    # Registered from the imported module, not from the manifest
+    assert tools["get_county_info"].fn.__wrapped__ is server.load_service_module(module_name).get_county_info
+
+
+def test_lazy_tools_match_eager_schemas(tmp_path, monkeypatch):
+    path = tmp_path / "manifest.json"
+    monkeypatch.setattr(server, "MANIFEST_PATH", str(path))
+    server.build_manifest(str(path))
+
+    lazy, eager = FastMCP(name="lazy"), FastMCP(name="eager")
+    server.register_services(lazy, loading="lazy")
+    server.register_services(eager, loading="eager")
+    lazy_tools = {tool.name: tool for tool in lazy._tool_manager.list_tools()}
+    eager_tools = {tool.name: tool for tool in eager._tool_manager.list_tools()}
+    assert lazy_tools.keys() == eager_tools.keys()
+    for name, tool in eager_tools.items():
+        assert lazy_tools[name].parameters == tool.parameters
+        assert lazy_tools[name].context_kwarg == tool.context_kwarg
+
+
+def _tool_sample(name, tool, outcome=None):
+    import metrics
+    labels = f'tool="{tool}"' + (f',outcome="{outcome}"' if outcome else "")
+    samples = dict(line.rsplit(" ", 1) for line in metrics.render().splitlines() if not line.startswith("#"))
+    return float(samples.get(f"{name}{{{labels}}}", 0))
+
+
+def test_instrumented_tools_count_outcomes_and_latency():
+    async def probe_tool(fail=False, error=False):
+        if fail:
+            raise RuntimeError("boom")
+        return {"error": "bad input"} if error else {"ok": True}
+
+    tool = server.instrument_tool(probe_tool)
+    assert tool.__wrapped__ is probe_tool
+    asyncio.run(tool())
+    asyncio.run(tool(error=True))
+    with pytest.raises(RuntimeError):
+        asyncio.run(tool(fail=True))
+
+    assert _tool_sample("mcp_tool_calls_total", "probe_tool", "ok") == 1
+    assert _tool_sample("mcp_tool_calls_total", "probe_tool", "error") == 1
+    assert _tool_sample("mcp_tool_calls_total", "probe_tool", "exception") == 1
+    assert _tool_sample("mcp_tool_duration_seconds_count", "probe_tool") == 3
+    # Result sizes are only observed for calls that returned
+    assert _tool_sample("mcp_tool_result_bytes_count", "probe_tool") == 2